@@ -0,0 +1,391 @@
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+import click
+import numpy as np
+from app import app, db
+from models import (
+    Order, OrderItem, Product, Category, SalesDaily, ProductSalesDaily, ProductSalesMonthly, CategorySalesDaily,
+    SalesRollupState,
+)
+from database import dialect_insert
+
+# Sales rollups
+# Orders are folded into per-day rollup tables (totals, per product, per
+# category, plus per product by month for long ranges) in id order past a watermark kept in sales_rollup_state, so
+# analytics reads a row per day instead of grouping the order tables. An
+# order is only folded in once it is ANALYTICS_ROLLUP_SETTLE seconds old,
+# which gives transactions holding an earlier id time to commit. Rollups
+# count orders as placed; `flask backfill-analytics --reset` rebuilds them
+# after orders were edited or removed.
+app.config.setdefault('ANALYTICS_ROLLUP_SETTLE', 60)
+app.config.setdefault('ANALYTICS_ROLLUP_INTERVAL', 60)  # seconds between refreshes from the endpoint
+app.config.setdefault('ANALYTICS_ROLLUP_BATCH_SIZE', 50000)
+app.config.setdefault('ANALYTICS_WEEK_START', 5)  # Saturday, numbered as date.weekday()
+app.config.setdefault('ANALYTICS_MAX_DAYS', 3660)
+
+ROLLUP = 'orders'
+GRANULARITIES = ('day', 'week', 'month')
+UPSERT_BATCH_SIZE = 1000
+
+def _day(value):
+    # date() comes back as text on SQLite
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+def _watermark():
+    last = db.session.execute(
+        db.select(SalesRollupState.last_order_id).where(SalesRollupState.name == ROLLUP)
+    ).scalar()
+    if last is None:
+        db.session.execute(
+            dialect_insert(SalesRollupState.__table__, db.engine.dialect.name)
+            .values(name=ROLLUP, last_order_id=0, updated_at=datetime.utcnow())
+            .on_conflict_do_nothing(index_elements=['name'])
+        )
+        db.session.commit()
+        last = 0
+    return last
+
+def _next_batch(last, settle, batch_size):
+    # Highest order id of the next batch, stopping short of the first order
+    # that hasn't settled; None when there is nothing to fold in
+    cutoff = datetime.utcnow() - timedelta(seconds=settle)
+    unsettled = db.session.execute(
+        db.select(db.func.min(Order.id)).where(Order.id > last, Order.created_at >= cutoff)
+    ).scalar()
+    ids = db.select(Order.id).where(Order.id > last)
+    if unsettled is not None:
+        ids = ids.where(Order.id < unsettled)
+    ids = ids.order_by(Order.id).limit(batch_size).subquery()
+    return db.session.execute(db.select(db.func.max(ids.c.id))).scalar()
+
+def batch_orders_query(last, upper):
+    day = db.func.date(Order.created_at)
+    return (
+        db.select(day, db.func.count(Order.id), db.func.sum(Order.total_amount))
+        .where(Order.id > last, Order.id <= upper)
+        .group_by(day)
+    )
+
+def batch_items_query(last, upper):
+    day = db.func.date(Order.created_at)
+    return (
+        db.select(
+            day, OrderItem.product_id, Product.category_id,
+            db.func.sum(OrderItem.quantity), db.func.sum(OrderItem.quantity * OrderItem.price)
+        )
+        .select_from(Order)
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .outerjoin(Product, Product.id == OrderItem.product_id)
+        .where(Order.id > last, Order.id <= upper)
+        .group_by(day, OrderItem.product_id, Product.category_id)
+    )
+
+def _upsert(model, keys, rows):
+    # Adds the rows' measures to the stored ones
+    if not rows:
+        return
+    table = model.__table__
+    statement = dialect_insert(table, db.engine.dialect.name)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={name: table.c[name] + statement.excluded[name] for name in rows[0] if name not in keys}
+    )
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        db.session.execute(statement, rows[start:start + UPSERT_BATCH_SIZE])
+
+def _fold(last, upper):
+    # Rolls up orders in (last, upper]; returns how many there were
+    sales = {}
+    for day, orders, revenue in db.session.execute(batch_orders_query(last, upper)):
+        sales[_day(day)] = {'day': _day(day), 'orders': orders, 'units': 0, 'revenue': revenue or 0}
+
+    products = []
+    months = {}
+    categories = {}
+    for day, product_id, category_id, units, revenue in db.session.execute(batch_items_query(last, upper)):
+        day = _day(day)
+        units, revenue = int(units or 0), revenue or 0
+        sales[day]['units'] += units
+        products.append({'day': day, 'product_id': product_id, 'units': units, 'revenue': revenue})
+        month = months.setdefault((day.replace(day=1), product_id), {
+            'month': day.replace(day=1), 'product_id': product_id, 'units': 0, 'revenue': 0
+        })
+        month['units'] += units
+        month['revenue'] += revenue
+        category = categories.setdefault((day, category_id or 0), {
+            'day': day, 'category_id': category_id or 0, 'units': 0, 'revenue': 0
+        })
+        category['units'] += units
+        category['revenue'] += revenue
+
+    _upsert(SalesDaily, ('day',), list(sales.values()))
+    _upsert(ProductSalesDaily, ('day', 'product_id'), products)
+    _upsert(ProductSalesMonthly, ('month', 'product_id'), list(months.values()))
+    _upsert(CategorySalesDaily, ('day', 'category_id'), list(categories.values()))
+    return sum(row['orders'] for row in sales.values())
+
+def refresh_rollups(max_batches=None):
+    # Folds settled orders past the watermark into the rollups, one
+    # transaction per batch. Returns the number of orders folded in.
+    settle = app.config['ANALYTICS_ROLLUP_SETTLE']
+    batch_size = app.config['ANALYTICS_ROLLUP_BATCH_SIZE']
+    folded = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        last = _watermark()
+        upper = _next_batch(last, settle, batch_size)
+        if upper is None:
+            break
+
+        # Move the watermark first and only from where this batch started:
+        # a concurrent refresh of the same orders waits on this row, then
+        # matches nothing and backs off instead of counting them twice
+        result = db.session.execute(
+            db.update(SalesRollupState)
+            .where(SalesRollupState.name == ROLLUP, SalesRollupState.last_order_id == last)
+            .values(last_order_id=upper, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            db.session.rollback()
+            break
+        folded += _fold(last, upper)
+        db.session.commit()
+        batches += 1
+    return folded
+
+_refreshed_at = None
+_refresh_lock = threading.Lock()
+
+def refresh_rollups_if_due():
+    # At most one batch per ANALYTICS_ROLLUP_INTERVAL per process, so a
+    # request never folds in more than a batch; history comes from the
+    # backfill command
+    global _refreshed_at
+    if _refreshed_at is not None and time.monotonic() - _refreshed_at < app.config['ANALYTICS_ROLLUP_INTERVAL']:
+        return 0
+    if not _refresh_lock.acquire(blocking=False):
+        return 0
+    try:
+        _refreshed_at = time.monotonic()
+        return refresh_rollups(max_batches=1)
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Sales rollup refresh error: {str(e)}")
+        return 0
+    finally:
+        _refresh_lock.release()
+
+def reset_rollups():
+    _watermark()
+    for model in (SalesDaily, ProductSalesDaily, ProductSalesMonthly, CategorySalesDaily):
+        db.session.execute(db.delete(model))
+    db.session.execute(
+        db.update(SalesRollupState)
+        .where(SalesRollupState.name == ROLLUP)
+        .values(last_order_id=0, updated_at=datetime.utcnow())
+    )
+    db.session.commit()
+
+# Reports
+def period_start(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=(day.weekday() - app.config['ANALYTICS_WEEK_START']) % 7)
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+def next_period(start, granularity):
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'month':
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+def parse_day_range(start, end):
+    # ISO dates, both inclusive; the last 30 days by default
+    end = date.fromisoformat(end) if end else datetime.utcnow().date()
+    start = date.fromisoformat(start) if start else end - timedelta(days=29)
+    if start > end:
+        raise ValueError('start is after end')
+    if (end - start).days >= app.config['ANALYTICS_MAX_DAYS']:
+        raise ValueError('range is too long')
+    return start, end
+
+def _daily_arrays(first, last):
+    # Dense per-day (orders, units, revenue) from first to last inclusive
+    rows = db.session.execute(
+        db.select(SalesDaily.day, SalesDaily.orders, SalesDaily.units, SalesDaily.revenue)
+        .where(SalesDaily.day >= first, SalesDaily.day <= last)
+    ).all()
+    arrays = np.zeros((3, (last - first).days + 1))
+    if rows:
+        positions = np.array([(_day(row[0]) - first).days for row in rows])
+        arrays[:, positions] = np.array([row[1:] for row in rows], dtype=float).T
+    return arrays
+
+def _moving_average(values, window):
+    # Trailing mean; entry i covers values[i - window + 1:i + 1]
+    sums = np.concatenate(([0.0], np.cumsum(values)))
+    return (sums[window:] - sums[:-window]) / window
+
+def _change(current, previous):
+    # Relative change, None where there is nothing to compare with
+    current, previous = np.asarray(current, dtype=float), np.asarray(previous, dtype=float)
+    change = np.divide(current - previous, previous, out=np.full(current.shape, np.nan), where=previous != 0)
+    return [None if np.isnan(value) else round(float(value), 4) for value in change]
+
+def _totals(arrays, begin, end):
+    orders, units, revenue = (float(values) for values in arrays[:, begin:end].sum(axis=1))
+    return {
+        'orders': int(orders),
+        'units': int(units),
+        'revenue': revenue,
+        'average_order_value': round(revenue / orders, 2) if orders else 0,
+    }
+
+def top_products_query(start, end, limit):
+    # Whole months come from the monthly rollup, the days around them from
+    # the daily one. Months from first_month up to (not including) end_month
+    # lie wholly inside the range.
+    first_month = start if start.day == 1 else next_period(start.replace(day=1), 'month')
+    end_month = next_period(end.replace(day=1), 'month')
+    if end < end_month - timedelta(days=1):
+        end_month = end.replace(day=1)
+    if first_month >= end_month:
+        ranges = [(ProductSalesDaily, ProductSalesDaily.day, start, end)]
+    else:
+        ranges = [(ProductSalesMonthly, ProductSalesMonthly.month, first_month, end_month - timedelta(days=1))]
+        if start < first_month:
+            ranges.append((ProductSalesDaily, ProductSalesDaily.day, start, first_month - timedelta(days=1)))
+        if end >= end_month:
+            ranges.append((ProductSalesDaily, ProductSalesDaily.day, end_month, end))
+
+    rows = db.union_all(*(
+        db.select(model.product_id, model.units, model.revenue).where(column >= first, column <= last)
+        for model, column, first, last in ranges
+    )).subquery()
+    revenue = db.func.sum(rows.c.revenue)
+    return (
+        db.select(rows.c.product_id, db.func.sum(rows.c.units), revenue)
+        .group_by(rows.c.product_id)
+        .order_by(revenue.desc(), rows.c.product_id)
+        .limit(limit)
+    )
+
+def category_query(start, end):
+    return (
+        db.select(CategorySalesDaily.category_id, db.func.sum(CategorySalesDaily.units),
+                  db.func.sum(CategorySalesDaily.revenue))
+        .where(CategorySalesDaily.day >= start, CategorySalesDaily.day <= end)
+        .group_by(CategorySalesDaily.category_id)
+    )
+
+def sales_report(start, end, granularity='day', window=7, top=10):
+    # Revenue series with a trailing moving average and change over the
+    # previous period, totals against the preceding range of equal length,
+    # and top products and categories. The range is widened to whole periods.
+    start = period_start(start, granularity)
+    end = next_period(period_start(end, granularity), granularity) - timedelta(days=1)
+    days = (end - start).days + 1
+
+    # Periods before the range feed the moving average and the first change
+    periods = []
+    lead = start
+    for _ in range(max(window - 1, 1)):
+        lead = period_start(lead - timedelta(days=1), granularity)
+        periods.append(lead)
+    periods.reverse()
+    first_period = len(periods)
+    period = start
+    while period <= end:
+        periods.append(period)
+        period = next_period(period, granularity)
+
+    first = min(periods[0], start - timedelta(days=days))
+    arrays = _daily_arrays(first, end)
+    offset = (periods[0] - first).days
+    starts = [(period - periods[0]).days for period in periods]
+    orders, units, revenue = np.add.reduceat(arrays[:, offset:], starts, axis=1)
+
+    averages = _moving_average(revenue, window)[first_period - (window - 1):]
+    changes = _change(revenue[first_period:], revenue[first_period - 1:-1])
+    series = [{
+        'period': periods[i].isoformat(),
+        'orders': int(orders[i]),
+        'units': int(units[i]),
+        'revenue': float(revenue[i]),
+        'moving_average': round(float(averages[i - first_period]), 2),
+        'change': changes[i - first_period],
+    } for i in range(first_period, len(periods))]
+
+    here = (start - first).days
+    current = _totals(arrays, here, here + days)
+    previous = _totals(arrays, here - days, here)
+    comparison = dict(zip(
+        ('orders', 'units', 'revenue'),
+        _change([current[key] for key in ('orders', 'units', 'revenue')],
+                [previous[key] for key in ('orders', 'units', 'revenue')])
+    ))
+
+    product_rows = db.session.execute(top_products_query(start, end, top)).all()
+    names = {
+        row.id: row for row in db.session.execute(
+            db.select(Product.id, Product.name, Product.name_persian)
+            .where(Product.id.in_([row[0] for row in product_rows]))
+        )
+    } if product_rows else {}
+    top_products = [{
+        'product_id': product_id,
+        'name': names[product_id].name if product_id in names else None,
+        'name_persian': names[product_id].name_persian if product_id in names else None,
+        'units': int(units_sold),
+        'revenue': product_revenue,
+    } for product_id, units_sold, product_revenue in product_rows]
+
+    category_rows = db.session.execute(category_query(start, end)).all()
+    category_names = dict(db.session.execute(db.select(Category.id, Category.name_persian)).all())
+    categories = sorted(({
+        'category_id': category_id or None,
+        'name_persian': category_names.get(category_id, 'بدون دسته‌بندی'),
+        'units': int(units_sold),
+        'revenue': category_revenue,
+        'share': round(category_revenue / current['revenue'], 4) if current['revenue'] else 0,
+    } for category_id, units_sold, category_revenue in category_rows), key=lambda row: -row['revenue'])
+
+    state = db.session.get(SalesRollupState, ROLLUP)
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'granularity': granularity,
+        'window': window,
+        'series': series,
+        'totals': current,
+        'previous': {
+            'start': (start - timedelta(days=days)).isoformat(),
+            'end': (start - timedelta(days=1)).isoformat(),
+            **previous,
+        },
+        'change': comparison,
+        'top_products': top_products,
+        'categories': categories,
+        'rolled_up_to': state.last_order_id if state else 0,
+    }
+
+@app.cli.command('backfill-analytics')
+@click.option('--reset', is_flag=True, help='Drop the rollups and rebuild them from every order.')
+def backfill_analytics_command(reset):
+    """Build the sales rollups for existing order history."""
+    if reset:
+        reset_rollups()
+    started = time.perf_counter()
+    total = 0
+    while True:
+        folded = refresh_rollups(max_batches=1)
+        if not folded:
+            break
+        total += folded
+        print(f"Rolled up {total} orders")
+    print(f"Sales rollups are up to order {_watermark()} ({total} orders in {time.perf_counter() - started:.1f}s)")
@@ -1,9 +1,28 @@
-from flask import request, jsonify, render_template
+from flask import request, jsonify, render_template, stream_with_context
 from flask_jwt_extended import create_access_token, get_jwt_identity
-from werkzeug.security import generate_password_hash
+from sqlalchemy.exc import IntegrityError
 from app import app, db
-from models import User, Product, Category, Order, OrderItem, BlogPost, Newsletter
+from models import User, Product, Category, Order, OrderItem, BlogPost, Newsletter, NewsletterCampaign
 from auth import admin_required, login_required, get_current_user
+from search import apply_search
+from facets import get_facet_index, parse_selection, apply_facet_filters, facet_page
+from suggest import suggest_products
+from serializers import (
+    product_query, order_query, parse_fields, projected_query, to_fields_dict,
+    PRODUCT_FIELDS, PRODUCT_LIST_FIELDS, BLOG_POST_FIELDS, BLOG_POST_LIST_FIELDS
+)
+from pagination import keyset_page, cached_count, invalidate_counts
+from inventory import reserve_stock, publish_stock_changes
+from cart import held_by_others
+from product_import import product_fields, import_products
+from dashboard_stats import get_dashboard_stats
+from analytics import GRANULARITIES, parse_day_range, refresh_rollups_if_due, sales_report
+from order_export import export_query, parse_date, ndjson_stream, csv_stream
+from catalog_cache import cached_response, bump_catalog_version, get_stats as get_cache_stats
+from rate_limit import rate_limited
+from database import read_replica
+from passwords import hash_password, verify_password, HashingBusy
+from newsletter import import_subscribers, claim_campaign, deliver_in_background, campaign_progress
 import logging
 
 # Serve the main React app
@@ -34,7 +53,7 @@ def register():
         user = User()
         user.username = data['username']
         user.email = data['email']
-        user.password_hash = generate_password_hash(data['password'])
+        user.password_hash = hash_password(data['password'])
         user.full_name = data['full_name']
         user.phone = data.get('phone', '')
         user.address = data.get('address', '')
@@ -52,6 +71,8 @@ def register():
             'user': user.to_dict()
         }), 201
         
+    except HashingBusy:
+        return jsonify({'error': 'سرور مشغول است، لطفا دوباره تلاش کنید'}), 503, {'Retry-After': '1'}
     except Exception as e:
         logging.error(f"Registration error: {str(e)}")
         return jsonify({'error': 'خطا در ثبت نام'}), 500
@@ -65,13 +86,21 @@ def login():
             return jsonify({'error': 'ایمیل و رمز عبور الزامی است'}), 400
         
         user = User.query.filter_by(email=data['email']).first()
+        if not user:
+            return jsonify({'error': 'ایمیل یا رمز عبور اشتباه است'}), 401
         
-        if not user or not user.check_password(data['password']):
+        matches, new_hash = verify_password(user.password_hash, data['password'])
+        if not matches:
             return jsonify({'error': 'ایمیل یا رمز عبور اشتباه است'}), 401
         
         if not user.is_active:
             return jsonify({'error': 'حساب کاربری غیرفعال است'}), 401
         
+        # Upgrade hashes made with older parameters
+        if new_hash:
+            user.password_hash = new_hash
+            db.session.commit()
+        
         access_token = create_access_token(identity=user.id)
         
         return jsonify({
@@ -80,6 +109,8 @@ def login():
             'user': user.to_dict()
         }), 200
         
+    except HashingBusy:
+        return jsonify({'error': 'سرور مشغول است، لطفا دوباره تلاش کنید'}), 503, {'Retry-After': '1'}
     except Exception as e:
         logging.error(f"Login error: {str(e)}")
         return jsonify({'error': 'خطا در ورود'}), 500
@@ -96,6 +127,9 @@ def get_profile():
 
 # Product routes
 @app.route('/api/products', methods=['GET'])
+@rate_limited
+@cached_response
+@read_replica
 def get_products():
     try:
         page = request.args.get('page', 1, type=int)
@@ -103,26 +137,56 @@ def get_products():
         category_id = request.args.get('category_id', type=int)
         search = request.args.get('search', '')
         
-        query = Product.query.filter_by(is_active=True)
+        try:
+            fields = parse_fields(Product, request.args.get('fields'), PRODUCT_LIST_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': f'فیلد نامعتبر: {e}'}), 400
+        
+        query = projected_query(Product, fields).filter_by(is_active=True)
         
         if category_id:
             query = query.filter_by(category_id=category_id)
         
         if search:
-            query = query.filter(
-                db.or_(
-                    Product.name.contains(search),
-                    Product.name_persian.contains(search),
-                    Product.description.contains(search),
-                    Product.description_persian.contains(search)
-                )
-            )
+            query = apply_search(query, search)
+        
+        # Facet filters: plain listings are paged from the in-process facet
+        # index, search results and cursor pages filter in SQL
+        selection = parse_selection(request.args)
+        if selection and not search and 'cursor' not in request.args:
+            if category_id:
+                selection['category_id'] = [category_id]
+            products, total = facet_page(query, selection, page, per_page)
+            pages = -(-total // per_page) if per_page > 0 else 0
+            return jsonify({
+                'products': [to_fields_dict(product, fields) for product in products],
+                'total': total,
+                'pages': pages,
+                'current_page': page,
+                'has_next': page < pages,
+                'has_prev': page > 1
+            }), 200
+        query = apply_facet_filters(query, selection)
+        
+        # Cursor mode: keyset pagination without a COUNT(*) per request
+        if 'cursor' in request.args:
+            try:
+                products, next_cursor = keyset_page(query, Product, request.args['cursor'], per_page)
+            except ValueError:
+                return jsonify({'error': 'cursor نامعتبر است'}), 400
+            
+            return jsonify({
+                'products': [to_fields_dict(product, fields) for product in products],
+                'total': cached_count(('products', category_id, search, repr(sorted(selection.items()))), query),
+                'next_cursor': next_cursor,
+                'has_next': next_cursor is not None
+            }), 200
         
         pagination = query.paginate(page=page, per_page=per_page, error_out=False)
         products = pagination.items
         
         return jsonify({
-            'products': [product.to_dict() for product in products],
+            'products': [to_fields_dict(product, fields) for product in products],
             'total': pagination.total,
             'pages': pagination.pages,
             'current_page': page,
@@ -134,13 +198,64 @@ def get_products():
         logging.error(f"Get products error: {str(e)}")
         return jsonify({'error': 'خطا در دریافت محصولات'}), 500
 
+@app.route('/api/products/facets', methods=['GET'])
+@rate_limited
+@cached_response
+@read_replica
+def get_product_facets():
+    # Live counts per brand, weight, category, price band and stock state for
+    # the same filters get_products takes
+    try:
+        selection = parse_selection(request.args)
+        category_id = request.args.get('category_id', type=int)
+        if category_id:
+            selection['category_id'] = [category_id]
+        
+        index = get_facet_index()
+        restrict = None
+        search = request.args.get('search', '')
+        if search:
+            matches = apply_search(Product.query.filter_by(is_active=True), search).with_entities(Product.id)
+            restrict = index.ids_mask(product_id for product_id, in matches)
+        
+        matches, counts = index.search(selection, restrict)
+        return jsonify({'total': matches.bit_count(), 'facets': counts}), 200
+    except Exception as e:
+        logging.error(f"Get product facets error: {str(e)}")
+        return jsonify({'error': 'خطا در دریافت فیلترها'}), 500
+
+@app.route('/api/products/suggest', methods=['GET'])
+@rate_limited
+@read_replica
+def get_product_suggestions():
+    # Type-ahead for the search box: best-selling products and brands whose
+    # words start with the query's words
+    try:
+        query = request.args.get('q', '').strip()
+        limit = min(max(request.args.get('limit', app.config['SUGGEST_LIMIT'], type=int), 1), 20)
+        if not query:
+            return jsonify({'query': query, 'products': [], 'brands': []}), 200
+        
+        return jsonify({'query': query, **suggest_products(query, limit)}), 200
+    except Exception as e:
+        logging.error(f"Product suggestions error: {str(e)}")
+        return jsonify({'error': 'خطا در دریافت پیشنهادها'}), 500
+
 @app.route('/api/products/<int:product_id>', methods=['GET'])
+@rate_limited
+@cached_response
+@read_replica
 def get_product(product_id):
     try:
-        product = Product.query.get_or_404(product_id)
-        if not product.is_active:
+        try:
+            fields = parse_fields(Product, request.args.get('fields'), PRODUCT_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': f'فیلد نامعتبر: {e}'}), 400
+        
+        product = projected_query(Product, fields).filter(Product.id == product_id).first()
+        if not product or not product.is_active:
             return jsonify({'error': 'محصول یافت نشد'}), 404
-        return jsonify({'product': product.to_dict()}), 200
+        return jsonify({'product': to_fields_dict(product, fields)}), 200
     except Exception as e:
         logging.error(f"Get product error: {str(e)}")
         return jsonify({'error': 'خطا در دریافت محصول'}), 500
@@ -151,30 +266,22 @@ def create_product():
     try:
         data = request.get_json()
         
-        required_fields = ['name', 'name_persian', 'price', 'category_id']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'{field} الزامی است'}), 400
+        try:
+            values = product_fields(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        product = Product()
-        product.name = data['name']
-        product.name_persian = data['name_persian']
-        product.description = data.get('description', '')
-        product.description_persian = data.get('description_persian', '')
-        product.price = float(data['price'])
-        product.stock_quantity = int(data.get('stock_quantity', 0))
-        product.image_url = data.get('image_url', '')
-        product.category_id = int(data['category_id'])
-        product.brand = data.get('brand', '')
-        product.weight = data.get('weight', '')
-        product.serving_size = data.get('serving_size', '')
-        product.servings_per_container = data.get('servings_per_container', 0)
-        product.ingredients = data.get('ingredients', '')
-        product.usage_instructions = data.get('usage_instructions', '')
-        product.warnings = data.get('warnings', '')
+        product = Product(**values)
         
         db.session.add(product)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Product names are unique; imports upsert on them
+            db.session.rollback()
+            return jsonify({'error': 'محصولی با این نام وجود دارد'}), 409
+        invalidate_counts('products')
+        bump_catalog_version()
         
         return jsonify({
             'message': 'محصول با موفقیت ایجاد شد',
@@ -185,8 +292,34 @@ def create_product():
         logging.error(f"Create product error: {str(e)}")
         return jsonify({'error': 'خطا در ایجاد محصول'}), 500
 
+@app.route('/api/admin/products/import', methods=['POST'])
+@admin_required
+def import_products_endpoint():
+    try:
+        # CSV or NDJSON body, parsed as a stream
+        format = request.args.get('format')
+        if not format:
+            format = 'csv' if request.mimetype == 'text/csv' else 'ndjson'
+        if format not in ('csv', 'ndjson'):
+            return jsonify({'error': 'فرمت فایل پشتیبانی نمی‌شود'}), 400
+        
+        report = import_products(request.stream, format)
+        
+        return jsonify({
+            'message': 'درون‌ریزی محصولات انجام شد',
+            'report': report
+        }), 200
+        
+    except Exception as e:
+        logging.error(f"Import products error: {str(e)}")
+        db.session.rollback()
+        return jsonify({'error': 'خطا در درون‌ریزی محصولات'}), 500
+
 # Category routes
 @app.route('/api/categories', methods=['GET'])
+@rate_limited
+@cached_response
+@read_replica
 def get_categories():
     try:
         categories = Category.query.all()
@@ -213,6 +346,7 @@ def create_category():
         
         db.session.add(category)
         db.session.commit()
+        bump_catalog_version()
         
         return jsonify({
             'message': 'دسته‌بندی با موفقیت ایجاد شد',
@@ -239,24 +373,42 @@ def create_order():
         if not data['items'] or len(data['items']) == 0:
             return jsonify({'error': 'سبد خرید خالی است'}), 400
         
-        # Calculate total and validate items
-        total_amount = 0
-        order_items = []
-        
+        # Validate items and load every product in a single query
+        quantities = {}
         for item in data['items']:
-            product = Product.query.get(item.get('product_id'))
-            if not product or not product.is_active:
+            try:
+                product_id = int(item.get('product_id'))
+            except (TypeError, ValueError):
                 return jsonify({'error': f'محصول {item.get("product_id")} یافت نشد'}), 400
             
             quantity = int(item.get('quantity', 0))
             if quantity <= 0:
                 return jsonify({'error': 'تعداد محصولات باید بیشتر از صفر باشد'}), 400
             
-            if product.stock_quantity < quantity:
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        
+        products = {
+            product.id: product
+            for product in product_query().filter(Product.id.in_(quantities.keys())).all()
+        }
+        
+        # Units other buyers hold in their carts aren't for sale
+        held = held_by_others(products.keys(), user.id)
+        
+        # Calculate total
+        total_amount = 0
+        order_items = []
+        
+        for item in data['items']:
+            product = products.get(int(item['product_id']))
+            if not product or not product.is_active:
+                return jsonify({'error': f'محصول {item.get("product_id")} یافت نشد'}), 400
+            
+            if product.stock_quantity - held.get(product.id, 0) < quantities[product.id]:
                 return jsonify({'error': f'موجودی کافی برای محصول {product.name_persian} نیست'}), 400
             
-            item_total = product.price * quantity
-            total_amount += item_total
+            quantity = int(item['quantity'])
+            total_amount += product.price * quantity
             
             order_items.append({
                 'product': product,
@@ -275,7 +427,14 @@ def create_order():
         db.session.add(order)
         db.session.flush()  # Get order ID
         
-        # Add order items and update stock
+        # Reserve stock with conditional updates; another checkout may have
+        # taken the last units since the products were loaded
+        failed_id = reserve_stock({product_id: quantities[product_id] for product_id in products})
+        if failed_id is not None:
+            db.session.rollback()
+            return jsonify({'error': f'موجودی کافی برای محصول {products[failed_id].name_persian} نیست'}), 400
+        
+        # Add order items
         for item_data in order_items:
             order_item = OrderItem()
             order_item.order_id = order.id
@@ -283,11 +442,10 @@ def create_order():
             order_item.quantity = item_data['quantity']
             order_item.price = item_data['price']
             db.session.add(order_item)
-            
-            # Update stock
-            item_data['product'].stock_quantity -= item_data['quantity']
         
         db.session.commit()
+        invalidate_counts('orders', user.id)
+        publish_stock_changes(quantities)
         
         return jsonify({
             'message': 'سفارش با موفقیت ثبت شد',
@@ -304,7 +462,24 @@ def create_order():
 def get_user_orders():
     try:
         user = get_current_user()
-        orders = Order.query.filter_by(user_id=user.id).order_by(Order.created_at.desc()).all()
+        query = order_query().filter_by(user_id=user.id)
+        
+        # Cursor mode: return the order history a page at a time
+        if 'cursor' in request.args:
+            per_page = request.args.get('per_page', 10, type=int)
+            try:
+                orders, next_cursor = keyset_page(query, Order, request.args['cursor'], per_page)
+            except ValueError:
+                return jsonify({'error': 'cursor نامعتبر است'}), 400
+            
+            return jsonify({
+                'orders': [order.to_dict() for order in orders],
+                'total': cached_count(('orders', user.id), query),
+                'next_cursor': next_cursor,
+                'has_next': next_cursor is not None
+            }), 200
+        
+        orders = query.order_by(Order.created_at.desc()).all()
         
         return jsonify({
             'orders': [order.to_dict() for order in orders]
@@ -316,19 +491,41 @@ def get_user_orders():
 
 # Blog routes
 @app.route('/api/blog', methods=['GET'])
+@read_replica
 def get_blog_posts():
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 6, type=int)
         
-        pagination = BlogPost.query.filter_by(is_published=True).order_by(
+        try:
+            fields = parse_fields(BlogPost, request.args.get('fields'), BLOG_POST_LIST_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': f'فیلد نامعتبر: {e}'}), 400
+        
+        query = projected_query(BlogPost, fields).filter_by(is_published=True)
+        
+        # Cursor mode: keyset pagination without a COUNT(*) per request
+        if 'cursor' in request.args:
+            try:
+                posts, next_cursor = keyset_page(query, BlogPost, request.args['cursor'], per_page)
+            except ValueError:
+                return jsonify({'error': 'cursor نامعتبر است'}), 400
+            
+            return jsonify({
+                'posts': [to_fields_dict(post, fields) for post in posts],
+                'total': cached_count(('blog',), query),
+                'next_cursor': next_cursor,
+                'has_next': next_cursor is not None
+            }), 200
+        
+        pagination = query.order_by(
             BlogPost.created_at.desc()
         ).paginate(page=page, per_page=per_page, error_out=False)
         
         posts = pagination.items
         
         return jsonify({
-            'posts': [post.to_dict() for post in posts],
+            'posts': [to_fields_dict(post, fields) for post in posts],
             'total': pagination.total,
             'pages': pagination.pages,
             'current_page': page,
@@ -341,12 +538,18 @@ def get_blog_posts():
         return jsonify({'error': 'خطا در دریافت مقالات'}), 500
 
 @app.route('/api/blog/<int:post_id>', methods=['GET'])
+@read_replica
 def get_blog_post(post_id):
     try:
-        post = BlogPost.query.get_or_404(post_id)
+        try:
+            fields = parse_fields(BlogPost, request.args.get('fields'), BLOG_POST_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': f'فیلد نامعتبر: {e}'}), 400
+        
+        post = projected_query(BlogPost, fields).get_or_404(post_id)
         if not post.is_published:
             return jsonify({'error': 'مقاله یافت نشد'}), 404
-        return jsonify({'post': post.to_dict()}), 200
+        return jsonify({'post': to_fields_dict(post, fields)}), 200
     except Exception as e:
         logging.error(f"Get blog post error: {str(e)}")
         return jsonify({'error': 'خطا در دریافت مقاله'}), 500
@@ -379,6 +582,7 @@ def create_blog_post():
         
         db.session.add(post)
         db.session.commit()
+        invalidate_counts('blog')
         
         return jsonify({
             'message': 'مقاله با موفقیت ایجاد شد',
@@ -419,27 +623,114 @@ def subscribe_newsletter():
         logging.error(f"Newsletter subscription error: {str(e)}")
         return jsonify({'error': 'خطا در عضویت خبرنامه'}), 500
 
+@app.route('/api/admin/newsletter/import', methods=['POST'])
+@admin_required
+def import_subscribers_endpoint():
+    try:
+        # CSV (with an "email" column) or NDJSON body, parsed as a stream
+        format = request.args.get('format')
+        if not format:
+            format = 'csv' if request.mimetype == 'text/csv' else 'ndjson'
+        if format not in ('csv', 'ndjson'):
+            return jsonify({'error': 'فرمت فایل پشتیبانی نمی‌شود'}), 400
+        
+        report = import_subscribers(request.stream, format)
+        
+        return jsonify({
+            'message': 'درون‌ریزی مشترکین انجام شد',
+            'report': report
+        }), 200
+        
+    except Exception as e:
+        logging.error(f"Import subscribers error: {str(e)}")
+        db.session.rollback()
+        return jsonify({'error': 'خطا در درون‌ریزی مشترکین'}), 500
+
+@app.route('/api/admin/newsletter/campaigns', methods=['POST'])
+@admin_required
+def create_newsletter_campaign():
+    try:
+        data = request.get_json()
+        
+        for field in ['subject', 'body_html']:
+            if not data.get(field):
+                return jsonify({'error': f'{field} الزامی است'}), 400
+        
+        campaign = NewsletterCampaign()
+        campaign.subject = data['subject']
+        campaign.body_html = data['body_html']
+        campaign.body_text = data.get('body_text')
+        
+        db.session.add(campaign)
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'خبرنامه با موفقیت ایجاد شد',
+            'campaign': campaign.to_dict()
+        }), 201
+        
+    except Exception as e:
+        logging.error(f"Create newsletter campaign error: {str(e)}")
+        return jsonify({'error': 'خطا در ایجاد خبرنامه'}), 500
+
+@app.route('/api/admin/newsletter/campaigns/<int:campaign_id>/send', methods=['POST'])
+@admin_required
+def send_newsletter_campaign(campaign_id):
+    try:
+        campaign = db.session.get(NewsletterCampaign, campaign_id)
+        if not campaign:
+            return jsonify({'error': 'خبرنامه یافت نشد'}), 404
+        if campaign.status == 'sent':
+            return jsonify({'error': 'این خبرنامه قبلا ارسال شده است'}), 400
+        
+        # Claimed here so a second send gets a 409 while a run holds the
+        # campaign. Delivery runs in the background; a stopped run can be
+        # resumed by sending again once its lease has expired.
+        owner = claim_campaign(campaign_id)
+        if owner is None:
+            return jsonify({'error': 'این خبرنامه در حال ارسال است'}), 409
+        deliver_in_background(campaign_id, owner)
+        db.session.refresh(campaign)
+        
+        return jsonify({
+            'message': 'ارسال خبرنامه آغاز شد',
+            'campaign': campaign.to_dict()
+        }), 202
+        
+    except Exception as e:
+        logging.error(f"Send newsletter campaign error: {str(e)}")
+        return jsonify({'error': 'خطا در ارسال خبرنامه'}), 500
+
+@app.route('/api/admin/newsletter/campaigns/<int:campaign_id>', methods=['GET'])
+@admin_required
+def get_newsletter_campaign(campaign_id):
+    try:
+        campaign = db.session.get(NewsletterCampaign, campaign_id)
+        if not campaign:
+            return jsonify({'error': 'خبرنامه یافت نشد'}), 404
+        
+        return jsonify({
+            'campaign': campaign.to_dict(),
+            'deliveries': campaign_progress(campaign_id)
+        }), 200
+        
+    except Exception as e:
+        logging.error(f"Get newsletter campaign error: {str(e)}")
+        return jsonify({'error': 'خطا در دریافت خبرنامه'}), 500
+
 # Admin dashboard routes
 @app.route('/api/admin/dashboard', methods=['GET'])
 @admin_required
 def admin_dashboard():
     try:
-        # Get dashboard statistics
-        total_users = User.query.filter_by(role='customer').count()
-        total_products = Product.query.filter_by(is_active=True).count()
-        total_orders = Order.query.count()
-        total_revenue = db.session.query(db.func.sum(Order.total_amount)).scalar() or 0
+        # Dashboard statistics are maintained incrementally
+        stats = get_dashboard_stats()
         
         # Recent orders
-        recent_orders = Order.query.order_by(Order.created_at.desc()).limit(5).all()
+        recent_orders = order_query().order_by(Order.created_at.desc()).limit(5).all()
         
         return jsonify({
-            'stats': {
-                'total_users': total_users,
-                'total_products': total_products,
-                'total_orders': total_orders,
-                'total_revenue': total_revenue
-            },
+            'stats': stats,
             'recent_orders': [order.to_dict() for order in recent_orders]
         }), 200
         
@@ -447,5 +738,65 @@ def admin_dashboard():
         logging.error(f"Admin dashboard error: {str(e)}")
         return jsonify({'error': 'خطا در دریافت اطلاعات داشبورد'}), 500
 
+@app.route('/api/admin/analytics/sales', methods=['GET'])
+@admin_required
+def sales_analytics():
+    try:
+        granularity = request.args.get('granularity', 'day')
+        if granularity not in GRANULARITIES:
+            return jsonify({'error': 'بازه گروه‌بندی باید day، week یا month باشد'}), 400
+        
+        try:
+            start, end = parse_day_range(request.args.get('start'), request.args.get('end'))
+            window = int(request.args.get('window', 7))
+            top = int(request.args.get('top', 10))
+        except ValueError:
+            return jsonify({'error': 'پارامترهای گزارش نامعتبر است'}), 400
+        window = min(max(window, 1), 90)
+        top = min(max(top, 1), 100)
+        
+        # Reads only the daily rollups; new orders are folded in first
+        refresh_rollups_if_due()
+        return jsonify(sales_report(start, end, granularity, window, top)), 200
+        
+    except Exception as e:
+        logging.error(f"Sales analytics error: {str(e)}")
+        return jsonify({'error': 'خطا در دریافت گزارش فروش'}), 500
+
+@app.route('/api/admin/orders/export', methods=['GET'])
+@admin_required
+def export_orders():
+    try:
+        format = request.args.get('format', 'ndjson')
+        if format not in ('csv', 'ndjson'):
+            return jsonify({'error': 'فرمت فایل پشتیبانی نمی‌شود'}), 400
+        
+        try:
+            start = parse_date(request.args.get('start'))
+            end = parse_date(request.args.get('end'), end=True)
+        except ValueError:
+            return jsonify({'error': 'تاریخ نامعتبر است'}), 400
+        
+        query = export_query(start, end, request.args.get('status'))
+        
+        # Stream the rows instead of building the whole export in memory
+        if format == 'csv':
+            body, mimetype = csv_stream(query), 'text/csv'
+        else:
+            body, mimetype = ndjson_stream(query), 'application/x-ndjson'
+        
+        response = app.response_class(stream_with_context(body), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename=orders.{format}'
+        return response
+        
+    except Exception as e:
+        logging.error(f"Export orders error: {str(e)}")
+        return jsonify({'error': 'خطا در دریافت خروجی سفارشات'}), 500
+
+@app.route('/api/admin/cache/stats', methods=['GET'])
+@admin_required
+def catalog_cache_stats():
+    return jsonify({'catalog_cache': get_cache_stats()}), 200
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8000, debug=True)
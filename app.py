@@ -4,65 +4,118 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
+from database import RoutingSession, REPLICA_BIND, engine_options
+from logging_config import configure_logging
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Configure logging (JSON lines; level from LOG_LEVEL)
+configure_logging()
 
 class Base(DeclarativeBase):
     pass
 
-db = SQLAlchemy(model_class=Base)
+db = SQLAlchemy(model_class=Base, session_options={'class_': RoutingSession})
 
-# Create the app
+# The one application instance. Route, CLI and event modules register on it
+# with "from app import app", so create_app() configures this instance rather
+# than building a new one.
 app = Flask(__name__)
 
-# Configure CORS for API communication with React
-CORS(app, origins=["http://localhost:5000", "http://0.0.0.0:5000"], supports_credentials=True)
-
-# Configure JWT
-app.config['JWT_SECRET_KEY'] = os.environ.get("SESSION_SECRET", "your-secret-key")
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = False  # Tokens don't expire for simplicity
-jwt = JWTManager(app)
-
-app.secret_key = os.environ.get("SESSION_SECRET", "your-secret-key")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
-
-# Configure the database
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///zoorkhan.db")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
-
-# Initialize the app with the extension
-db.init_app(app)
-
-with app.app_context():
-    # Import models and routes
-    import models
-    import auth
-    import api_routes
-    
-    # Create all tables
-    db.create_all()
-    
-    # Create admin user if not exists
+def create_app():
+    # Configure the app and import every module that registers routes, model
+    # events and CLI commands. No database I/O happens here; the schema and
+    # seed data come from bootstrap() (`flask bootstrap`, or gunicorn's
+    # on_starting hook in gunicorn.conf.py).
+    if 'sqlalchemy' in app.extensions:
+        return app
+
+    # Configure CORS for API communication with React
+    CORS(app, origins=["http://localhost:5000", "http://0.0.0.0:5000"], supports_credentials=True)
+
+    # Configure JWT
+    app.config['JWT_SECRET_KEY'] = os.environ.get("SESSION_SECRET", "your-secret-key")
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = False  # Tokens don't expire for simplicity
+    JWTManager(app)
+
+    app.secret_key = os.environ.get("SESSION_SECRET", "your-secret-key")
+    # Proxies in front of the app whose X-Forwarded-For entry is trusted for
+    # the client address; 0 uses the connecting address (see rate_limit.py)
+    app.config['PROXY_X_FOR'] = int(os.environ.get("PROXY_X_FOR", 0))
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_X_FOR'], x_proto=1, x_host=1)
+
+    # Configure the database
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///zoorkhan.db")
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
+
+    # Optional read replica for read-only GET endpoints (see database.read_replica)
+    replica_url = os.environ.get("DATABASE_REPLICA_URL")
+    if replica_url:
+        app.config["SQLALCHEMY_BINDS"] = {
+            REPLICA_BIND: {"url": replica_url, **engine_options(replica_url)},
+        }
+
+    # Initialize the app with the extension
+    db.init_app(app)
+
+    with app.app_context():
+        # Import models and routes
+        import models
+        import auth
+        import api_routes
+        import assets
+        import query_plans
+        import migrations
+        import metrics
+        import batch
+        import cart
+
+    return app
+
+def bootstrap():
+    # Schema and seed data. Safe to run repeatedly and from several processes.
+    from migrations import upgrade
+    from search import ensure_search_index
+    from dashboard_stats import ensure_dashboard_stats
     from models import User
-    from werkzeug.security import generate_password_hash
-    
+    from passwords import hash_password
+
+    # Create or upgrade the schema
+    upgrade()
+
+    # Create the product search index and backfill it if needed
+    ensure_search_index()
+
+    # Seed the dashboard counters
+    ensure_dashboard_stats()
+
+    # Create admin user if not exists
     admin = User.query.filter_by(email='admin@zoorkhan.com').first()
     if not admin:
         admin_user = User()
         admin_user.username = 'admin'
         admin_user.email = 'admin@zoorkhan.com'
-        admin_user.password_hash = generate_password_hash('admin123')
+        admin_user.password_hash = hash_password('admin123')
         admin_user.role = 'admin'
         admin_user.full_name = 'مدیر سیستم'
         db.session.add(admin_user)
-        db.session.commit()
-        logging.info("Admin user created: admin@zoorkhan.com / admin123")
+        try:
+            db.session.commit()
+            logging.info("Admin user created: admin@zoorkhan.com / admin123")
+        except IntegrityError:
+            # Created by another process bootstrapping at the same time
+            db.session.rollback()
+
+@app.cli.command('bootstrap')
+def bootstrap_command():
+    """Create or upgrade the schema and seed the initial data."""
+    bootstrap()
+    print("Bootstrap complete")
+
+create_app()
 
 if __name__ == '__main__':
+    with app.app_context():
+        bootstrap()
     app.run(host='0.0.0.0', port=8000, debug=True)
@@ -0,0 +1,143 @@
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+from flask import request, send_from_directory, url_for, abort
+from app import app
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, .br variants are skipped without it
+    brotli = None
+
+# Bundles in the order index.html loads them. static/js/utils/ holds older
+# copies of the API and Auth classes that the page never loads, so they are
+# left out.
+BUNDLES = {
+    'app.js': [
+        'js/api.js',
+        'js/auth.js',
+        'js/components/Header.js',
+        'js/components/ProductCard.js',
+        'js/components/Cart.js',
+        'js/components/Admin.js',
+        'js/components/Dashboard.js',
+        'js/components/Blog.js',
+        'js/app.js',
+    ],
+    'app.css': [
+        'css/style.css',
+    ],
+}
+DIST_DIR = os.path.join(app.static_folder, 'dist')
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+
+# Minification
+# Conservative on purpose: only whitespace and comments that can't be part of
+# a string or template literal are removed.
+_CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+_CSS_SPACE_RE = re.compile(r'\s*([{};,>])\s*')
+
+def minify_js(source):
+    lines = []
+    for line in source.splitlines():
+        line = line.strip()
+        if not line or line.startswith('//'):
+            continue
+        lines.append(line)
+    return '\n'.join(lines)
+
+def minify_css(source):
+    source = _CSS_COMMENT_RE.sub('', source)
+    source = _CSS_SPACE_RE.sub(r'\1', source)
+    return re.sub(r'\s+', ' ', source).strip()
+
+# Build
+def _write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+def build_assets():
+    os.makedirs(DIST_DIR, exist_ok=True)
+    manifest = {}
+    for name, sources in BUNDLES.items():
+        parts = []
+        for source in sources:
+            with open(os.path.join(app.static_folder, source), encoding='utf-8') as f:
+                parts.append(f.read())
+
+        if name.endswith('.js'):
+            # Separate files with ';' in case one ends without a semicolon
+            content = ';\n'.join(minify_js(part) for part in parts)
+        else:
+            content = '\n'.join(minify_css(part) for part in parts)
+        data = content.encode('utf-8')
+
+        stem, ext = os.path.splitext(name)
+        filename = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+        path = os.path.join(DIST_DIR, filename)
+        _write(path, data)
+        _write(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            _write(path + '.br', brotli.compress(data, quality=11))
+
+        manifest[name] = filename
+        logging.info(f"Built {filename} ({len(data)} bytes from {len(sources)} files)")
+
+    # Drop bundles from earlier builds
+    current = set(manifest.values())
+    for filename in os.listdir(DIST_DIR):
+        if filename != 'manifest.json' and re.sub(r'\.(gz|br)$', '', filename) not in current:
+            os.remove(os.path.join(DIST_DIR, filename))
+
+    with open(MANIFEST_PATH, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    _manifest_cache.clear()
+    return manifest
+
+# Flask integration
+_manifest_cache = {}
+
+def _manifest():
+    if 'manifest' not in _manifest_cache or app.debug:
+        try:
+            with open(MANIFEST_PATH) as f:
+                _manifest_cache['manifest'] = json.load(f)
+        except (OSError, ValueError):
+            _manifest_cache['manifest'] = {}
+    return _manifest_cache['manifest']
+
+@app.template_global()
+def asset_url(name):
+    # URL of the fingerprinted bundle, or None when assets haven't been built
+    filename = _manifest().get(name)
+    return url_for('serve_asset', filename=filename) if filename else None
+
+@app.route('/assets/<path:filename>')
+def serve_asset(filename):
+    if filename not in _manifest().values():
+        abort(404)
+
+    # Serve a precompressed variant when the client accepts it
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    served, encoding = filename, None
+    for candidate, extension in (('br', '.br'), ('gzip', '.gz')):
+        if candidate in request.accept_encodings and os.path.exists(os.path.join(DIST_DIR, filename + extension)):
+            served, encoding = filename + extension, candidate
+            break
+
+    response = send_from_directory(DIST_DIR, served, mimetype=mimetype, max_age=31536000)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Bundle, minify, fingerprint and precompress the static assets."""
+    for name, filename in build_assets().items():
+        print(f"{name} -> dist/{filename}")
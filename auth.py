@@ -1,17 +1,65 @@
-from flask import request, jsonify
+import threading
+import time
+from flask import request, jsonify, g
 from flask_jwt_extended import create_access_token, verify_jwt_in_request, get_jwt_identity
 from functools import wraps
-from app import app, db
+from sqlalchemy import event, inspect
+from app import app
 from models import User
 
+# Seconds an identity's (role, is_active) stays cached per process; 0 disables
+app.config.setdefault('IDENTITY_CACHE_TTL', 60)
+
+_identities = {}
+_identities_lock = threading.Lock()
+
+def _cached_identity(user_id):
+    with _identities_lock:
+        entry = _identities.get(str(user_id))
+    if entry and entry[2] > time.monotonic():
+        return entry[0], entry[1]
+    return None
+
+def _cache_identity(user):
+    ttl = app.config['IDENTITY_CACHE_TTL']
+    if not ttl or user is None:
+        return
+    with _identities_lock:
+        _identities[str(user.id)] = (user.role, user.is_active, time.monotonic() + ttl)
+
+def invalidate_identity(user_id):
+    with _identities_lock:
+        _identities.pop(str(user_id), None)
+
+@event.listens_for(User, 'after_update')
+def _user_updated(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.role.history.has_changes() or state.attrs.is_active.history.has_changes():
+        invalidate_identity(target.id)
+
+@event.listens_for(User, 'after_delete')
+def _user_deleted(mapper, connection, target):
+    invalidate_identity(target.id)
+
+def _load_user(user_id):
+    # Resolve the user once per request and keep it on flask.g
+    if 'current_user' not in g:
+        g.current_user = User.query.get(user_id)
+        _cache_identity(g.current_user)
+    return g.current_user
+
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         try:
             verify_jwt_in_request()
             current_user_id = get_jwt_identity()
-            user = User.query.get(current_user_id)
-            if not user or user.role != 'admin':
+            identity = _cached_identity(current_user_id)
+            if identity is None:
+                user = _load_user(current_user_id)
+                identity = (user.role, user.is_active) if user else None
+            # Deactivated admins lose access, whether cached or freshly loaded
+            if not identity or identity[0] != 'admin' or not identity[1]:
                 return jsonify({'error': 'دسترسی محدود به مدیران'}), 403
         except Exception as e:
             return jsonify({'error': 'لطفا وارد شوید'}), 401
@@ -24,7 +72,7 @@ def login_required(f):
         try:
             verify_jwt_in_request()
             current_user_id = get_jwt_identity()
-            user = User.query.get(current_user_id)
+            user = _load_user(current_user_id)
             if not user:
                 return jsonify({'error': 'کاربر یافت نشد'}), 404
         except Exception as e:
@@ -33,9 +81,11 @@ def login_required(f):
     return decorated_function
 
 def get_current_user():
+    if 'current_user' in g:
+        return g.current_user
     try:
         verify_jwt_in_request()
         current_user_id = get_jwt_identity()
-        return User.query.get(current_user_id)
+        return _load_user(current_user_id)
     except:
         return None
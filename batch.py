@@ -0,0 +1,84 @@
+import io
+import logging
+from urllib.parse import urlsplit, unquote
+from flask import request, jsonify
+from werkzeug.exceptions import HTTPException
+from app import app, db
+
+# Multiplexed GET requests for the SPA's first paint. Sub-requests run inside
+# the batch's app context, so they share flask.g (the user resolved by
+# login_required, the decoded JWT) and the scoped DB session. They inherit the
+# batch's headers, which is what makes sharing the user safe: every item is
+# made with the same credentials. before/after_request hooks run once for the
+# whole batch, so /metrics and Server-Timing report the batch as one request.
+app.config.setdefault('BATCH_MAX_REQUESTS', 10)
+
+# Endpoints that can't be answered as a JSON item
+BATCH_EXCLUDED_ENDPOINTS = {'batch', 'export_orders'}
+
+def _sub_environ(path, query):
+    environ = dict(request.environ)
+    for key in ('werkzeug.request', 'CONTENT_TYPE', 'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE'):
+        environ.pop(key, None)
+    environ.update({
+        'REQUEST_METHOD': 'GET',
+        # PATH_INFO is the decoded path as latin-1, per WSGI
+        'PATH_INFO': unquote(path).encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': query,
+        'CONTENT_LENGTH': '0',
+        'wsgi.input': io.BytesIO(),
+    })
+    return environ
+
+def _item_error(status, message):
+    return status, {'error': message}
+
+def _dispatch(path):
+    # Returns (status, body) for one GET sub-request
+    parts = urlsplit(path)
+    if parts.scheme or parts.netloc or not parts.path.startswith('/api/'):
+        return _item_error(400, 'فقط مسیرهای /api/ مجاز هستند')
+
+    with app.request_context(_sub_environ(parts.path, parts.query)):
+        if request.url_rule is not None and request.url_rule.endpoint in BATCH_EXCLUDED_ENDPOINTS:
+            return _item_error(400, 'این مسیر در درخواست گروهی پشتیبانی نمی‌شود')
+        try:
+            response = app.make_response(app.dispatch_request())
+        except HTTPException as e:
+            return _item_error(e.code, e.description)
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Batch item error: {str(e)}")
+            return _item_error(500, 'خطا در پردازش درخواست')
+
+        if response.is_streamed:
+            response.close()
+            return _item_error(400, 'این مسیر در درخواست گروهی پشتیبانی نمی‌شود')
+        if response.status_code >= 500:
+            db.session.rollback()
+        return response.status_code, response.get_json(silent=True)
+
+@app.route('/api/batch', methods=['POST'])
+def batch():
+    try:
+        data = request.get_json(silent=True) or {}
+        items = data.get('requests')
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'فهرست درخواست‌ها الزامی است'}), 400
+        if len(items) > app.config['BATCH_MAX_REQUESTS']:
+            return jsonify({'error': f"حداکثر {app.config['BATCH_MAX_REQUESTS']} درخواست مجاز است"}), 400
+
+        # Items are either a path or {"id": ..., "path": ...}
+        responses = []
+        for index, item in enumerate(items):
+            if isinstance(item, str):
+                item = {'path': item}
+            if not isinstance(item, dict) or not isinstance(item.get('path'), str):
+                return jsonify({'error': f'درخواست شماره {index + 1} نامعتبر است'}), 400
+            status, body = _dispatch(item['path'])
+            responses.append({'id': item.get('id', index), 'status': status, 'body': body})
+
+        return jsonify({'responses': responses}), 200
+    except Exception as e:
+        logging.error(f"Batch error: {str(e)}")
+        return jsonify({'error': 'خطا در پردازش درخواست گروهی'}), 500
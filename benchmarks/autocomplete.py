@@ -0,0 +1,88 @@
+"""Autocomplete latency: the prefix index against LIKE queries.
+
+Builds a synthetic catalog with order history, then replays queries as they
+would be typed (every prefix of a few words taken from product names and
+brands, in English and Persian) through the suggest index and through a
+LIKE '%...%' query over name, name_persian and brand.
+
+Usage: python benchmarks/autocomplete.py [--products 100000] [--orders 200000] [--words 300]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--orders', type=int, default=200000)
+    parser.add_argument('--words', type=int, default=300, help='Words to type, one prefix at a time.')
+    parser.add_argument('--like-queries', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'autocomplete.db'))
+    from app import app, db, bootstrap
+    from models import Product
+    from suggest import get_suggest_index, suggest_products
+    from synthetic_data import generate
+
+    rng = random.Random(args.seed)
+    with app.app_context():
+        bootstrap()
+        if Product.query.count() < args.products:
+            start = time.perf_counter()
+            generate(db, products=args.products, users=args.users, orders=args.orders, posts=0, seed=args.seed)
+            print(f"generated {args.products:,} products and {args.orders:,} orders in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        index = get_suggest_index()
+        print(f"index: {len(index.products):,} products, {len(index.vocabulary):,} terms, "
+              f"built in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+        # Two-word phrases from real names, typed one character at a time
+        samples = Product.query.with_entities(Product.name, Product.name_persian, Product.brand).limit(5000).all()
+        queries = []
+        for _ in range(args.words):
+            text = rng.choice(rng.choice(samples))
+            words = text.split()
+            start = rng.randrange(max(1, len(words) - 1))
+            phrase = ' '.join(words[start:start + 2])
+            queries += [phrase[:length] for length in range(1, len(phrase) + 1) if phrase[:length].strip()]
+
+        latencies = []
+        empty = 0
+        for query in queries:
+            start = time.perf_counter()
+            result = suggest_products(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+            empty += not result['products']
+
+        like = []
+        for query in rng.sample(queries, min(args.like_queries, len(queries))):
+            pattern = f'%{query}%'
+            start = time.perf_counter()
+            Product.query.filter(
+                Product.is_active == True,
+                db.or_(Product.name.ilike(pattern), Product.name_persian.ilike(pattern), Product.brand.ilike(pattern))
+            ).limit(8).all()
+            like.append((time.perf_counter() - start) * 1000)
+
+        print(f"{len(queries):,} keystroke queries, {empty} without product matches")
+        print(f"{'':8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'mean ms':>10}")
+        for name, values in (('index', latencies), ('like', like)):
+            print(f"{name:8}{percentile(values, 50):10.3f}{percentile(values, 99):10.3f}"
+                  f"{max(values):10.3f}{statistics.mean(values):10.3f}")
+
+if __name__ == '__main__':
+    main()
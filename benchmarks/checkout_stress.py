@@ -0,0 +1,100 @@
+"""Many concurrent buyers checking out the same SKU; verifies stock never oversells.
+
+By default every buyer posts an order directly. With --cart, buyers first put
+the SKU in the server-side cart, which holds stock, and only those whose hold
+succeeded check out. SQL statements per path come from Server-Timing.
+
+Usage: python benchmarks/checkout_stress.py [--buyers 200] [--stock 50] [--threads 32] [--cart]
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--buyers', type=int, default=200)
+    parser.add_argument('--stock', type=int, default=50)
+    parser.add_argument('--quantity', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--cart', action='store_true', help='Hold stock in the server-side cart before checkout.')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'stress.db'))
+    from flask_jwt_extended import create_access_token
+    from werkzeug.security import generate_password_hash
+    from app import app, db, bootstrap
+    from models import User, Product, Category, Order, OrderItem
+
+    with app.app_context():
+        bootstrap()
+        category = Category(name='Stress', name_persian='تست')
+        db.session.add(category)
+        db.session.flush()
+        product = Product(name='Hot SKU', name_persian='محصول پرفروش', price=1000.0,
+                          stock_quantity=args.stock, category_id=category.id, is_active=True)
+        db.session.add(product)
+        password_hash = generate_password_hash('buyer')
+        db.session.execute(db.insert(User), [
+            {'username': f'buyer{i}', 'email': f'buyer{i}@example.com',
+             'password_hash': password_hash, 'role': 'customer', 'is_active': True}
+            for i in range(args.buyers)
+        ])
+        db.session.commit()
+        product_id = product.id
+        user_ids = [user.id for user in User.query.filter(User.username.like('buyer%')).all()]
+        tokens = [create_access_token(identity=str(user_id)) for user_id in user_ids]
+
+    def queries(response):
+        match = re.search(r'"(\d+) queries"', response.headers.get('Server-Timing', ''))
+        return int(match.group(1)) if match else 0
+
+    def checkout(token):
+        # Returns (final status, SQL statements issued for this buyer)
+        client = app.test_client()
+        headers = {'Authorization': f'Bearer {token}'}
+        order = {'shipping_address': 'تهران', 'phone': '09120000000'}
+        if not args.cart:
+            response = client.post('/api/orders', headers=headers, json={
+                'items': [{'product_id': product_id, 'quantity': args.quantity}], **order
+            })
+            return response.status_code, queries(response)
+
+        held = client.put(f'/api/cart/items/{product_id}', headers=headers, json={'quantity': args.quantity})
+        if held.status_code != 200:
+            return held.status_code, queries(held)
+        response = client.post('/api/cart/checkout', headers=headers, json=order)
+        return response.status_code, queries(held) + queries(response)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(checkout, tokens))
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        stock = db.session.get(Product, product_id).stock_quantity
+        sold = db.session.query(db.func.coalesce(db.func.sum(OrderItem.quantity), 0)).filter(
+            OrderItem.product_id == product_id
+        ).scalar()
+        orders = Order.query.count()
+
+    statuses = [status for status, _ in results]
+    summary = {status: statuses.count(status) for status in sorted(set(statuses))}
+    failed = [count for status, count in results if status != 201]
+    print(f"{args.buyers} buyers via {'cart holds' if args.cart else 'direct orders'} in {elapsed:.2f}s, "
+          f"responses: {summary}")
+    print(f"SQL statements: {sum(count for _, count in results)} total, "
+          f"{sum(failed) / max(1, len(failed)):.1f} per failed buyer")
+    print(f"orders: {orders}, units sold: {sold}, stock left: {stock}")
+    assert stock >= 0, 'stock went negative'
+    assert sold + stock == args.stock, 'sold units and remaining stock do not add up'
+    assert sold <= args.stock, 'oversold'
+    print("OK: no oversell")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Per-worker cold start: importing the app with and without the bootstrap work.
+
+"before" is what every worker used to do on import (load the app, then check
+the schema, search index, dashboard counters and admin user). "after" is the
+plain import a worker now does; with preload_app even that happens once in
+the gunicorn master. Each run is a fresh interpreter against an already
+bootstrapped database.
+
+Usage: python benchmarks/cold_start.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER = '''
+import json, logging, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+logging.disable(logging.CRITICAL)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+queries = []
+event.listen(Engine, 'before_cursor_execute', lambda *args: queries.append(1))
+from main import app
+if {bootstrap!r}:
+    from app import bootstrap
+    with app.app_context():
+        bootstrap()
+print(json.dumps({{'seconds': time.perf_counter() - start, 'queries': len(queries)}}))
+'''
+
+def run(bootstrap, env):
+    code = WORKER.format(root=ROOT, bootstrap=bootstrap)
+    output = subprocess.run([sys.executable, '-c', code], env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'cold.db'))
+    run(True, env)  # create the schema and seed data once
+
+    for label, bootstrap in (('before', True), ('after', False)):
+        results = [run(bootstrap, env) for _ in range(args.runs)]
+        seconds = statistics.median(result['seconds'] for result in results)
+        print(f"{label:>6}: median {seconds * 1000:7.1f}ms per worker, "
+              f"{results[-1]['queries']} queries ({args.runs} runs)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""Facet index against per-request SQL at catalog scale.
+
+Builds a synthetic catalog, then answers the same random facet selections
+(brand, weight, price range, in stock, category) two ways: with GROUP BY
+queries per facet plus COUNT and a page query, and with the in-process facet
+index plus one query for the page. Counts from both are compared. Then a few
+catalog writes are made and the incremental refresh is timed against a full
+rebuild.
+
+Usage: python benchmarks/facet_index.py [--products 100000] [--queries 200]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+def random_selection(rng, brands, weights, categories):
+    selection = {}
+    if rng.random() < 0.7:
+        selection['brand'] = rng.sample(brands, rng.randint(1, 3))
+    if rng.random() < 0.4:
+        selection['weight'] = [rng.choice(weights)]
+    if rng.random() < 0.5:
+        low = rng.randrange(0, 4000) * 1000
+        selection['price'] = (low, low + rng.randrange(500, 4000) * 1000)
+    if rng.random() < 0.5:
+        selection['in_stock'] = [True]
+    if rng.random() < 0.3:
+        selection['category_id'] = [rng.choice(categories)]
+    return selection
+
+def sql_facets(db, Product, apply_facet_filters, selection, per_page):
+    # What get_products would need without the index: a page, a COUNT and
+    # one GROUP BY per facet under the other facets' filters
+    def filtered(skip=None):
+        query = Product.query.filter_by(is_active=True)
+        rest = {facet: values for facet, values in selection.items() if facet != skip}
+        if rest.get('category_id'):
+            query = query.filter(Product.category_id.in_(rest['category_id']))
+        return apply_facet_filters(query, rest)
+
+    page = [row.id for row in filtered().order_by(Product.id).with_entities(Product.id).limit(per_page)]
+    total = filtered().with_entities(db.func.count()).scalar()
+    counts = {}
+    for facet, column in (('category_id', Product.category_id), ('brand', Product.brand),
+                          ('weight', Product.weight), ('in_stock', Product.stock_quantity > 0)):
+        rows = filtered(facet).with_entities(column, db.func.count()).group_by(column).all()
+        counts[facet] = {bool(value) if facet == 'in_stock' else value: count for value, count in rows if value is not None}
+    return page, total, counts
+
+def index_facets(Product, index, selection, per_page):
+    matches, counts = index.search(selection)
+    ids = index.page(matches, 0, per_page)
+    page = [row.id for row in Product.query.filter(Product.id.in_(ids)).with_entities(Product.id)] if ids else []
+    return sorted(page), matches.bit_count(), counts
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--per-page', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'facets.db'))
+    from app import app, db, bootstrap
+    from models import Product
+    from catalog_cache import bump_catalog_version
+    from facets import get_facet_index, reset_facet_index, apply_facet_filters
+    from synthetic_data import generate, BRANDS, WEIGHTS
+
+    rng = random.Random(args.seed)
+    with app.app_context():
+        bootstrap()
+        if Product.query.count() < args.products:
+            start = time.perf_counter()
+            generate(db, products=args.products, users=0, orders=0, posts=0, seed=args.seed)
+            print(f"generated {args.products:,} products in {time.perf_counter() - start:.1f}s")
+            # Generated rows share one updated_at; spread them out as real
+            # edits would be, so refreshes only re-read the writes below
+            db.session.execute(db.update(Product).values(updated_at=Product.created_at))
+            db.session.commit()
+        categories = [row.category_id for row in Product.query.with_entities(Product.category_id).distinct()]
+
+        start = time.perf_counter()
+        index = get_facet_index()
+        build = time.perf_counter() - start
+        size = sum(bits.bit_length() // 8 for values in index.bits.values() for bits in values.values())
+        print(f"index: {len(index):,} products, {sum(map(len, index.bits.values()))} facet values, "
+              f"~{size / 1e6:.1f} MB of bitsets, built in {build * 1000:.0f}ms")
+
+        selections = [random_selection(rng, BRANDS, WEIGHTS, categories) for _ in range(args.queries)]
+        timings = {'sql': [], 'index': []}
+        for selection in selections:
+            start = time.perf_counter()
+            expected = sql_facets(db, Product, apply_facet_filters, selection, args.per_page)
+            timings['sql'].append(time.perf_counter() - start)
+            start = time.perf_counter()
+            got = index_facets(Product, get_facet_index(), selection, args.per_page)
+            timings['index'].append(time.perf_counter() - start)
+
+            page, total, counts = got
+            assert page == expected[0] and total == expected[1], f'results differ for {selection}'
+            for facet, values in expected[2].items():
+                assert counts[facet] == values, f'{facet} counts differ for {selection}'
+
+        print(f"{'':8}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}")
+        for name, values in timings.items():
+            values = [value * 1000 for value in values]
+            print(f"{name:8}{percentile(values, 50):10.2f}{percentile(values, 95):10.2f}{statistics.mean(values):10.2f}")
+
+        def refresh(label, write):
+            write()
+            db.session.commit()
+            bump_catalog_version()
+            start = time.perf_counter()
+            refreshed = get_facet_index()
+            # The first price range query after a refresh may recompute checkpoints
+            refreshed.search({'price': (1000000, 2000000)})
+            print(f"{label}: refresh {(time.perf_counter() - start) * 1000:.1f}ms")
+            return refreshed
+
+        changed = rng.sample(range(1, args.products), 100)
+
+        def stock_writes():
+            # What checkouts do: stock moves, prices stay
+            for product in Product.query.filter(Product.id.in_(changed)):
+                product.stock_quantity = rng.choice([0, 10])
+
+        def catalog_writes():
+            for product in Product.query.filter(Product.id.in_(changed)):
+                product.price = rng.randrange(150, 8000) * 1000
+            Product.query.filter_by(id=changed[0]).update({'is_active': False})
+            db.session.add(Product(name='Facet bench', name_persian='محصول آزمایشی', price=990000,
+                                   category_id=categories[0], brand='USN', weight='1kg', stock_quantity=3))
+
+        refresh('100 stock changes', stock_writes)
+        refreshed = refresh('100 price changes, 1 deactivation, 1 insert', catalog_writes)
+        reset_facet_index()
+        start = time.perf_counter()
+        rebuilt = get_facet_index()
+        print(f"full rebuild: {(time.perf_counter() - start) * 1000:.0f}ms")
+        for selection in selections:
+            assert refreshed.search(selection)[1] == rebuilt.search(selection)[1], 'refresh drifted from rebuild'
+        print("OK")
+
+if __name__ == '__main__':
+    main()
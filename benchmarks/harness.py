@@ -0,0 +1,318 @@
+"""Endpoint benchmark harness: throughput, p50/p95/p99 and SQL queries per request.
+
+Runs every public and admin endpoint against a synthetic dataset, either
+in-process through the Flask test client or over HTTP against a real gunicorn
+started with gunicorn.conf.py. Query counts come from the Server-Timing header
+the metrics middleware adds. Results are written as JSON; with --baseline,
+scenarios whose p95 or queries per request regressed beyond --tolerance are
+reported and the exit status is 1.
+
+Usage: python benchmarks/harness.py [--target client|gunicorn] [--requests 200]
+           [--concurrency 8] [--products 10000 --users 5000 --orders 50000]
+           [--only products,product] [--output results.json] [--baseline old.json]
+       (DATABASE_URL selects the database; it is populated if it has no products)
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+# name -> (method, auth, build(ctx, rng, n) -> (path, json body or None))
+SCENARIOS = {
+    'index': ('GET', None, lambda c, r, n: ('/', None)),
+    'products': ('GET', None, lambda c, r, n: (f'/api/products?page={r.randrange(1, 50)}', None)),
+    'products_category': ('GET', None, lambda c, r, n: (
+        f'/api/products?category_id={r.choice(c["categories"])}&page={r.randrange(1, 20)}', None)),
+    'products_search': ('GET', None, lambda c, r, n: (
+        f'/api/products?search={r.choice(["پروتئین", "کراتین", "گینر", "whey", "USN", "شکلاتی"])}'
+        f'&page={r.randrange(1, 5)}', None)),
+    'products_faceted': ('GET', None, lambda c, r, n: (
+        f'/api/products?brand={r.choice(["USN", "BioTech", "Pegah"])}&in_stock=1'
+        f'&min_price={r.randrange(0, 3000) * 1000}&page={r.randrange(1, 5)}', None)),
+    'product_facets': ('GET', None, lambda c, r, n: (
+        f'/api/products/facets?brand={r.choice(["USN", "BioTech", "Pegah"])}&weight={r.choice(["1kg", "500g"])}', None)),
+    'suggest': ('GET', None, lambda c, r, n: (
+        f'/api/products/suggest?q={r.choice(["w", "wh", "whe", "پ", "پرو", "کرات", "USN g", "opt"])}', None)),
+    'products_cursor': ('GET', None, lambda c, r, n: ('/api/products?cursor=&per_page=24', None)),
+    'products_compact': ('GET', None, lambda c, r, n: (
+        f'/api/products?fields=id,name_persian,price&page={r.randrange(1, 50)}', None)),
+    'product': ('GET', None, lambda c, r, n: (f'/api/products/{r.randint(*c["products"])}', None)),
+    'categories': ('GET', None, lambda c, r, n: ('/api/categories', None)),
+    'blog': ('GET', None, lambda c, r, n: (f'/api/blog?page={r.randrange(1, 10)}', None)),
+    'blog_post': ('GET', None, lambda c, r, n: (f'/api/blog/{r.randint(*c["posts"])}', None)),
+    'register': ('POST', None, lambda c, r, n: ('/api/auth/register', {
+        'username': f'bench{c["run"]}_{n}', 'email': f'bench{c["run"]}_{n}@example.com',
+        'password': 'password', 'full_name': 'کاربر آزمایشی'})),
+    'login': ('POST', None, lambda c, r, n: ('/api/auth/login', {
+        'email': f'user{r.randint(*c["users"])}@example.com', 'password': 'password'})),
+    'profile': ('GET', 'user', lambda c, r, n: ('/api/auth/profile', None)),
+    'orders': ('GET', 'user', lambda c, r, n: ('/api/orders', None)),
+    'create_order': ('POST', 'buyer', lambda c, r, n: ('/api/orders', {
+        'items': [{'product_id': r.choice(c['in_stock']), 'quantity': 1}],
+        'shipping_address': 'تهران، خیابان آزادی', 'phone': '09120000000'})),
+    'batch': ('POST', 'user', lambda c, r, n: ('/api/batch', {'requests': [
+        '/api/categories', '/api/products?per_page=4', '/api/auth/profile']})),
+    'newsletter': ('POST', None, lambda c, r, n: ('/api/newsletter/subscribe', {
+        'email': f'news{c["run"]}_{n}@example.com'})),
+    'admin_dashboard': ('GET', 'admin', lambda c, r, n: ('/api/admin/dashboard', None)),
+    'admin_export': ('GET', 'admin', lambda c, r, n: (
+        f'/api/admin/orders/export?start={c["export_day"]}&end={c["export_day"]}', None)),
+    'admin_cache_stats': ('GET', 'admin', lambda c, r, n: ('/api/admin/cache/stats', None)),
+    'admin_sales_analytics': ('GET', 'admin', lambda c, r, n: (
+        f'/api/admin/analytics/sales?granularity={r.choice(["day", "week", "month"])}', None)),
+    'admin_create_product': ('POST', 'admin', lambda c, r, n: ('/api/admin/products', {
+        'name': f'Bench product {c["run"]} {n}', 'name_persian': f'محصول آزمایشی {n}',
+        'price': 250000, 'category_id': r.choice(c['categories']), 'stock_quantity': 10})),
+    'admin_create_category': ('POST', 'admin', lambda c, r, n: ('/api/admin/categories', {
+        'name': f'Bench {c["run"]} {n}', 'name_persian': f'دسته آزمایشی {n}'})),
+    'admin_create_post': ('POST', 'admin', lambda c, r, n: ('/api/admin/blog', {
+        'title': f'Bench {c["run"]} {n}', 'title_persian': f'مقاله آزمایشی {n}',
+        'content': 'Body', 'content_persian': 'متن', 'slug': f'bench-{c["run"]}-{n}', 'is_published': True})),
+    'metrics': ('GET', None, lambda c, r, n: ('/metrics', None)),
+}
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def prepare(args):
+    from flask_jwt_extended import create_access_token
+    from app import app, db, bootstrap
+    from models import User, Product, Category, BlogPost, Order
+    from synthetic_data import generate
+
+    with app.app_context():
+        bootstrap()
+        if not db.session.query(Product.id).first():
+            start = time.perf_counter()
+            counts = generate(db, args.products, args.users, args.orders, args.posts, args.seed)
+            print(f"Generated {counts} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+        span = lambda model, *filters: db.session.query(
+            db.func.min(model.id), db.func.max(model.id)).filter(*filters).one()
+        admin = User.query.filter_by(role='admin').first()
+        synthetic = User.query.filter(User.role == 'customer', User.username.like('user%'))
+        customer = synthetic.order_by(User.id).first()
+        # Orders are placed by another user so the order history being read stays the same size
+        buyer = synthetic.order_by(User.id.desc()).first()
+        latest = db.session.query(db.func.max(Order.created_at)).scalar() or datetime.utcnow()
+        in_stock = [row.id for row in Product.query.with_entities(Product.id).filter(
+            Product.is_active.is_(True), Product.stock_quantity >= 100000).limit(200)]
+        return {
+            'run': datetime.utcnow().strftime('%Y%m%d%H%M%S'),
+            'products': span(Product),
+            'users': span(User, User.role == 'customer', User.username.like('user%')),
+            'posts': span(BlogPost, BlogPost.is_published.is_(True)),
+            'categories': [row.id for row in Category.query.with_entities(Category.id)],
+            'in_stock': in_stock or [span(Product)[0]],
+            'export_day': (latest - timedelta(days=1)).strftime('%Y-%m-%d'),
+            # Identities are strings so the tokens also verify on a real server
+            'tokens': {
+                'admin': create_access_token(identity=str(admin.id)),
+                'user': create_access_token(identity=str(customer.id)),
+                'buyer': create_access_token(identity=str(buyer.id)),
+            },
+        }
+
+# Transports: each returns (status, Server-Timing header) for one request
+def client_transport():
+    from app import app
+    local = threading.local()
+
+    def send(method, path, body, headers):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        response = local.client.open(path, method=method, json=body, headers=headers)
+        response.get_data()
+        return response.status_code, response.headers.get('Server-Timing', '')
+    return send
+
+def http_transport(base_url):
+    def send(method, path, body, headers):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = urllib.request.Request(base_url + path, data=data, method=method, headers={
+            **headers, **({'Content-Type': 'application/json'} if data else {})})
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+                return response.status, response.headers.get('Server-Timing', '')
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code, e.headers.get('Server-Timing', '')
+    return send
+
+def start_gunicorn(args):
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    env = dict(os.environ, GUNICORN_BIND=f'127.0.0.1:{port}', WEB_CONCURRENCY=str(args.workers),
+               GUNICORN_THREADS=str(args.threads), LOG_LEVEL='WARNING')
+    process = subprocess.Popen(['gunicorn', '-c', 'gunicorn.conf.py', 'main:app'], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(base_url + '/api/categories', timeout=2).read()
+            return process, base_url
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('gunicorn did not start')
+
+def run_scenario(send, context, name, requests, concurrency, seed):
+    method, auth, build = SCENARIOS[name]
+    headers = {'Authorization': f'Bearer {context["tokens"][auth]}'} if auth else {}
+    rng = random.Random(f'{seed}-{name}')
+    calls = [build(context, rng, n) for n in range(requests)]
+    latencies, queries, statuses = [], [], {}
+    lock = threading.Lock()
+
+    def call(request):
+        path, body = request
+        start = time.perf_counter()
+        status, timing = send(method, path, body, headers)
+        elapsed = (time.perf_counter() - start) * 1000
+        match = _QUERIES_RE.search(timing)
+        with lock:
+            latencies.append(elapsed)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if match:
+                queries.append(int(match.group(1)))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, calls))
+    wall = time.perf_counter() - start
+
+    return {
+        'requests': requests,
+        'throughput_rps': round(requests / wall, 1),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'mean_ms': round(statistics.mean(latencies), 2),
+        'queries_per_request': round(statistics.mean(queries), 2) if queries else None,
+        'statuses': statuses,
+    }
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if (current['queries_per_request'] or 0) > (previous['queries_per_request'] or 0) + 0.01:
+            regressions.append(f"{name}: queries/request {previous['queries_per_request']} -> "
+                               f"{current['queries_per_request']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--target', choices=['client', 'gunicorn'], default='client')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per scenario.')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--only', help='Comma-separated scenario names.')
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--orders', type=int, default=50000)
+    parser.add_argument('--posts', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers.')
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads per worker.')
+    parser.add_argument('--output', help='Results file (default benchmarks/results/<target>-<time>.json).')
+    parser.add_argument('--baseline', help='Earlier results file to compare against.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed p95 increase, as a fraction.')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'harness.db'))
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    # The load comes from one address; per-client limits would turn it into 429s
+    os.environ.setdefault('CATALOG_RATE_LIMIT', '0')
+    names = args.only.split(',') if args.only else list(SCENARIOS)
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    context = prepare(args)
+    process = None
+    if args.target == 'gunicorn':
+        process, base_url = start_gunicorn(args)
+        send = http_transport(base_url)
+    else:
+        send = client_transport()
+
+    results = {}
+    try:
+        print(f"{'scenario':<22}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}  statuses")
+        for name in names:
+            result = results[name] = run_scenario(send, context, name, args.requests, args.concurrency, args.seed)
+            print(f"{name:<22}{result['throughput_rps']:>9}{result['p50_ms']:>9}{result['p95_ms']:>9}"
+                  f"{result['p99_ms']:>9}{str(result['queries_per_request']):>9}  {result['statuses']}")
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    report = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds'),
+            'commit': _commit(),
+            'target': args.target,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'dataset': {'products': args.products, 'users': args.users, 'orders': args.orders,
+                        'posts': args.posts, 'seed': args.seed},
+            'database': os.environ['DATABASE_URL'].split(':', 1)[0],
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+        },
+        'results': results,
+    }
+    output = args.output or os.path.join(
+        ROOT, 'benchmarks', 'results', f"{args.target}-{report['meta']['timestamp'].replace(':', '')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""A product going viral: many concurrent identical reads of one product page.
+
+Fires --requests concurrent GETs at /api/products/<id>, each from its own
+client address, three times: on a cold cache, right after a catalog write
+(every cached entry is now outdated), and after the entry expired. Each round
+runs with request coalescing on and off, and reports the SQL statements the
+round issued (from Server-Timing) and how the responses were served (X-Cache).
+A last round sends the same load from a single address to show the per-client
+rate limit.
+
+SQLite answers in microseconds, so --db-latency adds a delay to every
+statement to stand in for a round trip to a database server; without it the
+first render finishes before most requests have arrived.
+
+Usage: python benchmarks/hot_product.py [--requests 1000] [--threads 200] [--db-latency 5]
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--threads', type=int, default=200)
+    parser.add_argument('--db-latency', type=float, default=5, help='Milliseconds added to every SQL statement.')
+    parser.add_argument('--products', type=int, default=1000)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'hot_product.db'))
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from app import app, db, bootstrap
+    from models import Product
+    from catalog_cache import bump_catalog_version
+    import catalog_cache
+    import rate_limit
+    from synthetic_data import generate
+
+    with app.app_context():
+        bootstrap()
+        generate(db, products=args.products, users=10, orders=0, posts=0)
+        product_id = Product.query.filter_by(is_active=True).first().id
+    path = f'/api/products/{product_id}'
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def delay(conn, cursor, statement, parameters, context, executemany):
+        time.sleep(args.db_latency / 1000)
+
+    def fetch(client_id):
+        client = app.test_client()
+        start = time.perf_counter()
+        response = client.get(path, environ_base={'REMOTE_ADDR': f'10.{client_id >> 16 & 255}.{client_id >> 8 & 255}.{client_id & 255}'})
+        elapsed = (time.perf_counter() - start) * 1000
+        match = re.search(r'"(\d+) queries"', response.headers.get('Server-Timing', ''))
+        return (response.status_code, response.headers.get('X-Cache', '-'), int(match.group(1)) if match else 0, elapsed)
+
+    def burst(clients):
+        # All threads are released at once, then work through the clients
+        clients = list(clients)
+        threads = min(args.threads, len(clients))
+        barrier = threading.Barrier(threads)
+        results = [None] * len(clients)
+
+        def worker(offset):
+            barrier.wait()
+            for i in range(offset, len(clients), threads):
+                results[i] = fetch(clients[i])
+
+        workers = [threading.Thread(target=worker, args=(offset,)) for offset in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return results
+
+    def report(name, results):
+        served = Counter(cache for _, cache, _, _ in results)
+        statuses = Counter(status for status, _, _, _ in results)
+        latencies = [elapsed for _, _, _, elapsed in results]
+        print(f"{name:<28}{sum(queries for _, _, queries, _ in results):>8}"
+              f"{percentile(latencies, 50):>9.1f}{percentile(latencies, 99):>9.1f}  "
+              f"{dict(statuses)} {dict(served)}")
+
+    clients = range(args.requests)
+    print(f"{args.requests} concurrent requests for {path}, {args.threads} threads, "
+          f"{args.db_latency:g}ms per statement")
+    print(f"{'round':<28}{'queries':>8}{'p50 ms':>9}{'p99 ms':>9}  statuses / served as")
+    for coalesce in (5, 0):
+        app.config['CATALOG_COALESCE_TIMEOUT'] = coalesce
+        label = 'coalesced' if coalesce else 'uncoalesced'
+        catalog_cache.set_backend(catalog_cache.LRUCache(app.config['CATALOG_CACHE_SIZE'], app.config['CATALOG_CACHE_TTL']))
+        report(f'cold cache, {label}', burst(clients))
+        bump_catalog_version()
+        report(f'after a write, {label}', burst(clients))
+        # Re-render the entry with a tiny TTL and let it expire
+        app.config['CATALOG_CACHE_TTL'] = 0.001
+        bump_catalog_version()
+        burst(range(1))
+        time.sleep(0.01)
+        app.config['CATALOG_CACHE_TTL'] = 300
+        report(f'after expiry, {label}', burst(clients))
+
+    app.config['CATALOG_COALESCE_TIMEOUT'] = 5
+    rate_limit.set_limiter(rate_limit.TokenBuckets())
+    report('one client', burst([0] * args.requests))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Measure bulk product import throughput (rows/sec).
+
+Runs against DATABASE_URL when set (e.g. a local PostgreSQL database),
+otherwise against a throwaway SQLite file.
+
+Usage: python benchmarks/import_benchmark.py [--rows 50000] [--format csv|ndjson] [--batch-size 500]
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIELDS = ['name', 'name_persian', 'price', 'category', 'stock_quantity', 'brand', 'weight', 'description_persian']
+
+def generate(rows, format):
+    records = [{
+        'name': f'Import Product {i}',
+        'name_persian': f'محصول وارداتی {i}',
+        'price': random.randint(500, 9000) * 1000,
+        'category': 'Supplements',
+        'stock_quantity': random.randint(0, 100),
+        'brand': random.choice(['USN', 'BSN', 'MuscleTech']),
+        'weight': random.choice(['500g', '1kg', '2kg']),
+        'description_persian': 'مکمل ورزشی با کیفیت',
+    } for i in range(rows)]
+
+    if format == 'ndjson':
+        return '\n'.join(json.dumps(record, ensure_ascii=False) for record in records).encode()
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FIELDS)
+    writer.writeheader()
+    writer.writerows(records)
+    return buffer.getvalue().encode()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--format', choices=['csv', 'ndjson'], default='csv')
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'import.db'))
+    from app import app, db, bootstrap
+    from models import Category
+    from product_import import import_products
+
+    payload = generate(args.rows, args.format)
+    with app.app_context():
+        bootstrap()
+        if not Category.query.filter_by(name='Supplements').first():
+            db.session.add(Category(name='Supplements', name_persian='مکمل‌ها'))
+            db.session.commit()
+
+        print(f"backend: {db.engine.dialect.name}, {args.rows} rows, {args.format}, batch size {args.batch_size}")
+        for label in ('insert', 'update'):
+            start = time.perf_counter()
+            report = import_products(io.BytesIO(payload), args.format, args.batch_size)
+            elapsed = time.perf_counter() - start
+            print(f"{label}: {report['inserted']} inserted, {report['updated']} updated, "
+                  f"{len(report['errors'])} errors in {elapsed:.2f}s ({args.rows / elapsed:,.0f} rows/sec)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Catalog latency while a burst of logins hashes passwords.
+
+Runs the same storm twice: once hashing inline in the request thread (the old
+behaviour) and once through the bounded password executor, and prints the
+catalog p50/p95/p99 for each.
+
+Usage: python benchmarks/login_storm.py [--logins 16] [--duration 10] [--readers 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def run(app, mode, args):
+    stop = threading.Event()
+    latencies = []
+    logins = {}
+    lock = threading.Lock()
+
+    def storm(i):
+        client = app.test_client()
+        while not stop.is_set():
+            status = client.post('/api/auth/login', json={
+                'email': f'storm{i % args.users}@example.com', 'password': 'storm-password'
+            }).status_code
+            with lock:
+                logins[status] = logins.get(status, 0) + 1
+
+    def reader(i):
+        client = app.test_client()
+        page = 0
+        while not stop.is_set():
+            page += 1
+            # A new page every time so the catalog cache can't answer it
+            start = time.perf_counter()
+            client.get(f'/api/products?page={page}&per_page=12&search=reader{i}')
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    with ThreadPoolExecutor(max_workers=args.logins + args.readers) as pool:
+        for i in range(args.logins):
+            pool.submit(storm, i)
+        for i in range(args.readers):
+            pool.submit(reader, i)
+        time.sleep(args.duration)
+        stop.set()
+
+    print(f"{mode:>8}: catalog p50 {percentile(latencies, 50):7.1f}ms  "
+          f"p95 {percentile(latencies, 95):7.1f}ms  p99 {percentile(latencies, 99):7.1f}ms  "
+          f"({len(latencies)} requests), logins {dict(sorted(logins.items()))}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logins', type=int, default=16, help='Concurrent login threads.')
+    parser.add_argument('--readers', type=int, default=4, help='Concurrent catalog threads.')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10.0)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'storm.db'))
+    import logging
+    logging.disable(logging.WARNING)
+    from app import app, db, bootstrap
+    from models import User
+    import passwords
+
+    with app.app_context():
+        bootstrap()
+        password_hash = passwords.hash_password('storm-password')
+        db.session.execute(db.insert(User), [
+            {'username': f'storm{i}', 'email': f'storm{i}@example.com',
+             'password_hash': password_hash, 'role': 'customer', 'is_active': True}
+            for i in range(args.users)
+        ])
+        db.session.commit()
+
+    print(f"{os.cpu_count()} CPUs, {args.logins} login threads, {args.readers} catalog threads, "
+          f"hash workers {app.config['PASSWORD_HASH_WORKERS']}, method {app.config['PASSWORD_HASH_METHOD']}")
+
+    bounded = passwords._run
+    passwords._run = lambda f, *a: f(*a)
+    run(app, 'inline', args)
+    passwords._run = bounded
+    run(app, 'bounded', args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Payload size and latency of list endpoints: compact list shape vs full shape.
+
+Usage: python benchmarks/payload_benchmark.py [--products 2000] [--posts 200] [--repeat 30]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LOREM = 'این مکمل برای افزایش حجم و قدرت عضلانی طراحی شده است. '
+
+def populate(db, models, products, posts):
+    Product, Category, BlogPost, User = models
+    category = Category(name='Supplements', name_persian='مکمل‌ها')
+    db.session.add(category)
+    db.session.flush()
+    author = User.query.first()
+    db.session.execute(db.insert(Product), [{
+        'name': f'Product {i}', 'name_persian': f'محصول {i}',
+        'description': 'Long description. ' * 40, 'description_persian': LOREM * 4,
+        'price': 1000.0 + i, 'stock_quantity': 10, 'category_id': category.id, 'is_active': True,
+        'brand': 'USN', 'weight': '1kg', 'serving_size': '30g', 'servings_per_container': 33,
+        'ingredients': 'Whey protein concentrate, cocoa, lecithin. ' * 10,
+        'usage_instructions': LOREM * 6, 'warnings': LOREM * 3,
+    } for i in range(products)])
+    db.session.execute(db.insert(BlogPost), [{
+        'title': f'Post {i}', 'title_persian': f'مقاله {i}', 'content': 'Body text. ' * 500,
+        'content_persian': LOREM * 100, 'excerpt': 'Excerpt', 'excerpt_persian': LOREM,
+        'author_id': author.id, 'is_published': True, 'slug': f'post-{i}',
+    } for i in range(posts)])
+    db.session.commit()
+
+def measure(client, url, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url)
+        samples.append((time.perf_counter() - start) * 1000)
+    assert response.status_code == 200, response.status_code
+    return len(response.data), statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--posts', type=int, default=200)
+    parser.add_argument('--per-page', type=int, default=24)
+    parser.add_argument('--repeat', type=int, default=30)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'payload.db'))
+    os.environ.setdefault('CATALOG_RATE_LIMIT', '0')
+    from app import app, db, bootstrap
+    from models import Product, Category, BlogPost, User
+    from serializers import PRODUCT_FIELDS, BLOG_POST_FIELDS
+    import catalog_cache
+
+    # Measure the endpoints themselves, not the response cache
+    catalog_cache.set_backend(catalog_cache.LRUCache(maxsize=0))
+
+    with app.app_context():
+        bootstrap()
+        populate(db, (Product, Category, BlogPost, User), args.products, args.posts)
+
+    client = app.test_client()
+    cases = [
+        ('/api/products', ','.join(PRODUCT_FIELDS)),
+        ('/api/blog', ','.join(BLOG_POST_FIELDS)),
+    ]
+    print(f"{'endpoint':<16}{'full bytes':>12}{'list bytes':>12}{'saved':>8}{'full ms':>10}{'list ms':>10}")
+    for path, full_fields in cases:
+        full_size, full_ms = measure(client, f'{path}?per_page={args.per_page}&fields={full_fields}', args.repeat)
+        list_size, list_ms = measure(client, f'{path}?per_page={args.per_page}', args.repeat)
+        saved = 100 * (1 - list_size / full_size)
+        print(f"{path:<16}{full_size:>12,}{list_size:>12,}{saved:>7.0f}%{full_ms:>10.2f}{list_ms:>10.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Sales analytics: rollup-backed reports against ad-hoc GROUP BYs.
+
+Generates order history, backfills the daily rollups, then times the sales
+report (revenue series, moving average, period comparison, top products and
+categories) for a few ranges against the equivalent GROUP BY queries over the
+order tables. Totals from both are compared.
+
+Usage: python benchmarks/sales_analytics.py [--orders 300000] [--repeat 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--orders', type=int, default=300000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'analytics.db'))
+    from app import app, db, bootstrap
+    from models import Order, OrderItem, Product
+    import analytics
+    from synthetic_data import generate
+
+    with app.app_context():
+        bootstrap()
+        if Order.query.count() < args.orders:
+            start = time.perf_counter()
+            generate(db, products=args.products, users=args.users, orders=args.orders, posts=0)
+            print(f"generated {args.orders:,} orders in {time.perf_counter() - start:.1f}s")
+
+        # Generated orders get random dates, so ids don't follow time and a
+        # settle window would stop the backfill at the newest ones
+        app.config['ANALYTICS_ROLLUP_SETTLE'] = 0
+        start = time.perf_counter()
+        analytics.reset_rollups()
+        folded = analytics.refresh_rollups()
+        print(f"backfill: {folded:,} orders in {time.perf_counter() - start:.2f}s")
+
+        def adhoc(first, last):
+            # What the report would cost straight from the order tables
+            day = db.func.date(Order.created_at)
+            in_range = db.and_(Order.created_at >= first, Order.created_at < last + timedelta(days=1))
+            series = db.session.execute(
+                db.select(day, db.func.count(Order.id), db.func.sum(Order.total_amount)).where(in_range).group_by(day)
+            ).all()
+            revenue = db.func.sum(OrderItem.quantity * OrderItem.price)
+            db.session.execute(
+                db.select(OrderItem.product_id, revenue).join(Order, Order.id == OrderItem.order_id)
+                .where(in_range).group_by(OrderItem.product_id).order_by(revenue.desc()).limit(10)
+            ).all()
+            db.session.execute(
+                db.select(Product.category_id, revenue).select_from(OrderItem)
+                .join(Order, Order.id == OrderItem.order_id).join(Product, Product.id == OrderItem.product_id)
+                .where(in_range).group_by(Product.category_id)
+            ).all()
+            return sum(row[2] for row in series)
+
+        last = db.session.query(db.func.max(Order.created_at)).scalar().date()
+        print(f"{'range':<20}{'rollup ms':>12}{'adhoc ms':>12}{'revenue matches':>18}")
+        for days, granularity in ((30, 'day'), (90, 'week'), (365, 'month')):
+            report = analytics.sales_report(last - timedelta(days=days - 1), last, granularity)
+            rollup_times, adhoc_times = [], []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                report = analytics.sales_report(last - timedelta(days=days - 1), last, granularity)
+                rollup_times.append((time.perf_counter() - start) * 1000)
+                start = time.perf_counter()
+                revenue = adhoc(*(date.fromisoformat(report[key]) for key in ('start', 'end')))
+                adhoc_times.append((time.perf_counter() - start) * 1000)
+            matches = abs(revenue - report['totals']['revenue']) < 1e-3 * max(1, revenue)
+            print(f"{f'{days} days by {granularity}':<20}{statistics.median(rollup_times):>12.1f}"
+                  f"{statistics.median(adhoc_times):>12.1f}{str(matches):>18}")
+
+if __name__ == '__main__':
+    main()
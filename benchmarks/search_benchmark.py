@@ -0,0 +1,97 @@
+"""Compare LIKE scans with the full-text search index on a synthetic catalog.
+
+Usage: python benchmarks/search_benchmark.py [--products 100000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BRANDS = ['USN', 'MuscleTech', 'Optimum', 'BSN', 'Applied', 'Rule1', 'Allmax', 'Kevin Levrone']
+NAMES = [
+    ('Whey Protein', 'پروتئین وی'),
+    ('Mass Gainer', 'گینر حجم'),
+    ('Creatine Monohydrate', 'کراتین مونوهیدرات'),
+    ('BCAA', 'آمینو بی سی ای ای'),
+    ('L-Arginine', 'ال آرژنین'),
+    ('Citrulline Malate', 'سیترولین مالات'),
+    ('Pre Workout', 'پمپ قبل از تمرین'),
+    ('Beef Amino', 'آمینو بیف'),
+]
+QUERIES = ['پروتئین وی', 'كراتين', 'آمینو', 'gainer', 'USN ۵۰۰', 'سیترولین']
+
+def populate(db, Product, Category, count):
+    category = Category(name='Supplements', name_persian='مکمل‌ها')
+    db.session.add(category)
+    db.session.flush()
+    rows = []
+    for i in range(count):
+        name, name_persian = random.choice(NAMES)
+        brand = random.choice(BRANDS)
+        weight = random.choice([250, 500, 1000, 2270, 5000])
+        rows.append({
+            'name': f'{brand} {name} {weight}g #{i}',
+            'name_persian': f'{name_persian} {brand} {weight} گرمی',
+            'description': f'{name} by {brand}, {random.randint(20, 90)} servings',
+            'description_persian': f'{name_persian} با کیفیت بالا از برند {brand}',
+            'price': random.randint(500, 9000) * 1000,
+            'stock_quantity': random.randint(0, 100),
+            'category_id': category.id,
+            'is_active': True,
+            'brand': brand,
+        })
+    db.session.execute(db.insert(Product), rows)
+    db.session.commit()
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+    from app import app, db, bootstrap
+    from models import Product, Category
+    from search import apply_search, rebuild_search_index
+
+    with app.app_context():
+        bootstrap()
+        start = time.perf_counter()
+        populate(db, Product, Category, args.products)
+        print(f"Inserted {args.products} products in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        rebuild_search_index()
+        print(f"Built search index in {time.perf_counter() - start:.1f}s")
+
+        print(f"{'query':<16}{'LIKE p50':>12}{'LIKE p95':>12}{'FTS p50':>12}{'FTS p95':>12}")
+        for search in QUERIES:
+            base = Product.query.filter_by(is_active=True)
+            like = base.filter(db.or_(
+                Product.name.contains(search),
+                Product.name_persian.contains(search),
+                Product.description.contains(search),
+                Product.description_persian.contains(search)
+            ))
+            indexed = apply_search(base, search)
+
+            like_p50, like_p95 = timed(lambda: like.paginate(page=1, per_page=12, error_out=False).items, args.repeat)
+            fts_p50, fts_p95 = timed(lambda: indexed.paginate(page=1, per_page=12, error_out=False).items, args.repeat)
+            print(f"{search:<16}{like_p50:>10.2f}ms{like_p95:>10.2f}ms{fts_p50:>10.2f}ms{fts_p95:>10.2f}ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""Deterministic synthetic catalog, users, orders and blog posts for benchmarks.
+
+Rows are written with Core bulk inserts in batches, then the search index and
+dashboard counters are rebuilt once at the end. The same --seed always gives
+the same data.
+
+Usage: python benchmarks/synthetic_data.py [--products 100000] [--users 50000] [--orders 1000000]
+       (DATABASE_URL selects the database; it must already be bootstrapped or empty)
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BATCH_SIZE = 10000
+
+CATEGORIES = [
+    ('Protein', 'پروتئین'),
+    ('Creatine', 'کراتین'),
+    ('Gainer', 'گینر'),
+    ('Amino Acids', 'آمینو اسید'),
+    ('Pre-Workout', 'پمپ و انرژی‌زا'),
+    ('Fat Burner', 'چربی‌سوز'),
+    ('Vitamins', 'ویتامین و مینرال'),
+    ('Accessories', 'لوازم ورزشی'),
+]
+# (English, Persian, category index)
+PRODUCT_TYPES = [
+    ('Whey Protein', 'پروتئین وی', 0),
+    ('Whey Isolate', 'پروتئین وی ایزوله', 0),
+    ('Casein', 'کازئین', 0),
+    ('Creatine Monohydrate', 'کراتین مونوهیدرات', 1),
+    ('Creatine HCL', 'کراتین اچ‌سی‌ال', 1),
+    ('Mass Gainer', 'مس گینر', 2),
+    ('Serious Mass', 'سریوس مس', 2),
+    ('BCAA', 'بی‌سی‌ای‌ای', 3),
+    ('Glutamine', 'گلوتامین', 3),
+    ('EAA', 'آمینو ضروری', 3),
+    ('Pre-Workout', 'پمپ پیش از تمرین', 4),
+    ('L-Carnitine', 'ال‌کارنیتین', 5),
+    ('CLA', 'سی‌ال‌ای', 5),
+    ('Multivitamin', 'مولتی ویتامین', 6),
+    ('Omega 3', 'امگا ۳', 6),
+    ('Shaker', 'شیکر', 7),
+    ('Lifting Belt', 'کمربند بدنسازی', 7),
+]
+BRANDS = ['USN', 'Optimum Nutrition', 'BioTech', 'MuscleTech', 'Dymatize', 'Scitec', 'Kevin Levrone', 'Weider', 'Pegah', 'Karen']
+LINES = [('Gold', 'گلد'), ('Pro', 'پرو'), ('Elite', 'الیت'), ('Max', 'مکس'), ('Pure', 'خالص'), ('Advanced', 'پیشرفته')]
+FLAVORS = [('Chocolate', 'شکلاتی'), ('Vanilla', 'وانیلی'), ('Strawberry', 'توت‌فرنگی'), ('Banana', 'موزی'),
+           ('Cookies', 'کوکی'), ('Unflavored', 'بدون طعم')]
+WEIGHTS = ['300g', '500g', '1kg', '2.27kg', '4.54kg', '120 caps']
+PERSIAN_DIGITS = str.maketrans('0123456789', '۰۱۲۳۴۵۶۷۸۹')
+
+FIRST_NAMES = ['علی', 'محمد', 'حسین', 'رضا', 'مهدی', 'امیر', 'سارا', 'زهرا', 'فاطمه', 'مریم', 'نگار', 'الهام', 'پویا', 'نیما']
+LAST_NAMES = ['محمدی', 'حسینی', 'احمدی', 'رضایی', 'کریمی', 'موسوی', 'جعفری', 'صادقی', 'رحیمی', 'کاظمی', 'نوری', 'قاسمی']
+CITIES = ['تهران', 'مشهد', 'اصفهان', 'شیراز', 'تبریز', 'کرج', 'اهواز', 'قم', 'رشت', 'کرمان']
+STATUSES = ['pending', 'confirmed', 'shipped', 'delivered', 'delivered', 'delivered', 'cancelled']
+
+DESCRIPTION = 'مکمل با کیفیت برای ورزشکاران حرفه‌ای و آماتور، مناسب برای افزایش قدرت و ریکاوری سریع‌تر. '
+
+def _batched(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _insert(db, model, rows):
+    count = 0
+    for batch in _batched(rows):
+        db.session.execute(db.insert(model.__table__), batch)
+        db.session.commit()
+        count += len(batch)
+    return count
+
+def _next_id(db, model):
+    return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+def generate(db, products=100000, users=50000, orders=1000000, posts=500, seed=42, days=365):
+    # Returns {table: rows inserted}
+    from models import User, Product, Category, Order, OrderItem, BlogPost
+    from passwords import hash_password
+    from search import rebuild_search_index
+    from dashboard_stats import reconcile_dashboard_stats
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    created = lambda: now - timedelta(seconds=rng.randrange(days * 86400))
+    counts = {}
+
+    first_category = _next_id(db, Category)
+    counts['category'] = _insert(db, Category, (
+        {'id': first_category + i, 'name': name, 'name_persian': persian, 'description': '', 'created_at': now}
+        for i, (name, persian) in enumerate(CATEGORIES)
+    ))
+
+    first_product = _next_id(db, Product)
+    prices = []
+
+    def product_rows():
+        for i in range(products):
+            english, persian, category = rng.choice(PRODUCT_TYPES)
+            brand = rng.choice(BRANDS)
+            line, line_persian = rng.choice(LINES)
+            flavor, flavor_persian = rng.choice(FLAVORS)
+            weight = rng.choice(WEIGHTS)
+            price = float(rng.randrange(150, 8000) * 1000)
+            prices.append(price)
+            yield {
+                'id': first_product + i,
+                'name': f'{brand} {line} {english} {flavor} {weight} #{first_product + i}',
+                'name_persian': f'{persian} {line_persian} {brand} {flavor_persian} {weight.translate(PERSIAN_DIGITS)}',
+                'description': f'{brand} {english}',
+                'description_persian': DESCRIPTION,
+                'price': price,
+                'stock_quantity': rng.choice([0, 5, 20, 100, 1000, 1000000]),
+                'image_url': None,
+                'category_id': first_category + category,
+                'is_active': rng.random() > 0.02,
+                'created_at': created(),
+                'updated_at': now,
+                'brand': brand,
+                'weight': weight,
+            }
+
+    counts['product'] = _insert(db, Product, product_rows())
+
+    first_user = _next_id(db, User)
+    password_hash = hash_password('password')
+    counts['user'] = _insert(db, User, ({
+        'id': first_user + i,
+        'username': f'user{first_user + i}',
+        'email': f'user{first_user + i}@example.com',
+        'password_hash': password_hash,
+        'full_name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+        'phone': f'0912{rng.randrange(10 ** 7):07d}',
+        'address': f'{rng.choice(CITIES)}، خیابان {rng.randrange(1, 200)}',
+        'role': 'customer',
+        'is_active': True,
+        'created_at': created(),
+    } for i in range(users)))
+
+    first_order = _next_id(db, Order)
+    items = []
+
+    def order_rows():
+        for i in range(orders):
+            order_id = first_order + i
+            total = 0.0
+            for _ in range(rng.choice([1, 1, 2, 2, 3, 4])):
+                product = rng.randrange(products)
+                quantity = rng.choice([1, 1, 1, 2, 3])
+                items.append({'order_id': order_id, 'product_id': first_product + product,
+                              'quantity': quantity, 'price': prices[product]})
+                total += prices[product] * quantity
+            yield {
+                'id': order_id,
+                'user_id': first_user + rng.randrange(users),
+                'total_amount': total,
+                'status': rng.choice(STATUSES),
+                'shipping_address': f'{rng.choice(CITIES)}، پلاک {rng.randrange(1, 300)}',
+                'phone': '09120000000',
+                'created_at': created(),
+                'updated_at': now,
+            }
+
+    def item_rows():
+        # Orders and their items are written in step so memory stays bounded
+        for batch in _batched(order_rows()):
+            db.session.execute(db.insert(Order.__table__), batch)
+            counts['order'] = counts.get('order', 0) + len(batch)
+            yield from items
+            items.clear()
+
+    counts['order_item'] = _insert(db, OrderItem, item_rows()) if users and products else 0
+
+    first_post = _next_id(db, BlogPost)
+    author = db.session.query(User.id).filter_by(role='admin').scalar() or first_user
+    counts['blog_post'] = _insert(db, BlogPost, ({
+        'id': first_post + i,
+        'title': f'Training guide {first_post + i}',
+        'title_persian': f'راهنمای تمرین و تغذیه شماره {str(first_post + i).translate(PERSIAN_DIGITS)}',
+        'content': 'Training and nutrition advice. ' * 200,
+        'content_persian': DESCRIPTION * 60,
+        'excerpt': 'Training and nutrition advice.',
+        'excerpt_persian': DESCRIPTION,
+        'author_id': author,
+        'is_published': rng.random() > 0.1,
+        'slug': f'training-guide-{first_post + i}',
+        'created_at': created(),
+        'updated_at': now,
+    } for i in range(posts)))
+
+    # Bulk inserts skip the mapper events that maintain these
+    rebuild_search_index()
+    reconcile_dashboard_stats()
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--orders', type=int, default=1000000)
+    parser.add_argument('--posts', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(os.getcwd(), 'synthetic.db'))
+    from app import app, db, bootstrap
+
+    with app.app_context():
+        bootstrap()
+        start = time.perf_counter()
+        counts = generate(db, args.products, args.users, args.orders, args.posts, args.seed)
+        elapsed = time.perf_counter() - start
+
+    summary = ', '.join(f'{count:,} {table}' for table, count in counts.items())
+    print(f"Generated {summary} in {elapsed:.1f}s into {os.environ['DATABASE_URL']}")
+
+if __name__ == '__main__':
+    main()
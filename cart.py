@@ -0,0 +1,370 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from datetime import datetime
+from flask import request, jsonify
+from app import app, db
+from models import Product, Order, OrderItem
+from auth import login_required, get_current_user
+from inventory import reserve_stock, publish_stock_changes
+from pagination import invalidate_counts
+from rate_limit import cart_rate_limited
+
+# Server-side cart
+# A cart is the set of stock holds its owner has: putting an item in the cart
+# holds that many units for CART_HOLD_TTL seconds, and a hold only succeeds
+# while the product's stock covers it plus everyone else's holds. Buyers who
+# can't get units find out when they add to the cart, not at checkout, and
+# checkout turns the holds straight into order items. Stock in the database is
+# only taken at checkout, with reserve_stock() as the final guard.
+app.config.setdefault('CART_HOLD_TTL', 600)
+# Most units of one product a buyer may hold, so one cart can't lock up the stock
+app.config.setdefault('CART_MAX_QUANTITY', 10)
+
+# Hold stores
+# The in-process store serves a single node. For several workers, set_store()
+# a shared store (e.g. Redis with the check-and-hold in a Lua script) with the
+# same methods so every worker counts the same holds.
+class MemoryHoldStore:
+    def __init__(self):
+        self._holds = {}   # owner -> {product_id: (quantity, expires_at)}
+        self._held = {}    # product_id -> units held across owners
+        self._expiry = []  # heap of (expires_at, seq, owner, product_id)
+        self._seq = itertools.count()  # orders equal expiries without comparing owners
+        self._lock = threading.Lock()
+
+    def _drop(self, owner, product_id):
+        quantity, _ = self._holds[owner].pop(product_id)
+        if not self._holds[owner]:
+            del self._holds[owner]
+        left = self._held[product_id] - quantity
+        if left:
+            self._held[product_id] = left
+        else:
+            del self._held[product_id]
+
+    def _sweep(self, now):
+        # Pops every expired heap entry in one pass. Entries left behind by
+        # an extended or released hold no longer match and are skipped.
+        expired = 0
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, _, owner, product_id = heapq.heappop(self._expiry)
+            hold = self._holds.get(owner, {}).get(product_id)
+            if hold is not None and hold[1] == expires_at:
+                self._drop(owner, product_id)
+                expired += 1
+        return expired
+
+    def sweep(self, now=None):
+        with self._lock:
+            return self._sweep(time.time() if now is None else now)
+
+    def hold(self, owner, product_id, quantity, stock, ttl):
+        # Sets owner's hold on product_id to quantity. Returns (ok, available)
+        # where available is what owner could hold; a failed hold keeps the
+        # previous one.
+        now = time.time()
+        with self._lock:
+            self._sweep(now)
+            current = self._holds.get(owner, {}).get(product_id, (0, None))[0]
+            available = max(0, stock - (self._held.get(product_id, 0) - current))
+            if quantity > available:
+                return False, available
+            if current:
+                self._drop(owner, product_id)
+            expires_at = now + ttl
+            self._holds.setdefault(owner, {})[product_id] = (quantity, expires_at)
+            self._held[product_id] = self._held.get(product_id, 0) + quantity
+            heapq.heappush(self._expiry, (expires_at, next(self._seq), owner, product_id))
+            return True, available
+
+    def move(self, owner, to):
+        # Moves owner's live holds to the owner key to, in one step, and
+        # returns them. The units stay held; a hold to already has for the
+        # same product is added to.
+        with self._lock:
+            self._sweep(time.time())
+            holds = self._holds.pop(owner, {})
+            target = self._holds.setdefault(to, {}) if holds else {}
+            for product_id, (quantity, expires_at) in holds.items():
+                if product_id in target:
+                    current, current_expiry = target[product_id]
+                    quantity, expires_at = quantity + current, max(expires_at, current_expiry)
+                target[product_id] = (quantity, expires_at)
+                heapq.heappush(self._expiry, (expires_at, next(self._seq), to, product_id))
+            return holds
+
+    def release(self, owner, product_ids=None):
+        with self._lock:
+            holds = self._holds.get(owner, {})
+            for product_id in list(holds if product_ids is None else product_ids):
+                if product_id in holds:
+                    self._drop(owner, product_id)
+
+    def holds(self, owner):
+        # {product_id: (quantity, expires_at)} for owner's live holds
+        with self._lock:
+            self._sweep(time.time())
+            return dict(self._holds.get(owner, {}))
+
+    def held(self, product_ids, exclude=None):
+        # {product_id: units held} by everyone but exclude
+        with self._lock:
+            self._sweep(time.time())
+            mine = self._holds.get(exclude, {})
+            held = {}
+            for product_id in product_ids:
+                units = self._held.get(product_id, 0) - mine.get(product_id, (0, None))[0]
+                if units:
+                    held[product_id] = units
+            return held
+
+_store = MemoryHoldStore()
+
+def set_store(store):
+    global _store
+    _store = store
+
+def get_store():
+    return _store
+
+def held_by_others(product_ids, owner):
+    return _store.held(product_ids, exclude=owner)
+
+def _cart_response(owner):
+    holds = _store.holds(owner)
+    products = {
+        product.id: product
+        for product in Product.query.filter(Product.id.in_(holds.keys())).all()
+    } if holds else {}
+
+    items = []
+    total = 0
+    for product_id in sorted(holds):
+        product = products.get(product_id)
+        if product is None:
+            continue
+        quantity, expires_at = holds[product_id]
+        total += product.price * quantity
+        items.append({
+            'product_id': product.id,
+            'name': product.name,
+            'name_persian': product.name_persian,
+            'price': product.price,
+            'image_url': product.image_url,
+            'quantity': quantity,
+            'expires_at': datetime.utcfromtimestamp(expires_at).isoformat()
+        })
+    return {'items': items, 'total_amount': total}
+
+def _hold_items(owner, quantities):
+    # Holds {product_id: quantity}; returns the shortages
+    products = {
+        product.id: product
+        for product in Product.query.filter(Product.id.in_(quantities.keys()), Product.is_active == True).all()
+    }
+    shortages = []
+    for product_id in sorted(quantities):
+        product = products.get(product_id)
+        stock = (product.stock_quantity or 0) if product else 0
+        ok, available = _store.hold(owner, product_id, quantities[product_id], stock, app.config['CART_HOLD_TTL'])
+        if not ok:
+            shortages.append({'product_id': product_id, 'requested': quantities[product_id], 'available': available})
+    return shortages
+
+def _parse_quantity(value):
+    try:
+        quantity = int(value)
+    except (TypeError, ValueError):
+        return None
+    return quantity if quantity >= 0 else None
+
+def _over_limit(quantity):
+    # Error response for a quantity above CART_MAX_QUANTITY, or None
+    limit = app.config['CART_MAX_QUANTITY']
+    if quantity > limit:
+        return jsonify({'error': f'حداکثر {limit} عدد از هر محصول را می‌توانید رزرو کنید'}), 400
+    return None
+
+@app.route('/api/cart', methods=['GET'])
+@cart_rate_limited
+@login_required
+def get_cart():
+    try:
+        return jsonify(_cart_response(get_current_user().id)), 200
+    except Exception as e:
+        logging.error(f"Get cart error: {str(e)}")
+        return jsonify({'error': 'خطا در دریافت سبد خرید'}), 500
+
+@app.route('/api/cart', methods=['PUT'])
+@cart_rate_limited
+@login_required
+def replace_cart():
+    # Replaces the whole cart, e.g. when syncing a cart kept in the browser.
+    # Items that can't be held in full are reported in shortages and keep
+    # whatever was held for them before.
+    try:
+        data = request.get_json(silent=True) or {}
+        items = data.get('items')
+        if not isinstance(items, list):
+            return jsonify({'error': 'فهرست اقلام الزامی است'}), 400
+
+        quantities = {}
+        for item in items:
+            try:
+                product_id = int(item.get('product_id'))
+            except (AttributeError, TypeError, ValueError):
+                return jsonify({'error': 'شناسه محصول نامعتبر است'}), 400
+            quantity = _parse_quantity(item.get('quantity'))
+            if quantity is None:
+                return jsonify({'error': 'تعداد نامعتبر است'}), 400
+            if quantity:
+                quantities[product_id] = quantities.get(product_id, 0) + quantity
+                error = _over_limit(quantities[product_id])
+                if error:
+                    return error
+
+        owner = get_current_user().id
+        _store.release(owner, [product_id for product_id in _store.holds(owner) if product_id not in quantities])
+        shortages = _hold_items(owner, quantities) if quantities else []
+
+        cart = _cart_response(owner)
+        cart['shortages'] = shortages
+        return jsonify(cart), 200
+    except Exception as e:
+        logging.error(f"Replace cart error: {str(e)}")
+        return jsonify({'error': 'خطا در به‌روزرسانی سبد خرید'}), 500
+
+@app.route('/api/cart/items/<int:product_id>', methods=['PUT'])
+@cart_rate_limited
+@login_required
+def set_cart_item(product_id):
+    try:
+        data = request.get_json(silent=True) or {}
+        quantity = _parse_quantity(data.get('quantity'))
+        if quantity is None:
+            return jsonify({'error': 'تعداد نامعتبر است'}), 400
+        error = _over_limit(quantity)
+        if error:
+            return error
+
+        owner = get_current_user().id
+        if quantity == 0:
+            _store.release(owner, [product_id])
+            return jsonify(_cart_response(owner)), 200
+
+        product = Product.query.filter_by(id=product_id, is_active=True).first()
+        if not product:
+            return jsonify({'error': 'محصول یافت نشد'}), 404
+
+        ok, available = _store.hold(owner, product_id, quantity, product.stock_quantity or 0, app.config['CART_HOLD_TTL'])
+        if not ok:
+            return jsonify({
+                'error': f'موجودی کافی برای محصول {product.name_persian} نیست',
+                'available': available
+            }), 409
+        return jsonify(_cart_response(owner)), 200
+    except Exception as e:
+        logging.error(f"Set cart item error: {str(e)}")
+        return jsonify({'error': 'خطا در به‌روزرسانی سبد خرید'}), 500
+
+@app.route('/api/cart/items/<int:product_id>', methods=['DELETE'])
+@cart_rate_limited
+@login_required
+def remove_cart_item(product_id):
+    try:
+        owner = get_current_user().id
+        _store.release(owner, [product_id])
+        return jsonify(_cart_response(owner)), 200
+    except Exception as e:
+        logging.error(f"Remove cart item error: {str(e)}")
+        return jsonify({'error': 'خطا در حذف از سبد خرید'}), 500
+
+@app.route('/api/cart', methods=['DELETE'])
+@cart_rate_limited
+@login_required
+def clear_cart():
+    try:
+        _store.release(get_current_user().id)
+        return jsonify({'items': [], 'total_amount': 0}), 200
+    except Exception as e:
+        logging.error(f"Clear cart error: {str(e)}")
+        return jsonify({'error': 'خطا در پاک کردن سبد خرید'}), 500
+
+@app.route('/api/cart/checkout', methods=['POST'])
+@cart_rate_limited
+@login_required
+def checkout_cart():
+    try:
+        data = request.get_json(silent=True) or {}
+        user = get_current_user()
+
+        for field in ('shipping_address', 'phone'):
+            if not data.get(field):
+                return jsonify({'error': f'{field} الزامی است'}), 400
+
+        # The holds move to a checkout key before any stock is taken, so a
+        # second submit finds the cart empty instead of ordering them again.
+        # They stay held meanwhile and go back to the cart if checkout fails.
+        checkout = f'checkout:{user.id}'
+        holds = _store.move(user.id, checkout)
+        if not holds:
+            return jsonify({'error': 'سبد خرید خالی است یا مهلت رزرو آن تمام شده است'}), 400
+        ordered = False
+        try:
+            quantities = {product_id: quantity for product_id, (quantity, _) in holds.items()}
+
+            products = {
+                product.id: product
+                for product in Product.query.filter(Product.id.in_(quantities.keys()), Product.is_active == True).all()
+            }
+            for product_id in quantities:
+                if product_id not in products:
+                    _store.release(checkout, [product_id])
+                    return jsonify({'error': f'محصول {product_id} یافت نشد'}), 400
+
+            order = Order()
+            order.user_id = user.id
+            order.total_amount = sum(products[product_id].price * quantity for product_id, quantity in quantities.items())
+            order.shipping_address = data['shipping_address']
+            order.phone = data['phone']
+            order.notes = data.get('notes', '')
+            db.session.add(order)
+            db.session.flush()
+
+            # Holds were checked against stock when they were placed; the
+            # conditional updates still catch stock changed outside the cart
+            failed_id = reserve_stock(quantities)
+            if failed_id is not None:
+                db.session.rollback()
+                _store.release(checkout, [failed_id])
+                return jsonify({'error': f'موجودی کافی برای محصول {products[failed_id].name_persian} نیست'}), 409
+
+            for product_id in sorted(quantities):
+                order_item = OrderItem()
+                order_item.order_id = order.id
+                order_item.product_id = product_id
+                order_item.quantity = quantities[product_id]
+                order_item.price = products[product_id].price
+                db.session.add(order_item)
+
+            db.session.commit()
+            ordered = True
+        finally:
+            if ordered:
+                _store.release(checkout)
+            else:
+                _store.move(checkout, user.id)
+        invalidate_counts('orders', user.id)
+        publish_stock_changes(quantities)
+
+        return jsonify({
+            'message': 'سفارش با موفقیت ثبت شد',
+            'order': order.to_dict()
+        }), 201
+    except Exception as e:
+        logging.error(f"Cart checkout error: {str(e)}")
+        db.session.rollback()
+        return jsonify({'error': 'خطا در ثبت سفارش'}), 500
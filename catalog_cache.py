@@ -0,0 +1,208 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+from flask import request
+from app import app
+
+app.config.setdefault('CATALOG_CACHE_SIZE', 1024)
+app.config.setdefault('CATALOG_CACHE_TTL', 300)
+# Seconds past expiry an entry may still be served while one request refreshes it
+app.config.setdefault('CATALOG_CACHE_STALE_TTL', 60)
+# Seconds a request waits for an identical in-flight one; 0 disables coalescing
+app.config.setdefault('CATALOG_COALESCE_TIMEOUT', 5)
+
+VERSION_KEY = 'catalog:version'
+
+# Cache backends
+# A backend stores opaque values by string key. Swap the in-process LRU for a
+# shared store (e.g. Redis) with set_backend() so every worker sees the same
+# entries and catalog version.
+class LRUCache:
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    # Counters live outside the LRU so they are never evicted
+    def counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+_backend = LRUCache(app.config['CATALOG_CACHE_SIZE'], app.config['CATALOG_CACHE_TTL'])
+_stats = {'hits': 0, 'misses': 0, 'stale': 0, 'coalesced': 0, 'not_modified': 0, 'invalidations': 0}
+_stats_lock = threading.Lock()
+
+def set_backend(backend):
+    global _backend
+    _backend = backend
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+def get_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+    stats['version'] = catalog_version()
+    return stats
+
+# Catalog version
+# Every entry records the version it was rendered at, so bumping it on a
+# catalog write invalidates all cached catalog responses at once. Paths have
+# their own version too, see invalidate_path().
+def catalog_version():
+    return _backend.counter(VERSION_KEY)
+
+def bump_catalog_version():
+    _count('invalidations')
+    return _backend.incr(VERSION_KEY)
+
+def _cache_key(path=None, args=None):
+    # Encoded, so a value containing & or = can't pose as other parameters
+    if path is None:
+        path, args = request.path, request.args.items(multi=True)
+    return f'catalog:{path}?{urlencode(sorted(args))}'
+
+def _path_version_key(path):
+    return f'catalog:path-version:{path}'
+
+def invalidate_path(path):
+    # Drops every cached response for path, whatever its query args (e.g.
+    # ?fields=...), for writes that only affect one resource. Entries record
+    # the path's version next to the catalog's, so bumping it is enough; one
+    # counter per invalidated path, bounded by the catalog's size.
+    _backend.incr(_path_version_key(path))
+
+def _versions(path):
+    return catalog_version(), _backend.counter(_path_version_key(path))
+
+# Single flight
+# Concurrent misses on one key are coalesced in this process: the first
+# request renders the view and the others wait for its result. While an
+# entry is being refreshed (expired, or rendered before the last catalog
+# write) the others are served the old entry instead of waiting.
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None  # (status, body, etag, mimetype)
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+def _join_flight(key):
+    # Returns (flight, leader)
+    with _flights_lock:
+        flight = _flights.get(key)
+        if flight is not None:
+            return flight, False
+        flight = _flights[key] = _Flight()
+        return flight, True
+
+def _land_flight(key, flight):
+    with _flights_lock:
+        _flights.pop(key, None)
+    flight.done.set()
+
+def _serve(body, etag, mimetype, cache_status):
+    if request.if_none_match.contains(etag):
+        _count('not_modified')
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(body, status=200, mimetype=mimetype)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Cache'] = cache_status
+    return response
+
+def _serve_result(result, cache_status):
+    status, body, etag, mimetype = result
+    if status == 200:
+        return _serve(body, etag, mimetype, cache_status)
+    return app.response_class(body, status=status, mimetype=mimetype)
+
+def _render(f, args, kwargs, key, version):
+    # Runs the view and caches a successful response; returns the result
+    response = app.make_response(f(*args, **kwargs))
+    body = response.get_data()
+    if response.status_code != 200:
+        return response.status_code, body, None, response.mimetype
+
+    etag = hashlib.sha256(body).hexdigest()[:32]
+    ttl = app.config['CATALOG_CACHE_TTL']
+    _backend.set(key, (body, etag, response.mimetype, version, time.time() + ttl),
+                 ttl + app.config['CATALOG_CACHE_STALE_TTL'])
+    return 200, body, etag, response.mimetype
+
+def cached_response(f):
+    # Cache successful GET responses of a catalog view, keyed on route and
+    # query args, and answer conditional requests with 304
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = _cache_key()
+        version = _versions(request.path)
+        entry = _backend.get(key)
+        if entry is not None and entry[3] == version and entry[4] > time.time():
+            _count('hits')
+            return _serve(*entry[:3], cache_status='HIT')
+
+        timeout = app.config['CATALOG_COALESCE_TIMEOUT']
+        flight, leader = _join_flight(key) if timeout else (None, False)
+        if flight is not None and not leader:
+            if entry is not None:
+                _count('stale')
+                return _serve(*entry[:3], cache_status='STALE')
+            if flight.done.wait(timeout) and flight.result is not None:
+                _count('coalesced')
+                return _serve_result(flight.result, 'COALESCED')
+
+        _count('misses')
+        try:
+            result = _render(f, args, kwargs, key, version)
+            if leader:
+                flight.result = result
+        finally:
+            if leader:
+                _land_flight(key, flight)
+        return _serve_result(result, 'MISS')
+    return decorated_function
@@ -0,0 +1,138 @@
+import logging
+from datetime import datetime
+from sqlalchemy import event, inspect
+from app import app, db
+from database import dialect_insert
+from models import User, Product, Order, DashboardStat
+
+# Counters shown on the admin dashboard and how to compute them from scratch
+STATS = {
+    'total_users': lambda: User.query.filter_by(role='customer').count(),
+    'total_products': lambda: Product.query.filter_by(is_active=True).count(),
+    'total_orders': lambda: Order.query.count(),
+    'total_revenue': lambda: db.session.query(db.func.sum(Order.total_amount)).scalar() or 0,
+}
+INTEGER_STATS = ('total_users', 'total_products', 'total_orders')
+
+def adjust_stats(connection, **deltas):
+    # Applied on the flushing connection, so counters commit or roll back
+    # together with the change that caused them
+    table = DashboardStat.__table__
+    for name, delta in deltas.items():
+        if delta:
+            connection.execute(
+                table.update()
+                .where(table.c.name == name)
+                .values(value=table.c.value + delta, updated_at=datetime.utcnow())
+            )
+
+def _changed(target, attribute):
+    # Returns (old, new) when the attribute changed in this flush, else None
+    history = inspect(target).attrs[attribute].history
+    if not history.has_changes():
+        return None
+    old = history.deleted[0] if history.deleted else None
+    return old, getattr(target, attribute)
+
+# Customers
+@event.listens_for(User, 'after_insert')
+def _user_inserted(mapper, connection, target):
+    adjust_stats(connection, total_users=int(target.role == 'customer'))
+
+@event.listens_for(User, 'after_update')
+def _user_updated(mapper, connection, target):
+    change = _changed(target, 'role')
+    if change:
+        adjust_stats(connection, total_users=int(change[1] == 'customer') - int(change[0] == 'customer'))
+
+@event.listens_for(User, 'after_delete')
+def _user_deleted(mapper, connection, target):
+    adjust_stats(connection, total_users=-int(target.role == 'customer'))
+
+# Active products
+@event.listens_for(Product, 'after_insert')
+def _product_inserted(mapper, connection, target):
+    adjust_stats(connection, total_products=int(bool(target.is_active)))
+
+@event.listens_for(Product, 'after_update')
+def _product_updated(mapper, connection, target):
+    change = _changed(target, 'is_active')
+    if change:
+        adjust_stats(connection, total_products=int(bool(change[1])) - int(bool(change[0])))
+
+@event.listens_for(Product, 'after_delete')
+def _product_deleted(mapper, connection, target):
+    adjust_stats(connection, total_products=-int(bool(target.is_active)))
+
+# Orders and revenue
+@event.listens_for(Order, 'after_insert')
+def _order_inserted(mapper, connection, target):
+    adjust_stats(connection, total_orders=1, total_revenue=target.total_amount or 0)
+
+@event.listens_for(Order, 'after_update')
+def _order_updated(mapper, connection, target):
+    change = _changed(target, 'total_amount')
+    if change:
+        adjust_stats(connection, total_revenue=(change[1] or 0) - (change[0] or 0))
+
+@event.listens_for(Order, 'after_delete')
+def _order_deleted(mapper, connection, target):
+    adjust_stats(connection, total_orders=-1, total_revenue=-(target.total_amount or 0))
+
+def get_dashboard_stats():
+    values = dict(db.session.query(DashboardStat.name, DashboardStat.value).all())
+    return {
+        name: int(values.get(name, 0)) if name in INTEGER_STATS else values.get(name, 0)
+        for name in STATS
+    }
+
+def _seed_stats():
+    # Adds the missing counters at 0 and returns their names; another process
+    # may be adding them too
+    return set(db.session.scalars(
+        dialect_insert(DashboardStat.__table__, db.engine.dialect.name)
+        .values([{'name': name, 'value': 0, 'updated_at': datetime.utcnow()} for name in STATS])
+        .on_conflict_do_nothing(index_elements=['name'])
+        .returning(DashboardStat.name)
+    ))
+
+def reconcile_dashboard_stats():
+    # Recompute every counter from the source tables and return the drift
+    # found as {name: (stored, actual)}. The counter rows are locked (in name
+    # order, as adjust_stats takes them) before counting, so a write
+    # committing meanwhile waits and adds its delta on top of the new value
+    # instead of being overwritten. On SQLite the seeding insert takes the
+    # database write lock for the same effect.
+    seeded = _seed_stats()
+    stats = {
+        stat.name: stat
+        for stat in DashboardStat.query.filter(DashboardStat.name.in_(STATS))
+        .order_by(DashboardStat.name).with_for_update()
+    }
+    drift = {}
+    for name, compute in STATS.items():
+        actual = compute()
+        stat = stats[name]
+        if name not in seeded and abs(stat.value - actual) > 1e-6:
+            drift[name] = (stat.value, actual)
+        stat.value = actual
+    db.session.commit()
+
+    for name, (stored, actual) in drift.items():
+        logging.warning(f"Dashboard stat {name} drifted: stored={stored} actual={actual}")
+    return drift
+
+def ensure_dashboard_stats():
+    # Seed the counters on first start. Processes booting together may all
+    # get here; reconciling is safe to run concurrently.
+    if DashboardStat.query.count() < len(STATS):
+        reconcile_dashboard_stats()
+
+@app.cli.command('reconcile-stats')
+def reconcile_stats_command():
+    """Rebuild the dashboard counters from scratch and report drift."""
+    drift = reconcile_dashboard_stats()
+    if not drift:
+        print("Dashboard stats are in sync")
+    for name, (stored, actual) in drift.items():
+        print(f"{name}: stored={stored} actual={actual}")
@@ -0,0 +1,89 @@
+import os
+import sqlite3
+from functools import wraps
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql.dml import UpdateBase
+
+# Engine profiles
+# SQLite: WAL lets readers run alongside the single writer, NORMAL sync is
+# safe under WAL, and mmap/cache keep hot pages out of read() calls.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'cache_size': -int(os.environ.get('SQLITE_CACHE_KB', 64 * 1024)),
+    'temp_store': 'MEMORY',
+}
+
+def engine_options(url):
+    if url.startswith('sqlite'):
+        return {}
+
+    options = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': 300,
+        # Pre-ping costs a round-trip per checkout; recycling covers idle
+        # connections dropped by the server
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '0') == '1',
+    }
+    if url.startswith('postgres'):
+        timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 5000))
+        options['connect_args'] = {
+            'options': f'-c statement_timeout={timeout} -c idle_in_transaction_session_timeout={timeout * 6}'
+        }
+    return options
+
+def dialect_insert(table, dialect):
+    # INSERT with on_conflict_do_update/on_conflict_do_nothing for upserts
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f'Upserts are not supported for {dialect}')
+    return insert(table)
+
+@event.listens_for(Engine, 'connect')
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+# Read replica routing
+# With a 'replica' bind configured, reads issued by views marked with
+# @read_replica go to the replica engine. Writes and flushes always use the
+# primary.
+REPLICA_BIND = 'replica'
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and not isinstance(clause, UpdateBase)
+            and has_app_context()
+            and g.get('read_replica')
+            and REPLICA_BIND in self._db.engines
+        ):
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def read_replica(f):
+    # Route this read-only view's queries to the replica, when one is configured
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.read_replica = True
+        try:
+            return f(*args, **kwargs)
+        finally:
+            g.read_replica = False
+    return decorated_function
@@ -0,0 +1,365 @@
+import logging
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+from app import app, db
+from models import Product
+from catalog_cache import catalog_version
+
+# In-process facet index over the product table. Every product gets a position
+# in id order, and every facet value (brand, weight, category, price band,
+# in stock) keeps a bitset of positions as a Python int. Filtering is an AND
+# of bitsets and a facet count is one AND plus popcount, so a request gets
+# its matches and every facet's live counts without touching the database.
+#
+# Snapshots are immutable; refreshes build a new one and swap it in. A
+# snapshot remembers the catalog version it was built at: when a catalog
+# write bumps the version, the next lookup re-reads only the products whose
+# updated_at moved (ix_product_updated). Hard deletes are picked up by the
+# periodic full rebuild.
+app.config.setdefault('FACET_PRICE_BOUNDS', (500000, 1000000, 2000000, 5000000))
+app.config.setdefault('FACET_REFRESH_OVERLAP', 5)  # seconds, covers late commits and clock skew
+app.config.setdefault('FACET_REBUILD_INTERVAL', 3600)
+app.config.setdefault('FACET_REBUILD_RATIO', 0.25)  # changed share that triggers a full rebuild
+
+FACETS = ('category_id', 'brand', 'weight', 'price', 'in_stock')
+# Bytes per block when walking a bitset for a page of positions
+_PAGE_BLOCK = 1024
+# Products between the price-order checkpoints used for range masks
+_PRICE_STEP = 2048
+
+_COLUMNS = (
+    Product.id, Product.is_active, Product.category_id, Product.brand,
+    Product.weight, Product.price, Product.stock_quantity, Product.updated_at,
+)
+
+def _bitset(positions, size):
+    data = bytearray((size >> 3) + 1)
+    for position in positions:
+        data[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(data, 'little')
+
+def _iter_positions(mask, offset=0, limit=None):
+    # Set bits of mask in ascending order, skipping the first offset of them
+    if limit is not None and limit <= 0:
+        return
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+    found = 0
+    for start in range(0, len(data), _PAGE_BLOCK):
+        block = int.from_bytes(data[start:start + _PAGE_BLOCK], 'little')
+        count = block.bit_count()
+        if offset >= count:
+            offset -= count
+            continue
+        base = start * 8
+        while block:
+            low = block & -block
+            block ^= low
+            if offset:
+                offset -= 1
+                continue
+            yield base + low.bit_length() - 1
+            found += 1
+            if limit is not None and found >= limit:
+                return
+
+def price_band(price, bounds):
+    # Label of the band holding price, e.g. '500000-1000000' or '5000000-'
+    index = bisect_right(bounds, price)
+    low = int(bounds[index - 1]) if index else 0
+    high = str(int(bounds[index])) if index < len(bounds) else ''
+    return f'{low}-{high}'
+
+class FacetIndex:
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.version = None
+        self.watermark = None
+        self.built_at = time.monotonic()
+        self.ids = []          # position -> product id
+        self.positions = {}    # product id -> position
+        self.values = []       # position -> (facet values, price), None while inactive
+        self.prices = []       # sorted (price, position) of active products
+        self.bits = {facet: {} for facet in FACETS}
+        self.active = 0
+        self._ranges = {}
+        self._checkpoints = None
+
+    def __len__(self):
+        return self.active.bit_count()
+
+    def _values(self, category_id, brand, weight, price, stock_quantity):
+        # Facet values in FACETS order
+        return (category_id, brand or None, weight or None, price_band(price, self.bounds), (stock_quantity or 0) > 0)
+
+    @classmethod
+    def build(cls, rows, bounds, version):
+        index = cls(bounds)
+        index.version = version
+        members = [{} for _ in FACETS]
+        active = []
+        watermarks = []
+        for position, (product_id, is_active, category_id, brand, weight, price, stock, updated_at) in enumerate(rows):
+            index.ids.append(product_id)
+            index.positions[product_id] = position
+            if updated_at is not None:
+                watermarks.append(updated_at)
+            if not is_active:
+                index.values.append(None)
+                continue
+            values = index._values(category_id, brand, weight, price, stock)
+            index.values.append((values, price))
+            index.prices.append((price, position))
+            active.append(position)
+            for facet, value in enumerate(values):
+                if value is not None:
+                    positions = members[facet].get(value)
+                    if positions is None:
+                        positions = members[facet][value] = []
+                    positions.append(position)
+
+        size = len(index.ids)
+        index.watermark = max(watermarks, default=None)
+        index.prices.sort()
+        index.active = _bitset(active, size)
+        for facet, values in zip(FACETS, members):
+            index.bits[facet] = {value: _bitset(positions, size) for value, positions in values.items()}
+        return index
+
+    def apply(self, rows, version):
+        # A new snapshot with rows (changed products) applied, or None when
+        # positions can no longer follow id order
+        index = FacetIndex(self.bounds)
+        index.version = version
+        index.watermark = self.watermark
+        index.built_at = self.built_at
+        index.ids = list(self.ids)
+        index.positions = dict(self.positions)
+        index.values = list(self.values)
+        index.prices = list(self.prices)
+        index.bits = {facet: dict(values) for facet, values in self.bits.items()}
+        index.active = self.active
+
+        prices_changed = False
+        for row in rows:
+            if row.updated_at is not None and (index.watermark is None or row.updated_at > index.watermark):
+                index.watermark = row.updated_at
+            position = index.positions.get(row.id)
+            if position is None:
+                if index.ids and row.id < index.ids[-1]:
+                    return None
+                position = len(index.ids)
+                index.ids.append(row.id)
+                index.positions[row.id] = position
+                index.values.append(None)
+
+            bit = 1 << position
+            old = index.values[position]
+            if old is not None and row.is_active and old[1] == row.price:
+                # Same price (e.g. a stock change from an order): only the
+                # facet bits that changed move
+                values = index._values(row.category_id, row.brand, row.weight, row.price, row.stock_quantity)
+                for facet, before, after in zip(FACETS, old[0], values):
+                    if before != after:
+                        if before is not None:
+                            index.bits[facet][before] &= ~bit
+                        if after is not None:
+                            index.bits[facet][after] = index.bits[facet].get(after, 0) | bit
+                index.values[position] = (values, row.price)
+                continue
+
+            prices_changed = True
+            if old is not None:
+                old_values, old_price = old
+                for facet, value in zip(FACETS, old_values):
+                    if value is not None:
+                        index.bits[facet][value] &= ~bit
+                del index.prices[bisect_left(index.prices, (old_price, position))]
+                index.active &= ~bit
+            if not row.is_active:
+                index.values[position] = None
+                continue
+
+            values = index._values(row.category_id, row.brand, row.weight, row.price, row.stock_quantity)
+            for facet, value in zip(FACETS, values):
+                if value is not None:
+                    index.bits[facet][value] = index.bits[facet].get(value, 0) | bit
+            index.values[position] = (values, row.price)
+            index.prices.insert(bisect_left(index.prices, (row.price, position)), (row.price, position))
+            index.active |= bit
+
+        # Price ranges only depend on the prices of active products
+        if not prices_changed:
+            index._checkpoints = self._checkpoints
+            index._ranges = self._ranges
+        return index
+
+    def _cheapest(self, count):
+        # Bitset of the count cheapest products: the nearest checkpoint below
+        # plus at most _PRICE_STEP positions. Checkpoints are computed on the
+        # first range query of each snapshot.
+        size = len(self.ids)
+        if self._checkpoints is None:
+            data = bytearray((size >> 3) + 1)
+            checkpoints = [0]
+            for start in range(0, len(self.prices) - _PRICE_STEP + 1, _PRICE_STEP):
+                for _, position in self.prices[start:start + _PRICE_STEP]:
+                    data[position >> 3] |= 1 << (position & 7)
+                checkpoints.append(int.from_bytes(data, 'little'))
+            self._checkpoints = checkpoints
+        step = count // _PRICE_STEP
+        rest = self.prices[step * _PRICE_STEP:count]
+        return self._checkpoints[step] | _bitset((position for _, position in rest), size) if rest else self._checkpoints[step]
+
+    def price_mask(self, low=None, high=None):
+        key = (low, high)
+        mask = self._ranges.get(key)
+        if mask is None:
+            start = 0 if low is None else bisect_left(self.prices, (low, -1))
+            end = len(self.prices) if high is None else bisect_right(self.prices, (high, len(self.ids)))
+            mask = self._cheapest(end) ^ self._cheapest(start) if end > start else 0
+            if len(self._ranges) < 64:
+                self._ranges[key] = mask
+        return mask
+
+    def ids_mask(self, product_ids):
+        positions = self.positions
+        return _bitset((positions[product_id] for product_id in product_ids if product_id in positions), len(self.ids))
+
+    def masks(self, selection):
+        # Facet -> bitset of positions allowed by the selection on that facet
+        masks = {}
+        for facet in ('category_id', 'brand', 'weight', 'in_stock'):
+            if selection.get(facet):
+                mask = 0
+                for value in selection[facet]:
+                    mask |= self.bits[facet].get(value, 0)
+                masks[facet] = mask
+        if 'price' in selection:
+            masks['price'] = self.price_mask(*selection['price'])
+        return masks
+
+    def search(self, selection, restrict=None):
+        # Returns (matching bitset, {facet: {value: count}}). Each facet is
+        # counted under every filter except its own, so picking a brand
+        # still shows how many products the other brands have.
+        base = self.active if restrict is None else self.active & restrict
+        masks = self.masks(selection)
+        matches = base
+        for mask in masks.values():
+            matches &= mask
+
+        counts = {}
+        for facet in FACETS:
+            others = base
+            for name, mask in masks.items():
+                if name != facet:
+                    others &= mask
+            counts[facet] = {}
+            for value, bits in self.bits[facet].items():
+                count = (bits & others).bit_count()
+                if count:
+                    counts[facet][value] = count
+        return matches, counts
+
+    def page(self, mask, offset, limit):
+        return [self.ids[position] for position in _iter_positions(mask, offset, limit)]
+
+_index = None
+_index_lock = threading.Lock()
+
+def _load(since=None):
+    # Full loads come in id order; changed rows are sorted here, since an
+    # ORDER BY id would make the planner walk the primary key instead of
+    # ix_product_updated
+    if since is None:
+        return db.session.execute(db.select(*_COLUMNS).order_by(Product.id)).all()
+    rows = db.session.execute(db.select(*_COLUMNS).where(Product.updated_at >= since)).all()
+    return sorted(rows, key=lambda row: row.id)
+
+def _rebuild(version):
+    start = time.perf_counter()
+    index = FacetIndex.build(_load(), app.config['FACET_PRICE_BOUNDS'], version)
+    logging.info(f"Facet index built: {len(index)} products in {time.perf_counter() - start:.2f}s")
+    return index
+
+def _refresh(index, version):
+    if time.monotonic() - index.built_at > app.config['FACET_REBUILD_INTERVAL'] or index.watermark is None:
+        return _rebuild(version)
+    rows = _load(index.watermark - timedelta(seconds=app.config['FACET_REFRESH_OVERLAP']))
+    if len(rows) > len(index.ids) * app.config['FACET_REBUILD_RATIO']:
+        return _rebuild(version)
+    return index.apply(rows, version) or _rebuild(version)
+
+def get_facet_index():
+    global _index
+    index = _index
+    # Read the version before the rows, so a write that lands meanwhile
+    # triggers another refresh
+    version = catalog_version()
+    if index is not None and index.version == version:
+        return index
+
+    # Only one thread refreshes; the others keep serving the last snapshot
+    if not _index_lock.acquire(blocking=index is None):
+        return index
+    try:
+        if _index is None:
+            _index = _rebuild(version)
+        elif _index.version != version:
+            _index = _refresh(_index, version)
+        return _index
+    finally:
+        _index_lock.release()
+
+def reset_facet_index():
+    global _index
+    with _index_lock:
+        _index = None
+
+# Request parsing
+def _list_arg(args, name):
+    return [value.strip() for arg in args.getlist(name) for value in arg.split(',') if value.strip()]
+
+def parse_selection(args):
+    # Facet filters from query args: brand and weight take several values
+    # (repeated or comma-separated), min_price/max_price a range and
+    # in_stock=1 hides sold-out products
+    selection = {}
+    for facet in ('brand', 'weight'):
+        values = _list_arg(args, facet)
+        if values:
+            selection[facet] = values
+    low = args.get('min_price', type=float)
+    high = args.get('max_price', type=float)
+    if low is not None or high is not None:
+        selection['price'] = (low, high)
+    if args.get('in_stock') in ('1', 'true'):
+        selection['in_stock'] = [True]
+    return selection
+
+def apply_facet_filters(query, selection):
+    # The same filters as SQL, for listings the index can't page (search
+    # results, cursor mode)
+    if selection.get('brand'):
+        query = query.filter(Product.brand.in_(selection['brand']))
+    if selection.get('weight'):
+        query = query.filter(Product.weight.in_(selection['weight']))
+    if 'price' in selection:
+        low, high = selection['price']
+        if low is not None:
+            query = query.filter(Product.price >= low)
+        if high is not None:
+            query = query.filter(Product.price <= high)
+    if selection.get('in_stock'):
+        query = query.filter(Product.stock_quantity > 0)
+    return query
+
+def facet_page(query, selection, page, per_page):
+    # One page of products matching selection, in id order; returns (items, total)
+    index = get_facet_index()
+    matches, _ = index.search(selection)
+    ids = index.page(matches, max(page - 1, 0) * per_page, per_page)
+    items = {item.id: item for item in query.filter(Product.id.in_(ids)).all()} if ids else {}
+    return [items[product_id] for product_id in ids if product_id in items], matches.bit_count()
@@ -0,0 +1,25 @@
+import os
+
+# gunicorn -c gunicorn.conf.py main:app
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+# One worker by default: the catalog, count and identity caches live in
+# process memory and are only invalidated in the worker that made the change
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+# Threaded worker: a request waiting on the password hashing executor or the
+# database leaves the other threads free to serve, so a login burst doesn't
+# stall the catalog. Keep threads within the DB pool (DB_POOL_SIZE + overflow).
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+reuse_port = True
+
+# Import the app once in the master; workers fork with it already loaded
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+def on_starting(server):
+    # Schema and seed data, once, before any worker starts
+    from app import app, db, bootstrap
+    with app.app_context():
+        bootstrap()
+        # Workers must not inherit the master's pooled connections
+        for engine in db.engines.values():
+            engine.dispose()
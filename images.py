@@ -0,0 +1,182 @@
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import click
+import pillow_heif
+from PIL import ExifTags, Image, ImageOps
+from flask import send_from_directory, abort
+from app import app
+
+# Lets Image.open() read HEIC sources
+pillow_heif.register_heif_opener()
+
+WIDTHS = (240, 480, 960)
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 6},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.heic')
+DERIVATIVES_DIR = os.path.join(app.root_path, 'static', 'derivatives')
+
+# Derivatives are stored by the SHA-256 of the source bytes, so the same
+# picture uploaded under several names is only processed and stored once:
+#   static/derivatives/<digest>/<width>.<format>
+# plus a "source" file recording which static file the digest came from.
+
+_sources = {}
+_sources_lock = threading.Lock()
+
+def _digest_dir(digest):
+    return os.path.join(DERIVATIVES_DIR, digest)
+
+def _register_source(path, digest):
+    directory = _digest_dir(digest)
+    if not os.path.exists(os.path.join(directory, 'source')):
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, 'source'), 'w') as f:
+            f.write(os.path.relpath(path, app.root_path))
+
+def _display_width(image):
+    # Width once ImageOps.exif_transpose has been applied, as derivatives are
+    # made, read from the orientation tag without decoding the pixels
+    orientation = image.getexif().get(ExifTags.Base.Orientation, 1)
+    return image.height if orientation in (5, 6, 7, 8) else image.width
+
+def _source_info(path):
+    # (digest, width) of a source image, cached until the file changes
+    mtime = os.path.getmtime(path)
+    with _sources_lock:
+        entry = _sources.get(path)
+    if entry and entry[0] == mtime:
+        return entry[1], entry[2]
+
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    with Image.open(path) as image:
+        width = _display_width(image)
+    _register_source(path, digest)
+
+    with _sources_lock:
+        _sources[path] = (mtime, digest, width)
+    return digest, width
+
+def _local_path(image_url):
+    # Only images served from our own static folder get derivatives
+    if not image_url or not image_url.startswith(app.static_url_path + '/'):
+        return None
+    relative = image_url[len(app.static_url_path) + 1:].split('?')[0]
+    path = os.path.normpath(os.path.join(app.static_folder, relative))
+    if not path.startswith(app.static_folder + os.sep) or not path.lower().endswith(SOURCE_EXTENSIONS):
+        return None
+    return path if os.path.isfile(path) else None
+
+def _widths(source_width):
+    return sorted({min(width, source_width) for width in WIDTHS})
+
+def derivative_urls(image_url):
+    # {format: [{'width': w, 'url': u}, ...]} for srcset, or None
+    path = _local_path(image_url)
+    if path is None:
+        return None
+    try:
+        digest, source_width = _source_info(path)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Image derivatives unavailable for {image_url}: {str(e)}")
+        return None
+
+    return {
+        name: [
+            {'width': width, 'url': f'/images/{digest}/{width}.{name}'}
+            for width in _widths(source_width)
+        ]
+        for name in FORMATS
+    }
+
+# Generation
+def _save_atomic(image, path, options):
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    image.save(temporary, **options)
+    os.replace(temporary, path)
+
+def generate_derivatives(path, widths=None):
+    # Writes every missing derivative of one source image; returns the digest
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    _register_source(path, digest)
+    directory = _digest_dir(digest)
+
+    with Image.open(path) as source:
+        source = ImageOps.exif_transpose(source).convert('RGB')
+        for width in widths or _widths(source.width):
+            targets = [
+                (os.path.join(directory, f'{width}.{name}'), options)
+                for name, options in FORMATS.items()
+            ]
+            targets = [(target, options) for target, options in targets if not os.path.exists(target)]
+            if not targets:
+                continue
+            height = round(source.height * width / source.width)
+            resized = source.resize((width, height), Image.LANCZOS)
+            for target, options in targets:
+                _save_atomic(resized, target, options)
+    return digest
+
+def _generate_safely(path):
+    try:
+        return path, generate_derivatives(path), None
+    except Exception as e:
+        return path, None, str(e)
+
+@app.route('/images/<digest>/<filename>')
+def serve_image_derivative(digest, filename):
+    if len(digest) != 64 or not all(c in '0123456789abcdef' for c in digest):
+        abort(404)
+    width, _, name = filename.partition('.')
+    if name not in FORMATS or not width.isdigit():
+        abort(404)
+
+    directory = _digest_dir(digest)
+    if not os.path.exists(os.path.join(directory, filename)):
+        # New image: generate its derivatives on first request
+        try:
+            with open(os.path.join(directory, 'source')) as f:
+                source = os.path.join(app.root_path, f.read().strip())
+            with Image.open(source) as image:
+                source_width = _display_width(image)
+        except OSError:
+            abort(404)
+        if int(width) not in _widths(source_width):
+            abort(404)
+        generate_derivatives(source, [int(width)])
+
+    response = send_from_directory(directory, filename, max_age=31536000)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@app.cli.command('build-images')
+@click.argument('paths', nargs=-1, type=click.Path(exists=True))
+@click.option('--workers', default=None, type=int, help='Worker processes, one per CPU by default.')
+def build_images_command(paths, workers):
+    """Generate resized WebP/JPEG derivatives for product images."""
+    sources = []
+    for root in paths or [os.path.join(app.static_folder, 'images')]:
+        if os.path.isfile(root):
+            sources.append(os.path.abspath(root))
+            continue
+        for directory, _, filenames in os.walk(root):
+            sources.extend(
+                os.path.abspath(os.path.join(directory, filename))
+                for filename in sorted(filenames)
+                if filename.lower().endswith(SOURCE_EXTENSIONS)
+            )
+
+    digests = set()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, digest, error in pool.map(_generate_safely, sources):
+            if error:
+                print(f"failed {path}: {error}")
+            else:
+                digests.add(digest)
+    print(f"Processed {len(sources)} images ({len(digests)} unique)")
@@ -0,0 +1,40 @@
+from app import db
+from models import Product
+from catalog_cache import bump_catalog_version, invalidate_path
+
+def reserve_stock(quantities):
+    # Atomically take {product_id: quantity} out of stock inside the current
+    # transaction. Each UPDATE only applies while enough stock is left, so
+    # concurrent checkouts can't oversell. Rows are updated in id order to keep
+    # lock ordering consistent on PostgreSQL. Returns the id of the first
+    # product that could not be reserved (the caller must roll back), or None.
+    for product_id in sorted(quantities):
+        quantity = quantities[product_id]
+        result = db.session.execute(
+            db.update(Product)
+            .where(
+                Product.id == product_id,
+                Product.is_active == True,
+                Product.stock_quantity >= quantity
+            )
+            .values(stock_quantity=Product.stock_quantity - quantity)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            return product_id
+    return None
+
+def publish_stock_changes(product_ids):
+    # Called after an order commits. Bumping the catalog version on every sale
+    # would empty the catalog cache under load, so only the products' own
+    # pages are dropped; listings keep the stock they were rendered with until
+    # they expire (CATALOG_CACHE_TTL). A product selling out still bumps the
+    # version, since that changes in-stock filters and facet counts.
+    sold_out = db.session.execute(
+        db.select(Product.id).where(Product.id.in_(list(product_ids)), Product.stock_quantity <= 0)
+    ).first()
+    if sold_out is not None:
+        bump_catalog_version()
+        return
+    for product_id in product_ids:
+        invalidate_path(f'/api/products/{product_id}')
@@ -0,0 +1,77 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import traceback
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from flask import has_request_context, request
+
+# Request threads only put records on a queue; a listener thread formats them
+# as JSON lines and writes them to stderr.
+
+# Attributes every LogRecord has; anything else was passed with extra={...}
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class _RequestQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # Runs in the calling thread before the record is queued: resolve the
+        # message and traceback and attach the request while it is still
+        # available, since the listener thread has neither
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = ''.join(traceback.format_exception(*record.exc_info))
+            record.exc_info = None
+        if has_request_context() and not hasattr(record, 'route'):
+            record.method = request.method
+            record.route = request.url_rule.rule if request.url_rule else request.path
+        return record
+
+_listener = None
+
+def _start_listener():
+    global _listener
+    log_queue = queue.SimpleQueue()
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, _RequestQueueHandler):
+            handler.queue = log_queue
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter())
+    _listener = QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+def configure_logging(level=None):
+    root = logging.getLogger()
+    root.setLevel(level or os.environ.get('LOG_LEVEL', 'INFO').upper())
+    if _listener is not None:
+        return
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_RequestQueueHandler(queue.SimpleQueue()))
+    _start_listener()
+    atexit.register(_stop_listener)
+    # The listener thread doesn't survive fork (gunicorn preload_app)
+    os.register_at_fork(after_in_child=_start_listener)
@@ -1,4 +1,8 @@
-from app import app
+from app import create_app, bootstrap
+
+app = create_app()
 
 if __name__ == '__main__':
+    with app.app_context():
+        bootstrap()
     app.run(host='0.0.0.0', port=8000, debug=True)
@@ -0,0 +1,177 @@
+import hmac
+import ipaddress
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from flask import g, request, has_request_context, abort, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app import app
+from catalog_cache import get_stats as get_cache_stats
+
+# Per-process request and SQL metrics, exported in Prometheus text format on
+# /metrics. Latency is measured up to the end of the view; streamed bodies
+# (order exports) keep sending after that.
+app.config.setdefault('SLOW_QUERY_MS', 200)
+# /metrics needs this bearer token; without one it only answers clients on
+# loopback or private addresses
+app.config.setdefault('METRICS_TOKEN', os.environ.get('METRICS_TOKEN'))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+class Histogram:
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        for label_values, (counts, total, count) in sorted(series.items()):
+            labels = _labels(self.labels, label_values)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total}')
+            lines.append(f'{self.name}_count{{{labels}}} {count}')
+        return lines
+
+class Counter:
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            lines.append(f'{self.name}{{{_labels(self.labels, label_values)}}} {value}')
+        return lines
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time spent in the view, by route.',
+    ('method', 'route'), LATENCY_BUCKETS)
+REQUESTS = Counter(
+    'http_requests_total', 'Requests served, by route and status.',
+    ('method', 'route', 'status'))
+REQUEST_QUERIES = Histogram(
+    'http_request_sql_queries', 'SQL statements executed per request.',
+    ('method', 'route'), QUERY_COUNT_BUCKETS)
+REQUEST_SQL_TIME = Histogram(
+    'http_request_sql_duration_seconds', 'Total SQL time per request.',
+    ('method', 'route'), LATENCY_BUCKETS)
+SLOW_QUERIES = Counter(
+    'sql_slow_queries_total', 'Statements slower than SLOW_QUERY_MS, by route.',
+    ('route',))
+
+METRICS = (REQUEST_LATENCY, REQUESTS, REQUEST_QUERIES, REQUEST_SQL_TIME, SLOW_QUERIES)
+
+def _route():
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+# SQL timing, on every engine (primary and replica)
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    in_request = has_request_context()
+    if in_request and 'sql_queries' in g:
+        g.sql_queries += 1
+        g.sql_time += elapsed
+
+    if elapsed * 1000 >= app.config['SLOW_QUERY_MS']:
+        route = _route() if in_request else None
+        SLOW_QUERIES.inc(route or 'none')
+        logging.warning('Slow query', extra={
+            'duration_ms': round(elapsed * 1000, 1),
+            'statement': statement,
+            'route': route,
+        })
+
+# Request timing
+@app.before_request
+def _start_request_metrics():
+    g.request_start = time.perf_counter()
+    g.sql_queries = 0
+    g.sql_time = 0.0
+
+@app.after_request
+def _record_request_metrics(response):
+    if 'request_start' not in g:
+        return response
+    elapsed = time.perf_counter() - g.request_start
+    route = _route()
+    REQUEST_LATENCY.observe(elapsed, request.method, route)
+    REQUESTS.inc(request.method, route, response.status_code)
+    REQUEST_QUERIES.observe(g.sql_queries, request.method, route)
+    REQUEST_SQL_TIME.observe(g.sql_time, request.method, route)
+    response.headers['Server-Timing'] = (
+        f'app;dur={elapsed * 1000:.1f}, db;dur={g.sql_time * 1000:.1f};desc="{g.sql_queries} queries"'
+    )
+    return response
+
+def _cache_lines():
+    stats = get_cache_stats()
+    lines = []
+    for name in ('hits', 'misses', 'stale', 'coalesced', 'not_modified', 'invalidations'):
+        metric = f'catalog_cache_{name}_total'
+        lines += [f'# TYPE {metric} counter', f'{metric} {stats[name]}']
+    return lines
+
+def _internal_client():
+    try:
+        address = ipaddress.ip_address(request.remote_addr or '')
+    except ValueError:
+        return False
+    return address.is_loopback or address.is_private
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    token = app.config['METRICS_TOKEN']
+    if token:
+        if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+            abort(401)
+    elif not _internal_client():
+        abort(403)
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    lines += _cache_lines()
+    return Response('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
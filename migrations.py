@@ -0,0 +1,243 @@
+import logging
+from datetime import datetime
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn
+from app import app, db
+
+# Ordered schema migrations. Each one runs once per database inside its own
+# transaction and is recorded in the schema_version table. Migrations must be
+# safe to run against a schema that create_all() already brought up to date.
+MIGRATIONS = []
+
+schema_version = db.Table(
+    'schema_version',
+    db.MetaData(),
+    db.Column('version', db.Integer, primary_key=True),
+    db.Column('description', db.String(200), nullable=False),
+    db.Column('applied_at', db.DateTime, nullable=False),
+)
+
+def migration(version, description):
+    def register(f):
+        MIGRATIONS.append((version, description, f))
+        MIGRATIONS.sort(key=lambda entry: entry[0])
+        return f
+    return register
+
+def _create_indexes(conn, *names):
+    indexes = {
+        index.name: index
+        for table in db.metadata.tables.values()
+        for index in table.indexes
+    }
+    for name in names:
+        indexes[name].create(conn, checkfirst=True)
+
+# The schema the first release shipped with, frozen here so that replaying
+# migrations on an empty database gives the same result whatever the models
+# look like now. Later tables, columns and indexes belong to their own
+# migrations.
+baseline = db.MetaData()
+
+db.Table(
+    'user', baseline,
+    db.Column('id', db.Integer, primary_key=True),
+    db.Column('username', db.String(64), unique=True, nullable=False),
+    db.Column('email', db.String(120), unique=True, nullable=False),
+    db.Column('password_hash', db.String(256), nullable=False),
+    db.Column('full_name', db.String(100)),
+    db.Column('phone', db.String(20)),
+    db.Column('address', db.Text),
+    db.Column('role', db.String(20)),
+    db.Column('created_at', db.DateTime),
+    db.Column('is_active', db.Boolean),
+)
+db.Table(
+    'category', baseline,
+    db.Column('id', db.Integer, primary_key=True),
+    db.Column('name', db.String(100), nullable=False),
+    db.Column('name_persian', db.String(100), nullable=False),
+    db.Column('description', db.Text),
+    db.Column('created_at', db.DateTime),
+)
+db.Table(
+    'product', baseline,
+    db.Column('id', db.Integer, primary_key=True),
+    db.Column('name', db.String(200), nullable=False),
+    db.Column('name_persian', db.String(200), nullable=False),
+    db.Column('description', db.Text),
+    db.Column('description_persian', db.Text),
+    db.Column('price', db.Float, nullable=False),
+    db.Column('stock_quantity', db.Integer),
+    db.Column('image_url', db.String(500)),
+    db.Column('category_id', db.Integer, db.ForeignKey('category.id')),
+    db.Column('is_active', db.Boolean),
+    db.Column('created_at', db.DateTime),
+    db.Column('updated_at', db.DateTime),
+    db.Column('brand', db.String(100)),
+    db.Column('weight', db.String(50)),
+    db.Column('serving_size', db.String(50)),
+    db.Column('servings_per_container', db.Integer),
+    db.Column('ingredients', db.Text),
+    db.Column('usage_instructions', db.Text),
+    db.Column('warnings', db.Text),
+)
+db.Table(
+    'order', baseline,
+    db.Column('id', db.Integer, primary_key=True),
+    db.Column('user_id', db.Integer, db.ForeignKey('user.id'), nullable=False),
+    db.Column('total_amount', db.Float, nullable=False),
+    db.Column('status', db.String(50)),
+    db.Column('shipping_address', db.Text),
+    db.Column('phone', db.String(20)),
+    db.Column('notes', db.Text),
+    db.Column('created_at', db.DateTime),
+    db.Column('updated_at', db.DateTime),
+)
+db.Table(
+    'order_item', baseline,
+    db.Column('id', db.Integer, primary_key=True),
+    db.Column('order_id', db.Integer, db.ForeignKey('order.id'), nullable=False),
+    db.Column('product_id', db.Integer, db.ForeignKey('product.id'), nullable=False),
+    db.Column('quantity', db.Integer, nullable=False),
+    db.Column('price', db.Float, nullable=False),
+)
+db.Table(
+    'blog_post', baseline,
+    db.Column('id', db.Integer, primary_key=True),
+    db.Column('title', db.String(200), nullable=False),
+    db.Column('title_persian', db.String(200), nullable=False),
+    db.Column('content', db.Text, nullable=False),
+    db.Column('content_persian', db.Text, nullable=False),
+    db.Column('excerpt', db.Text),
+    db.Column('excerpt_persian', db.Text),
+    db.Column('image_url', db.String(500)),
+    db.Column('author_id', db.Integer, db.ForeignKey('user.id')),
+    db.Column('is_published', db.Boolean),
+    db.Column('created_at', db.DateTime),
+    db.Column('updated_at', db.DateTime),
+    db.Column('meta_title', db.String(60)),
+    db.Column('meta_description', db.String(160)),
+    db.Column('slug', db.String(200), unique=True),
+)
+db.Table(
+    'newsletter', baseline,
+    db.Column('id', db.Integer, primary_key=True),
+    db.Column('email', db.String(120), unique=True, nullable=False),
+    db.Column('is_active', db.Boolean),
+    db.Column('created_at', db.DateTime),
+)
+
+def _add_columns(conn, table_name, *names):
+    # ALTER TABLE ... ADD COLUMN for the model columns the table lacks
+    table = db.metadata.tables[table_name]
+    existing = {column['name'] for column in inspect(conn).get_columns(table_name)}
+    quoted = conn.dialect.identifier_preparer.quote(table_name)
+    for name in names:
+        if name not in existing:
+            column = CreateColumn(table.c[name]).compile(dialect=conn.dialect)
+            conn.execute(db.text(f'ALTER TABLE {quoted} ADD COLUMN {column}'))
+
+@migration(1, 'Baseline schema')
+def create_baseline(conn):
+    baseline.create_all(conn)
+
+@migration(2, 'Composite indexes for catalog, order and blog queries')
+def add_query_indexes(conn):
+    _create_indexes(
+        conn,
+        'ix_user_role',
+        'ix_product_active_category_created',
+        'ix_product_active_created',
+        'ix_order_user_created',
+        'ix_order_created',
+        'ix_order_status_created',
+        'ix_order_item_order',
+        'ix_order_item_product',
+        'ix_blog_post_published_created',
+    )
+    # Replaced by a unique index in migration 8
+    conn.execute(db.text('CREATE INDEX IF NOT EXISTS ix_product_name ON product (name)'))
+
+@migration(3, 'Newsletter campaigns and delivery state')
+def add_newsletter_delivery(conn):
+    for name in ('newsletter_campaign', 'newsletter_delivery'):
+        db.metadata.tables[name].create(conn, checkfirst=True)
+
+@migration(4, 'Index on product updated_at for facet index refreshes')
+def add_product_updated_index(conn):
+    _create_indexes(conn, 'ix_product_updated')
+
+@migration(5, 'Daily sales rollups for analytics')
+def add_sales_rollups(conn):
+    for name in ('sales_daily', 'product_sales_daily', 'product_sales_monthly', 'category_sales_daily',
+                 'sales_rollup_state'):
+        db.metadata.tables[name].create(conn, checkfirst=True)
+
+@migration(6, 'Dashboard counters')
+def add_dashboard_stats(conn):
+    # Shipped before migrations existed, when the baseline still came from
+    # the live models
+    db.metadata.tables['dashboard_stat'].create(conn, checkfirst=True)
+
+@migration(7, 'Owner of a newsletter campaign sending lease')
+def add_campaign_lock_owner(conn):
+    _add_columns(conn, 'newsletter_campaign', 'lock_owner')
+
+@migration(8, 'Unique product names')
+def add_unique_product_name(conn):
+    # Existing duplicates keep the oldest product's name; the others get
+    # their id appended so the index can be built
+    product = db.metadata.tables['product']
+    duplicated = db.select(product.c.name).group_by(product.c.name).having(db.func.count() > 1)
+    rows = conn.execute(
+        db.select(product.c.id, product.c.name)
+        .where(product.c.name.in_(duplicated))
+        .order_by(product.c.name, product.c.id)
+    ).all()
+    seen = set()
+    for id, name in rows:
+        if name not in seen:
+            seen.add(name)
+            continue
+        suffix = f' ({id})'
+        renamed = name[:product.c.name.type.length - len(suffix)] + suffix
+        conn.execute(product.update().where(product.c.id == id).values(name=renamed))
+        logging.warning(f"Renamed duplicate product {id}: {name!r} -> {renamed!r}")
+    conn.execute(db.text('DROP INDEX IF EXISTS ix_product_name'))
+    _create_indexes(conn, 'uq_product_name')
+
+def current_version():
+    with db.engine.connect() as conn:
+        schema_version.create(conn, checkfirst=True)
+        conn.commit()
+        return conn.execute(db.select(db.func.max(schema_version.c.version))).scalar() or 0
+
+def upgrade():
+    applied = []
+    version = current_version()
+    for number, description, f in MIGRATIONS:
+        if number <= version:
+            continue
+        try:
+            with db.engine.begin() as conn:
+                f(conn)
+                conn.execute(schema_version.insert().values(
+                    version=number, description=description, applied_at=datetime.utcnow()
+                ))
+        except Exception:
+            # Another process applied the same migration concurrently
+            if current_version() >= number:
+                continue
+            raise
+        logging.info(f"Applied migration {number}: {description}")
+        applied.append((number, description))
+    return applied
+
+@app.cli.command('db-upgrade')
+def db_upgrade_command():
+    """Apply pending schema migrations."""
+    applied = upgrade()
+    for number, description in applied:
+        print(f"Applied {number}: {description}")
+    print(f"Schema is at version {current_version()}")
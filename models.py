@@ -1,8 +1,13 @@
 from app import db
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
+from images import derivative_urls
 
 class User(db.Model):
+    __table_args__ = (
+        db.Index('ix_user_role', 'role'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(64), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
@@ -52,6 +57,14 @@ class Category(db.Model):
         }
 
 class Product(db.Model):
+    __table_args__ = (
+        db.Index('ix_product_active_category_created', 'is_active', 'category_id', 'created_at'),
+        db.Index('ix_product_active_created', 'is_active', 'created_at'),
+        # Imports upsert on the name, so it has to be unique
+        db.Index('uq_product_name', 'name', unique=True),
+        db.Index('ix_product_updated', 'updated_at'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
     name_persian = db.Column(db.String(200), nullable=False)
@@ -84,6 +97,7 @@ class Product(db.Model):
             'price': self.price,
             'stock_quantity': self.stock_quantity,
             'image_url': self.image_url,
+            'images': derivative_urls(self.image_url),
             'category_id': self.category_id,
             'category': self.category.to_dict() if self.category else None,
             'is_active': self.is_active,
@@ -98,6 +112,12 @@ class Product(db.Model):
         }
 
 class Order(db.Model):
+    __table_args__ = (
+        db.Index('ix_order_user_created', 'user_id', 'created_at'),
+        db.Index('ix_order_created', 'created_at'),
+        db.Index('ix_order_status_created', 'status', 'created_at'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     total_amount = db.Column(db.Float, nullable=False)
@@ -125,6 +145,11 @@ class Order(db.Model):
         }
 
 class OrderItem(db.Model):
+    __table_args__ = (
+        db.Index('ix_order_item_order', 'order_id'),
+        db.Index('ix_order_item_product', 'product_id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
@@ -145,6 +170,10 @@ class OrderItem(db.Model):
         }
 
 class BlogPost(db.Model):
+    __table_args__ = (
+        db.Index('ix_blog_post_published_created', 'is_published', 'created_at'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     title_persian = db.Column(db.String(200), nullable=False)
@@ -198,3 +227,84 @@ class Newsletter(db.Model):
             'is_active': self.is_active,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+
+class NewsletterCampaign(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(200), nullable=False)
+    body_html = db.Column(db.Text, nullable=False)
+    body_text = db.Column(db.Text)
+    status = db.Column(db.String(20), default='draft')  # draft, sending, sent
+    # A sending run holds the campaign until this time and keeps renewing it
+    # while it sends; an interrupted run can be resumed once it has passed.
+    # lock_owner identifies the run, so only the holder can renew or finish.
+    locked_until = db.Column(db.DateTime)
+    lock_owner = db.Column(db.String(32))
+    sent_count = db.Column(db.Integer, default=0)
+    failed_count = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'subject': self.subject,
+            'status': self.status,
+            'sent_count': self.sent_count,
+            'failed_count': self.failed_count,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class NewsletterDelivery(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('campaign_id', 'newsletter_id', name='uq_newsletter_delivery'),
+        db.Index('ix_newsletter_delivery_status', 'campaign_id', 'status'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    campaign_id = db.Column(db.Integer, db.ForeignKey('newsletter_campaign.id'), nullable=False)
+    newsletter_id = db.Column(db.Integer, db.ForeignKey('newsletter.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sent, failed, skipped
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.String(500))
+    sent_at = db.Column(db.DateTime)
+
+class DashboardStat(db.Model):
+    # Running totals for the admin dashboard, kept up to date by the write paths
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# Daily sales rollups, filled from new orders by analytics.refresh_rollups()
+class SalesDaily(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+class ProductSalesDaily(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, primary_key=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+class ProductSalesMonthly(db.Model):
+    # Per-product totals by month, so long ranges don't read a row per product-day
+    month = db.Column(db.Date, primary_key=True)  # first day of the month
+    product_id = db.Column(db.Integer, primary_key=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+class CategorySalesDaily(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    category_id = db.Column(db.Integer, primary_key=True)  # 0 for uncategorized products
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+class SalesRollupState(db.Model):
+    # Orders up to last_order_id are included in the rollups
+    name = db.Column(db.String(50), primary_key=True)
+    last_order_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,369 @@
+import logging
+import os
+import queue
+import random
+import re
+import smtplib
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+import click
+from app import app, db
+from database import dialect_insert
+from models import Newsletter, NewsletterCampaign, NewsletterDelivery
+from product_import import parse_rows
+
+app.config.setdefault('MAIL_SERVER', os.environ.get('MAIL_SERVER', 'localhost'))
+app.config.setdefault('MAIL_PORT', int(os.environ.get('MAIL_PORT', 25)))
+app.config.setdefault('MAIL_USE_TLS', os.environ.get('MAIL_USE_TLS', '0') == '1')
+app.config.setdefault('MAIL_USERNAME', os.environ.get('MAIL_USERNAME'))
+app.config.setdefault('MAIL_PASSWORD', os.environ.get('MAIL_PASSWORD'))
+app.config.setdefault('MAIL_DEFAULT_SENDER', os.environ.get('MAIL_DEFAULT_SENDER', 'newsletter@zoorkhan.com'))
+app.config.setdefault('NEWSLETTER_CHUNK_SIZE', 500)
+app.config.setdefault('NEWSLETTER_CONNECTIONS', 4)
+app.config.setdefault('NEWSLETTER_RETRIES', 3)
+app.config.setdefault('NEWSLETTER_BACKOFF', 1.0)
+app.config.setdefault('NEWSLETTER_MAX_ATTEMPTS', 6)
+app.config.setdefault('NEWSLETTER_LEASE', 300)  # seconds; renewed every third of it while sending
+
+UPSERT_BATCH_SIZE = 1000
+_EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+# Subscribers
+def normalize_email(email):
+    email = str(email or '').strip().lower()
+    return email if len(email) <= 120 and _EMAIL_RE.match(email) else None
+
+def upsert_subscribers(emails):
+    # Subscribe every new address with one statement per batch. Existing
+    # rows are left alone, so people who unsubscribed stay unsubscribed.
+    # Returns how many of the addresses are now subscribed.
+    rows = [{'email': email, 'is_active': True, 'created_at': datetime.utcnow()} for email in emails]
+    statement = dialect_insert(Newsletter.__table__, db.engine.dialect.name)
+    statement = statement.on_conflict_do_nothing(index_elements=['email'])
+    unsubscribed = 0
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        batch = rows[start:start + UPSERT_BATCH_SIZE]
+        unsubscribed += db.session.query(db.func.count(Newsletter.id)).filter(
+            Newsletter.email.in_([row['email'] for row in batch]), Newsletter.is_active.is_(False)
+        ).scalar()
+        db.session.execute(statement, batch)
+    db.session.commit()
+    return len(rows) - unsubscribed
+
+def import_subscribers(stream, format='csv'):
+    # CSV with an "email" column, or NDJSON objects with an "email" key
+    report = {'rows': 0, 'subscribed': 0, 'errors': []}
+    batch = set()
+    for number, row, error in parse_rows(stream, format):
+        report['rows'] += 1
+        email = normalize_email(row.get('email')) if row else None
+        if email is None:
+            report['errors'].append({'row': number, 'error': error or 'ایمیل نامعتبر است'})
+            continue
+        batch.add(email)
+        if len(batch) >= UPSERT_BATCH_SIZE:
+            report['subscribed'] += upsert_subscribers(sorted(batch))
+            batch.clear()
+    if batch:
+        report['subscribed'] += upsert_subscribers(sorted(batch))
+    logging.info(f"Subscriber import: {report['rows']} rows, {report['subscribed']} subscribed, "
+                 f"{len(report['errors'])} errors")
+    return report
+
+# SMTP
+class SMTPPool:
+    # At most `size` connections, each used by one sender at a time and kept
+    # open between messages
+    def __init__(self, size):
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        connection = smtplib.SMTP(app.config['MAIL_SERVER'], app.config['MAIL_PORT'], timeout=30)
+        if app.config['MAIL_USE_TLS']:
+            connection.starttls()
+        if app.config['MAIL_USERNAME']:
+            connection.login(app.config['MAIL_USERNAME'], app.config['MAIL_PASSWORD'])
+        return connection
+
+    @contextmanager
+    def connection(self):
+        with self._slots:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = self._connect()
+            try:
+                yield connection
+            except Exception:
+                # The connection may be in an unknown state; don't reuse it
+                _close(connection)
+                raise
+            self._idle.put(connection)
+
+    def close(self):
+        while True:
+            try:
+                _close(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+def _close(connection):
+    try:
+        connection.quit()
+    except (smtplib.SMTPException, OSError):
+        connection.close()
+
+def _permanent(error):
+    # 5xx replies won't succeed on retry; anything else (4xx, dropped
+    # connections, timeouts) might
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+def _message(campaign, email):
+    message = EmailMessage()
+    message['Subject'] = campaign['subject']
+    message['From'] = app.config['MAIL_DEFAULT_SENDER']
+    message['To'] = email
+    message.set_content(campaign['body_text'] or re.sub(r'<[^>]+>', '', campaign['body_html']))
+    message.add_alternative(campaign['body_html'], subtype='html')
+    return message
+
+def _send(pool, campaign, email, retries, backoff):
+    # Returns (status, tries, error)
+    error = None
+    for attempt in range(1, retries + 1):
+        try:
+            with pool.connection() as connection:
+                connection.send_message(_message(campaign, email))
+            return 'sent', attempt, None
+        except (smtplib.SMTPException, OSError) as e:
+            if _permanent(e):
+                return 'failed', attempt, str(e)[:500]
+            error = str(e)[:500] or type(e).__name__
+            if attempt < retries:
+                time.sleep(backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+    return 'pending', retries, error
+
+# Delivery
+def claim_campaign(campaign_id):
+    # Take the campaign unless it is sent or another run holds an unexpired
+    # lease. Returns the run's owner token, or None.
+    owner = uuid.uuid4().hex
+    now = datetime.utcnow()
+    result = db.session.execute(
+        db.update(NewsletterCampaign)
+        .where(
+            NewsletterCampaign.id == campaign_id,
+            NewsletterCampaign.status != 'sent',
+            db.or_(NewsletterCampaign.locked_until.is_(None), NewsletterCampaign.locked_until < now),
+        )
+        .values(
+            status='sending',
+            locked_until=now + timedelta(seconds=app.config['NEWSLETTER_LEASE']),
+            lock_owner=owner,
+            started_at=db.func.coalesce(NewsletterCampaign.started_at, now),
+        )
+    )
+    db.session.commit()
+    return owner if result.rowcount == 1 else None
+
+def _renew(campaign_id, owner):
+    # Extends this run's lease. False once the lease lapsed and another run
+    # took the campaign over; the caller must stop sending.
+    result = db.session.execute(
+        db.update(NewsletterCampaign)
+        .where(NewsletterCampaign.id == campaign_id, NewsletterCampaign.lock_owner == owner)
+        .values(locked_until=datetime.utcnow() + timedelta(seconds=app.config['NEWSLETTER_LEASE']))
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+def _subscriber_chunks(chunk_size):
+    # Active subscribers in id order, one chunk in memory at a time
+    last_id = 0
+    while True:
+        chunk = db.session.query(Newsletter.id).filter(
+            Newsletter.is_active.is_(True), Newsletter.id > last_id
+        ).order_by(Newsletter.id).limit(chunk_size).all()
+        if not chunk:
+            return
+        last_id = chunk[-1].id
+        yield [row.id for row in chunk]
+
+def _pending_deliveries(campaign_id, subscriber_ids):
+    # Create delivery rows for new subscribers, then return those still to send
+    statement = dialect_insert(NewsletterDelivery.__table__, db.engine.dialect.name).on_conflict_do_nothing(
+        index_elements=['campaign_id', 'newsletter_id']
+    )
+    db.session.execute(statement, [
+        {'campaign_id': campaign_id, 'newsletter_id': subscriber_id, 'status': 'pending', 'attempts': 0}
+        for subscriber_id in subscriber_ids
+    ])
+    db.session.commit()
+    pending = db.session.query(NewsletterDelivery.id, NewsletterDelivery.attempts, Newsletter.email).join(
+        Newsletter, Newsletter.id == NewsletterDelivery.newsletter_id
+    ).filter(
+        NewsletterDelivery.campaign_id == campaign_id,
+        NewsletterDelivery.newsletter_id.in_(subscriber_ids),
+        NewsletterDelivery.status == 'pending',
+    ).all()
+    # End the read transaction before the chunk goes out over SMTP, so the
+    # connection isn't idle in a transaction (and killed by the server's
+    # idle_in_transaction_session_timeout) while it is being sent
+    db.session.commit()
+    return pending
+
+def _skip_unsubscribed(campaign_id):
+    # Subscribers who left mid-campaign are not retried
+    unsubscribed = db.session.query(Newsletter.id).filter(Newsletter.is_active.is_(False))
+    db.session.execute(
+        db.update(NewsletterDelivery).where(
+            NewsletterDelivery.campaign_id == campaign_id,
+            NewsletterDelivery.status == 'pending',
+            NewsletterDelivery.newsletter_id.in_(unsubscribed.scalar_subquery()),
+        ).values(status='skipped'),
+        execution_options={'synchronize_session': False},
+    )
+    db.session.commit()
+
+def campaign_progress(campaign_id):
+    counts = dict(db.session.query(NewsletterDelivery.status, db.func.count()).filter(
+        NewsletterDelivery.campaign_id == campaign_id
+    ).group_by(NewsletterDelivery.status).all())
+    return {status: counts.get(status, 0) for status in ('pending', 'sent', 'failed', 'skipped')}
+
+def _send_chunk(executor, pool, content, pending, campaign_id, owner):
+    # Sends a chunk, renewing the lease while messages are in flight since
+    # SMTP retries and backoff can outlast it. Returns ({delivery id: result}
+    # for the messages that went out, whether the lease was kept).
+    retries = app.config['NEWSLETTER_RETRIES']
+    backoff = app.config['NEWSLETTER_BACKOFF']
+    futures = {executor.submit(_send, pool, content, row.email, retries, backoff): row.id for row in pending}
+    kept = True
+    while True:
+        _, running = wait(futures, timeout=app.config['NEWSLETTER_LEASE'] / 3)
+        if not running:
+            break
+        if not _renew(campaign_id, owner):
+            # Messages not started yet are left to the run that took over
+            kept = False
+            for future in running:
+                future.cancel()
+            wait(futures)
+            break
+    results = {
+        delivery_id: future.result()
+        for future, delivery_id in futures.items()
+        if not future.cancelled()
+    }
+    return results, kept
+
+def deliver_campaign(campaign_id, owner=None):
+    # Send a campaign to every active subscriber. Safe to re-run: messages
+    # already recorded as sent are skipped, so an interrupted run resumes.
+    # Results are recorded per chunk, so after a crash at most one chunk may
+    # be delivered twice. owner is the token from claim_campaign(), or the
+    # campaign is claimed here. Returns the progress counts, or None if
+    # another run holds (or took over) the campaign.
+    owner = owner or claim_campaign(campaign_id)
+    if owner is None:
+        return None
+    campaign = db.session.get(NewsletterCampaign, campaign_id)
+    content = {'subject': campaign.subject, 'body_html': campaign.body_html, 'body_text': campaign.body_text}
+    max_attempts = app.config['NEWSLETTER_MAX_ATTEMPTS']
+    connections = app.config['NEWSLETTER_CONNECTIONS']
+    pool = SMTPPool(connections)
+    start = time.perf_counter()
+
+    try:
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            for subscriber_ids in _subscriber_chunks(app.config['NEWSLETTER_CHUNK_SIZE']):
+                if not _renew(campaign_id, owner):
+                    logging.warning(f"Newsletter campaign {campaign_id}: lease taken over by another run, stopping")
+                    return None
+                pending = _pending_deliveries(campaign_id, subscriber_ids)
+                results, kept = _send_chunk(executor, pool, content, pending, campaign_id, owner)
+
+                now = datetime.utcnow()
+                updates = []
+                for row in pending:
+                    if row.id not in results:
+                        continue
+                    status, tries, error = results[row.id]
+                    attempts = row.attempts + tries
+                    if status == 'pending' and attempts >= max_attempts:
+                        status = 'failed'
+                    updates.append({
+                        'id': row.id, 'status': status, 'attempts': attempts,
+                        'last_error': error, 'sent_at': now if status == 'sent' else None,
+                    })
+                if updates:
+                    db.session.execute(db.update(NewsletterDelivery), updates)
+                    db.session.commit()
+                if not kept:
+                    logging.warning(f"Newsletter campaign {campaign_id}: lease taken over by another run, stopping")
+                    return None
+    finally:
+        pool.close()
+
+    _skip_unsubscribed(campaign_id)
+    progress = campaign_progress(campaign_id)
+    finished = not progress['pending']
+    db.session.execute(
+        db.update(NewsletterCampaign)
+        .where(NewsletterCampaign.id == campaign_id, NewsletterCampaign.lock_owner == owner)
+        .values(
+            sent_count=progress['sent'],
+            failed_count=progress['failed'],
+            locked_until=None,
+            lock_owner=None,
+            status='sent' if finished else NewsletterCampaign.status,
+            finished_at=datetime.utcnow() if finished else None,
+        )
+    )
+    db.session.commit()
+    logging.info(f"Newsletter campaign {campaign_id}: {progress} in {time.perf_counter() - start:.1f}s")
+    return progress
+
+def deliver_in_background(campaign_id, owner):
+    # Run delivery off the request thread, for a campaign already claimed
+    def run():
+        with app.app_context():
+            try:
+                deliver_campaign(campaign_id, owner)
+            except Exception as e:
+                logging.error(f"Newsletter delivery error: {str(e)}")
+            finally:
+                db.session.remove()
+    thread = threading.Thread(target=run, name=f'newsletter-{campaign_id}', daemon=True)
+    thread.start()
+    return thread
+
+@app.cli.command('send-newsletter')
+@click.argument('campaign_id', type=int)
+def send_newsletter_command(campaign_id):
+    """Send (or resume sending) a newsletter campaign."""
+    progress = deliver_campaign(campaign_id)
+    if progress is None:
+        raise click.ClickException('Campaign is already sent or being sent by another run')
+    print(f"sent {progress['sent']}, failed {progress['failed']}, pending {progress['pending']}")
+
+@app.cli.command('import-subscribers')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', type=click.Choice(['csv', 'ndjson']), default=None,
+              help='Defaults to the file extension.')
+def import_subscribers_command(path, format):
+    """Bulk-subscribe the addresses in a CSV or NDJSON file."""
+    format = format or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+    with open(path, 'rb') as f:
+        report = import_subscribers(f, format)
+    print(f"{report['rows']} rows, {report['subscribed']} subscribed, {len(report['errors'])} errors")
+    for error in report['errors'][:20]:
+        print(f"  row {error['row']}: {error['error']}")
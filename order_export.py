@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from app import db
+from models import Order, OrderItem, Product
+
+# One flat row per order item; orders without items get a single row with
+# empty item columns
+EXPORT_COLUMNS = [
+    Order.id.label('order_id'),
+    Order.user_id,
+    Order.status,
+    Order.total_amount,
+    Order.shipping_address,
+    Order.phone,
+    Order.created_at,
+    OrderItem.id.label('item_id'),
+    OrderItem.product_id,
+    Product.name.label('product_name'),
+    Product.name_persian.label('product_name_persian'),
+    OrderItem.quantity,
+    OrderItem.price.label('unit_price'),
+]
+FIELDNAMES = [column.key for column in EXPORT_COLUMNS]
+CHUNK_SIZE = 1000
+
+def parse_date(value, end=False):
+    # Accepts an ISO date or datetime; a bare end date includes that whole day
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+def export_query(start=None, end=None, status=None):
+    query = (
+        db.select(*EXPORT_COLUMNS)
+        .select_from(Order)
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .outerjoin(Product, Product.id == OrderItem.product_id)
+        .order_by(Order.created_at, Order.id, OrderItem.id)
+    )
+    if start:
+        query = query.where(Order.created_at >= start)
+    if end:
+        query = query.where(Order.created_at < end)
+    if status:
+        query = query.where(Order.status == status)
+    return query
+
+def _chunks(query):
+    # yield_per streams from a server-side cursor where the driver supports it,
+    # so only one chunk of rows is held in memory at a time
+    result = db.session.execute(query.execution_options(yield_per=CHUNK_SIZE))
+    for rows in result.partitions():
+        yield [_row(row) for row in rows]
+
+def _row(row):
+    values = row._asdict()
+    if values['created_at']:
+        values['created_at'] = values['created_at'].isoformat()
+    return values
+
+def ndjson_stream(query):
+    for rows in _chunks(query):
+        yield ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+
+# Spreadsheets run a cell starting with one of these as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+def _csv_cell(value):
+    # Text such as a shipping address is user input; quote it so opening the
+    # export can't run a formula
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def csv_stream(query):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FIELDNAMES)
+    writer.writeheader()
+    for rows in _chunks(query):
+        writer.writerows({key: _csv_cell(value) for key, value in row.items()} for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,73 @@
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from app import db
+
+# Keyset (cursor) pagination over (created_at, id), newest first.
+# Cursors are opaque to clients: base64 of the last row's sort key.
+MAX_PER_PAGE = 100
+
+def encode_cursor(created_at, row_id):
+    payload = json.dumps([created_at.isoformat(), row_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise ValueError('invalid cursor')
+
+def keyset_query(query, model, cursor):
+    query = query.order_by(None).order_by(model.created_at.desc(), model.id.desc())
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(db.or_(
+            model.created_at < created_at,
+            db.and_(model.created_at == created_at, model.id < row_id)
+        ))
+    return query
+
+def keyset_page(query, model, cursor, per_page):
+    # Returns (items, next_cursor); next_cursor is None on the last page
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    items = keyset_query(query, model, cursor).limit(per_page + 1).all()
+    if not items or len(items) <= per_page:
+        return items, None
+
+    items = items[:per_page]
+    last = items[-1]
+    return items, encode_cursor(last.created_at, last.id)
+
+# Cached totals for cursor mode, so listing pages skip COUNT(*) on most
+# requests. Keys include search terms and facet selections, so the cache is
+# an LRU bounded to COUNT_CACHE_SIZE entries.
+COUNT_TTL = 60
+COUNT_CACHE_SIZE = 1024
+_counts = OrderedDict()
+_counts_lock = threading.Lock()
+
+def cached_count(key, query, ttl=COUNT_TTL):
+    now = time.monotonic()
+    with _counts_lock:
+        entry = _counts.get(key)
+        if entry and entry[1] > now:
+            _counts.move_to_end(key)
+            return entry[0]
+
+    total = query.order_by(None).count()
+    with _counts_lock:
+        _counts[key] = (total, now + ttl)
+        _counts.move_to_end(key)
+        while len(_counts) > COUNT_CACHE_SIZE:
+            _counts.popitem(last=False)
+    return total
+
+def invalidate_counts(*prefix):
+    with _counts_lock:
+        for key in [key for key in _counts if key[:len(prefix)] == prefix]:
+            del _counts[key]
@@ -0,0 +1,76 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+from app import app
+
+# Password hashing is deliberately slow. Running it on a small executor caps
+# how many cores a login burst can take, so catalog requests keep being
+# served; hashlib releases the GIL while it works. Once PASSWORD_HASH_QUEUE
+# jobs are in flight, callers wait at most PASSWORD_HASH_WAIT seconds for a
+# slot and then get HashingBusy instead of piling up behind the executor.
+app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+app.config.setdefault('PASSWORD_HASH_SALT_LENGTH', 16)
+app.config.setdefault('PASSWORD_HASH_WORKERS', max(1, (os.cpu_count() or 2) // 2))
+app.config.setdefault('PASSWORD_HASH_QUEUE', 32)
+app.config.setdefault('PASSWORD_HASH_WAIT', 2.0)
+
+class HashingBusy(Exception):
+    pass
+
+_prefixes = {}
+
+def _start_executor():
+    global _executor, _slots
+    _executor = ThreadPoolExecutor(
+        max_workers=app.config['PASSWORD_HASH_WORKERS'],
+        thread_name_prefix='password-hash',
+    )
+    _slots = threading.BoundedSemaphore(app.config['PASSWORD_HASH_QUEUE'])
+
+_start_executor()
+# Executor threads don't survive fork (gunicorn preload_app), so forked
+# workers start their own
+os.register_at_fork(after_in_child=_start_executor)
+
+def _run(f, *args):
+    if not _slots.acquire(timeout=app.config['PASSWORD_HASH_WAIT']):
+        raise HashingBusy()
+    try:
+        future = _executor.submit(f, *args)
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future.result()
+
+def _generate(password):
+    return generate_password_hash(
+        password,
+        method=app.config['PASSWORD_HASH_METHOD'],
+        salt_length=app.config['PASSWORD_HASH_SALT_LENGTH'],
+    )
+
+def _current_prefix():
+    # Stored hashes start with "method:params$"; werkzeug fills in defaults
+    # for a short method such as "pbkdf2", so ask it for the full form once
+    method = app.config['PASSWORD_HASH_METHOD']
+    if method not in _prefixes:
+        _prefixes[method] = _generate('').split('$', 1)[0]
+    return _prefixes[method]
+
+def needs_rehash(pwhash):
+    return pwhash.split('$', 1)[0] != _current_prefix()
+
+def _verify(pwhash, password):
+    if not check_password_hash(pwhash, password):
+        return False, None
+    return True, _generate(password) if needs_rehash(pwhash) else None
+
+def hash_password(password):
+    return _run(_generate, password)
+
+def verify_password(pwhash, password):
+    # (matches, new_hash); new_hash is set when the stored hash used older
+    # parameters and should be replaced
+    return _run(_verify, pwhash, password)
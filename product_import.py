@@ -0,0 +1,216 @@
+import csv
+import json
+import logging
+import click
+from app import app, db
+from database import dialect_insert
+from models import Product, Category
+from search import index_products
+from dashboard_stats import adjust_stats
+from catalog_cache import bump_catalog_version
+from pagination import invalidate_counts
+
+REQUIRED_FIELDS = ['name', 'name_persian', 'price', 'category_id']
+TEXT_FIELDS = [
+    'description', 'description_persian', 'image_url', 'brand', 'weight',
+    'serving_size', 'ingredients', 'usage_instructions', 'warnings'
+]
+BATCH_SIZE = 500
+
+NUMERIC_FIELDS = {
+    'price': float,
+    'stock_quantity': int,
+    'category_id': int,
+    'servings_per_container': int,
+}
+DEFAULTS = dict({field: '' for field in TEXT_FIELDS}, stock_quantity=0, servings_per_container=0)
+
+def product_fields(data, partial=False):
+    # Validate a create_product payload and return the column values.
+    # With partial, only the fields given (non-empty) are returned and only
+    # the name is required, for updating an existing product.
+    # Raises ValueError with a user-facing message.
+    for field in (['name'] if partial else REQUIRED_FIELDS):
+        if not data.get(field):
+            raise ValueError(f'{field} الزامی است')
+
+    values = {}
+    for field in ('name', 'name_persian'):
+        if data.get(field):
+            values[field] = data[field]
+    try:
+        for field, cast in NUMERIC_FIELDS.items():
+            if data.get(field) not in (None, ''):
+                values[field] = cast(data[field])
+    except (TypeError, ValueError):
+        raise ValueError('مقادیر عددی محصول نامعتبر است')
+
+    for field in TEXT_FIELDS:
+        if data.get(field):
+            values[field] = data[field]
+    if not partial:
+        values = dict(DEFAULTS, **values)
+    return values
+
+def missing_fields(values):
+    # Required fields a partial row lacks to be inserted as a new product
+    return [field for field in REQUIRED_FIELDS if field not in values]
+
+# Parsing
+def _lines(stream):
+    for line in stream:
+        yield line.decode('utf-8-sig') if isinstance(line, bytes) else line
+
+def parse_rows(stream, format):
+    # Yields (row_number, dict or None, error) from a CSV or NDJSON byte stream
+    lines = _lines(stream)
+    if format == 'csv':
+        for number, row in enumerate(csv.DictReader(lines), start=1):
+            yield number, row, None
+        return
+
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield number, None, 'JSON نامعتبر است'
+            continue
+        if not isinstance(row, dict):
+            yield number, None, 'JSON نامعتبر است'
+            continue
+        yield number, row, None
+
+# Upserting
+def _category_lookup():
+    lookup = {}
+    ids = set()
+    for category in Category.query.all():
+        ids.add(category.id)
+        lookup[category.name.strip().lower()] = category.id
+        lookup[category.name_persian.strip()] = category.id
+    return lookup, ids
+
+def _upsert_batch(batch):
+    # batch maps product name -> (row number, column values); existing
+    # products (matched by name) are updated with just the given columns, new
+    # ones inserted with defaults for the rest. Returns (inserted, updated,
+    # errors) where errors are new rows missing required fields.
+    existing = dict(
+        db.session.query(Product.name, Product.id).filter(Product.name.in_(batch.keys())).all()
+    )
+    inserts = []
+    errors = []
+    for name, (number, values) in batch.items():
+        if name in existing:
+            continue
+        missing = missing_fields(values)
+        if missing:
+            errors.append({'row': number, 'error': f'{missing[0]} الزامی است'})
+        else:
+            inserts.append(dict(DEFAULTS, **values))
+
+    inserted_ids = []
+    if inserts:
+        # Another import or create_product may have added some of these names
+        # since the lookup; those rows are updated below instead
+        statement = (
+            dialect_insert(Product.__table__, db.engine.dialect.name)
+            .on_conflict_do_nothing(index_elements=['name'])
+            .returning(Product.id, Product.name)
+        )
+        inserted = dict((name, id) for id, name in db.session.execute(statement, inserts))
+        inserted_ids = list(inserted.values())
+        raced = [row['name'] for row in inserts if row['name'] not in inserted]
+        if raced:
+            existing.update(
+                db.session.query(Product.name, Product.id).filter(Product.name.in_(raced)).all()
+            )
+    updates = [
+        dict(values, id=existing[name]) for name, (_, values) in batch.items()
+        if name in existing
+    ]
+    if updates:
+        db.session.execute(db.update(Product), updates)
+
+    # Bulk statements bypass the mapper events, so sync derived data here
+    connection = db.session.connection()
+    index_products(connection, [row['id'] for row in updates] + inserted_ids)
+    adjust_stats(connection, total_products=len(inserted_ids))
+    db.session.commit()
+    return len(inserted_ids), len(updates), errors
+
+def import_products(stream, format='csv', batch_size=BATCH_SIZE):
+    categories, category_ids = _category_lookup()
+    report = {'rows': 0, 'inserted': 0, 'updated': 0, 'errors': []}
+    batch = {}
+    seen = set()
+
+    def flush():
+        try:
+            inserted, updated, errors = _upsert_batch(batch)
+            report['inserted'] += inserted
+            report['updated'] += updated
+            report['errors'].extend(errors)
+        except Exception as e:
+            logging.error(f"Product import batch error: {str(e)}")
+            db.session.rollback()
+            for number, _ in batch.values():
+                report['errors'].append({'row': number, 'error': 'خطا در ذخیره محصول'})
+        batch.clear()
+
+    for number, row, error in parse_rows(stream, format):
+        report['rows'] += 1
+        if error is None:
+            # Categories may be given by name instead of id
+            category = row.get('category')
+            if not row.get('category_id') and category:
+                name = str(category).strip()
+                row['category_id'] = categories.get(name.lower()) or categories.get(name)
+                if not row['category_id']:
+                    error = f'دسته‌بندی {category} یافت نشد'
+        if error is None:
+            try:
+                values = product_fields(row, partial=True)
+                if 'category_id' in values and values['category_id'] not in category_ids:
+                    raise ValueError(f'دسته‌بندی {values["category_id"]} یافت نشد')
+            except ValueError as e:
+                error = str(e)
+        if error is None and values['name'] in seen:
+            error = f'محصول {values["name"]} در این فایل تکراری است'
+        if error is not None:
+            report['errors'].append({'row': number, 'error': error})
+            continue
+
+        seen.add(values['name'])
+        batch[values['name']] = (number, values)
+        if len(batch) >= batch_size:
+            flush()
+
+    if batch:
+        flush()
+
+    if report['inserted'] or report['updated']:
+        invalidate_counts('products')
+        bump_catalog_version()
+
+    logging.info(f"Product import: {report['rows']} rows, {report['inserted']} inserted, "
+                 f"{report['updated']} updated, {len(report['errors'])} errors")
+    return report
+
+@app.cli.command('import-products')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'format', type=click.Choice(['csv', 'ndjson']), default=None,
+              help='Input format, guessed from the file extension by default.')
+@click.option('--batch-size', default=BATCH_SIZE, show_default=True)
+def import_products_command(path, format, batch_size):
+    """Bulk import products from a CSV or NDJSON file."""
+    format = format or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+    with open(path, 'rb') as stream:
+        report = import_products(stream, format, batch_size)
+
+    print(f"{report['rows']} rows: {report['inserted']} inserted, {report['updated']} updated, "
+          f"{len(report['errors'])} errors")
+    for error in report['errors']:
+        print(f"  row {error['row']}: {error['error']}")
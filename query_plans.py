@@ -0,0 +1,112 @@
+import re
+import sys
+import click
+from datetime import datetime, timedelta
+from app import app, db
+from models import User, Product, Order, OrderItem, BlogPost, Newsletter
+from serializers import (
+    projected_query, order_query, PRODUCT_FIELDS, PRODUCT_LIST_FIELDS, BLOG_POST_LIST_FIELDS
+)
+from pagination import keyset_query, encode_cursor
+from search import apply_search
+from order_export import export_query
+from analytics import batch_orders_query, batch_items_query, top_products_query, category_query
+
+# A plan step that reads a whole table, directly or by walking an index.
+# Scans of materialized subqueries (search matches) are not table scans.
+_SQLITE_SCAN_RE = re.compile(r'^SCAN (TABLE )?"?(\w+)"?(?P<index> USING (COVERING )?INDEX \w+)?$')
+
+# Queries that legitimately walk an index in order and stop after a LIMIT
+ORDERED_INDEX_SCANS = {'recent orders'}
+
+def endpoint_queries():
+    # The queries behind each endpoint, built the same way the handlers do
+    now = datetime.utcnow()
+    cursor = encode_cursor(now, 1000)
+    products = projected_query(Product, PRODUCT_LIST_FIELDS).filter_by(is_active=True)
+    posts = projected_query(BlogPost, BLOG_POST_LIST_FIELDS).filter_by(is_published=True)
+    return [
+        ('login', User.query.filter_by(email='admin@zoorkhan.com')),
+        ('register username check', User.query.filter_by(username='admin')),
+        ('customer count', User.query.filter_by(role='customer').with_entities(db.func.count())),
+        ('get_products', products.limit(12).offset(120)),
+        ('get_products by category', products.filter_by(category_id=1).limit(12).offset(120)),
+        ('get_products cursor', keyset_query(products, Product, cursor).limit(13)),
+        ('get_products category cursor', keyset_query(products.filter_by(category_id=1), Product, cursor).limit(13)),
+        ('get_products search', apply_search(products, 'پروتئین وی').limit(12)),
+        ('get_products facet page', products.filter(Product.id.in_([1, 2, 3]))),
+        ('facet index refresh', db.select(Product.id, Product.updated_at).where(Product.updated_at >= now)),
+        ('get_product', projected_query(Product, PRODUCT_FIELDS).filter(Product.id == 1)),
+        ('create_order products', Product.query.filter(Product.id.in_([1, 2, 3]))),
+        ('import name lookup', Product.query.filter(Product.name.in_(['a', 'b'])).with_entities(Product.name, Product.id)),
+        ('get_user_orders', order_query().filter_by(user_id=1).order_by(Order.created_at.desc())),
+        ('get_user_orders cursor', keyset_query(Order.query.filter_by(user_id=1), Order, cursor).limit(11)),
+        ('order items of orders', OrderItem.query.filter(OrderItem.order_id.in_([1, 2, 3]))),
+        ('order items of product', OrderItem.query.filter(OrderItem.product_id == 1)),
+        ('recent orders', Order.query.order_by(Order.created_at.desc()).limit(5)),
+        ('export orders by date', export_query(now - timedelta(days=30), now)),
+        ('export orders by status', export_query(now - timedelta(days=30), now, 'pending')),
+        ('get_blog_posts', posts.order_by(BlogPost.created_at.desc()).limit(6).offset(60)),
+        ('get_blog_posts cursor', keyset_query(posts, BlogPost, cursor).limit(7)),
+        ('newsletter lookup', Newsletter.query.filter_by(email='a@example.com')),
+        ('sales rollup orders', batch_orders_query(1000, 2000)),
+        ('sales rollup items', batch_items_query(1000, 2000)),
+        ('sales top products', top_products_query(now.date() - timedelta(days=90), now.date(), 10)),
+        ('sales categories', category_query(now.date() - timedelta(days=90), now.date())),
+    ]
+
+def _compile(conn, query):
+    statement = query.statement if hasattr(query, 'statement') else query
+    compiled = statement.compile(dialect=conn.dialect, compile_kwargs={'render_postcompile': True})
+    params = compiled.params
+    if compiled.positiontup:
+        params = tuple(params[name] for name in compiled.positiontup)
+    return compiled.string, params
+
+def explain(conn, query, allow_index_scan=False):
+    # Returns (plan lines, full table scans found)
+    sql, params = _compile(conn, query)
+    if conn.dialect.name == 'sqlite':
+        rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql, params).all()
+        plan = [row[3] for row in rows]
+        scans = [
+            line for line in plan
+            if (match := _SQLITE_SCAN_RE.match(line))
+            and match.group(2) in db.metadata.tables
+            and not (allow_index_scan and match.group('index'))
+        ]
+    elif conn.dialect.name == 'postgresql':
+        # Small tables make sequential scans look cheap; forbid them so the
+        # plan shows whether a usable index exists at all
+        conn.exec_driver_sql('SET LOCAL enable_seqscan = off')
+        plan = [row[0] for row in conn.exec_driver_sql('EXPLAIN ' + sql, params).all()]
+        scans = [line.strip() for line in plan if 'Seq Scan on' in line]
+    else:
+        raise RuntimeError(f'EXPLAIN is not supported for {conn.dialect.name}')
+    return plan, scans
+
+def check_query_plans(verbose=False):
+    failures = {}
+    for name, query in endpoint_queries():
+        with db.engine.connect() as conn:
+            plan, scans = explain(conn, query, name in ORDERED_INDEX_SCANS)
+            conn.rollback()
+        if scans:
+            failures[name] = scans
+        if verbose or scans:
+            print(f"{'FAIL' if scans else 'ok  '} {name}")
+            for line in plan:
+                print(f"       {line}")
+        else:
+            print(f"ok   {name}")
+    return failures
+
+@app.cli.command('explain-queries')
+@click.option('--verbose', '-v', is_flag=True, help='Print every plan, not only failing ones.')
+def explain_queries_command(verbose):
+    """EXPLAIN every endpoint query and fail on full table scans."""
+    failures = check_query_plans(verbose)
+    if failures:
+        print(f"{len(failures)} queries fall back to a full table scan")
+        sys.exit(1)
+    print("All endpoint queries use an index")
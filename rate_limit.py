@@ -0,0 +1,80 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, jsonify
+from app import app
+
+# Requests per second each client may make to the public catalog routes, with
+# bursts up to CATALOG_RATE_BURST; 0 disables the limit. Clients are told
+# apart by address. Behind a proxy, set PROXY_X_FOR to the number of proxies
+# (ProxyFix in app.py) so the address comes from X-Forwarded-For; left at 0
+# every client behind the proxy shares its bucket, and set higher than the
+# real count clients can pick their own address.
+app.config.setdefault('CATALOG_RATE_LIMIT', float(os.environ.get('CATALOG_RATE_LIMIT', 20)))
+app.config.setdefault('CATALOG_RATE_BURST', 60)
+# The same for the cart routes, which hold stock on every write
+app.config.setdefault('CART_RATE_LIMIT', float(os.environ.get('CART_RATE_LIMIT', 5)))
+app.config.setdefault('CART_RATE_BURST', 20)
+
+# Limiters
+# A limiter keeps one token bucket per client. The in-process one limits each
+# worker on its own; set_limiter() a shared one (e.g. Redis) with the same
+# take() to limit across workers.
+class TokenBuckets:
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()  # client -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def take(self, client, rate, burst):
+        # Takes a token from client's bucket. Returns (allowed, seconds until
+        # the next token).
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(client, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[client] = (tokens, now)
+            self._buckets.move_to_end(client)
+            # An evicted client starts again with a full bucket
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return allowed, 0 if allowed else (1 - tokens) / rate
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+_limiter = TokenBuckets()
+
+def set_limiter(limiter):
+    global _limiter
+    _limiter = limiter
+
+def _limited(f, name):
+    # Limits f by the {name}_RATE_LIMIT and {name}_RATE_BURST settings, with
+    # buckets of its own so one group of routes doesn't use up another's
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        rate = app.config[f'{name}_RATE_LIMIT']
+        if rate:
+            client = f'{name}:{request.remote_addr or ""}'
+            allowed, retry_after = _limiter.take(client, rate, app.config[f'{name}_RATE_BURST'])
+            if not allowed:
+                response = jsonify({'error': 'تعداد درخواست‌ها بیش از حد مجاز است، لطفا کمی بعد دوباره تلاش کنید'})
+                response.status_code = 429
+                response.headers['Retry-After'] = str(math.ceil(retry_after))
+                return response
+        return f(*args, **kwargs)
+    return decorated_function
+
+def rate_limited(f):
+    return _limited(f, 'CATALOG')
+
+def cart_rate_limited(f):
+    return _limited(f, 'CART')
@@ -0,0 +1,198 @@
+import re
+import logging
+from sqlalchemy import event
+from app import app, db
+from models import Product
+
+# Persian text normalization
+# Arabic yeh/kaf variants are mapped to their Persian forms so that text typed
+# on Arabic keyboards matches catalog entries (and vice versa).
+_CHAR_MAP = {
+    'ي': 'ی',  # Arabic yeh
+    'ى': 'ی',  # Alef maksura
+    'ك': 'ک',  # Arabic kaf
+    'ة': 'ه',  # Teh marbuta
+    'ۀ': 'ه',  # Heh with yeh above
+    'أ': 'ا',
+    'إ': 'ا',
+    'ٱ': 'ا',
+    '\u200c': '',  # ZWNJ
+    '\u200d': '',  # ZWJ
+    'ـ': '',  # Tatweel
+}
+# Persian and Arabic-Indic digits
+_CHAR_MAP.update({chr(0x06F0 + i): str(i) for i in range(10)})
+_CHAR_MAP.update({chr(0x0660 + i): str(i) for i in range(10)})
+# Harakat, tanwin, superscript alef and other combining marks
+_CHAR_MAP.update({chr(c): '' for c in range(0x064B, 0x0660)})
+_CHAR_MAP[chr(0x0670)] = ''
+
+_TRANSLATION = str.maketrans(_CHAR_MAP)
+_TOKEN_RE = re.compile(r'\w+')
+
+# Columns indexed for search, in the order they are stored in the index
+SEARCH_COLUMNS = ('name', 'name_persian', 'description', 'description_persian')
+
+def normalize_persian(text):
+    if not text:
+        return ''
+    return text.translate(_TRANSLATION).lower()
+
+def tokenize(text):
+    return _TOKEN_RE.findall(normalize_persian(text))
+
+def _dialect():
+    return db.engine.dialect.name
+
+# Index maintenance
+def _document(product):
+    return {
+        'id': product.id,
+        'name': normalize_persian(product.name),
+        'name_persian': normalize_persian(product.name_persian),
+        'description': normalize_persian(product.description),
+        'description_persian': normalize_persian(product.description_persian),
+    }
+
+def create_search_index():
+    dialect = _dialect()
+    with db.engine.begin() as conn:
+        if dialect == 'sqlite':
+            conn.exec_driver_sql(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS product_search USING fts5("
+                "name, name_persian, description, description_persian, "
+                "tokenize='unicode61 remove_diacritics 2')"
+            )
+        elif dialect == 'postgresql':
+            conn.exec_driver_sql(
+                "CREATE TABLE IF NOT EXISTS product_search ("
+                "product_id INTEGER PRIMARY KEY REFERENCES product(id) ON DELETE CASCADE, "
+                "document TSVECTOR NOT NULL)"
+            )
+            conn.exec_driver_sql(
+                "CREATE INDEX IF NOT EXISTS ix_product_search_document "
+                "ON product_search USING GIN (document)"
+            )
+        else:
+            return False
+    return True
+
+def ensure_search_index():
+    # Create the index if needed and backfill it when it is out of sync
+    if not create_search_index():
+        return
+    with db.engine.connect() as conn:
+        indexed = conn.exec_driver_sql("SELECT count(*) FROM product_search").scalar()
+        products = conn.execute(db.select(db.func.count(Product.id))).scalar()
+    if indexed != products:
+        rebuild_search_index()
+
+def _write_documents(conn, documents):
+    if not documents:
+        return
+    dialect = conn.dialect.name
+    if dialect == 'sqlite':
+        conn.execute(
+            db.text("DELETE FROM product_search WHERE rowid = :id"),
+            [{'id': doc['id']} for doc in documents]
+        )
+        conn.execute(
+            db.text(
+                "INSERT INTO product_search (rowid, name, name_persian, description, description_persian) "
+                "VALUES (:id, :name, :name_persian, :description, :description_persian)"
+            ),
+            documents
+        )
+    elif dialect == 'postgresql':
+        conn.execute(
+            db.text(
+                "INSERT INTO product_search (product_id, document) VALUES (:id, "
+                "setweight(to_tsvector('simple', :name || ' ' || :name_persian), 'A') || "
+                "setweight(to_tsvector('simple', :description || ' ' || :description_persian), 'B')) "
+                "ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document"
+            ),
+            documents
+        )
+
+def _delete_document(conn, product_id):
+    dialect = conn.dialect.name
+    if dialect == 'sqlite':
+        conn.execute(db.text("DELETE FROM product_search WHERE rowid = :id"), {'id': product_id})
+    elif dialect == 'postgresql':
+        conn.execute(db.text("DELETE FROM product_search WHERE product_id = :id"), {'id': product_id})
+
+def index_products(conn, product_ids):
+    # Refresh the documents of products written without the ORM (bulk paths)
+    columns = [Product.id] + [getattr(Product, column) for column in SEARCH_COLUMNS]
+    rows = conn.execute(db.select(*columns).where(Product.id.in_(list(product_ids)))).all()
+    _write_documents(conn, [_document(row) for row in rows])
+
+def rebuild_search_index(batch_size=1000):
+    dialect = _dialect()
+    if dialect not in ('sqlite', 'postgresql'):
+        return 0
+
+    count = 0
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM product_search")
+        columns = [Product.id] + [getattr(Product, column) for column in SEARCH_COLUMNS]
+        result = conn.execution_options(yield_per=batch_size).execute(db.select(*columns))
+        for rows in result.partitions():
+            documents = [_document(row) for row in rows]
+            _write_documents(conn, documents)
+            count += len(documents)
+
+    logging.info(f"Search index rebuilt with {count} products")
+    return count
+
+# Keep the index in sync with the product table, in the same transaction
+@event.listens_for(Product, 'after_insert')
+@event.listens_for(Product, 'after_update')
+def _index_product(mapper, connection, target):
+    _write_documents(connection, [_document(target)])
+
+@event.listens_for(Product, 'after_delete')
+def _unindex_product(mapper, connection, target):
+    _delete_document(connection, target.id)
+
+# Querying
+def apply_search(query, search):
+    # Filter a Product query by the search text, most relevant first
+    tokens = tokenize(search)
+    if not tokens:
+        return query
+
+    dialect = _dialect()
+    if dialect == 'sqlite':
+        # Every token must match, as a prefix, in any of the indexed columns
+        match = ' '.join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+        index = db.table('product_search', db.column('rowid'))
+        # LIMIT -1 keeps SQLite from flattening the subquery, so the matches
+        # are collected once. Flattened, a COUNT(*) walks every active product
+        # and runs the MATCH per row, which takes minutes on a large catalog.
+        ranked = db.select(
+            index.c.rowid.label('product_id'),
+            db.literal_column('bm25(product_search, 10.0, 10.0, 1.0, 1.0)').label('rank'),
+        ).where(
+            db.text("product_search MATCH :match").bindparams(match=match)
+        ).limit(-1).subquery('ranked')
+        return query.join(ranked, ranked.c.product_id == Product.id).order_by(ranked.c.rank, Product.id)
+
+    if dialect == 'postgresql':
+        tsquery = db.func.to_tsquery('simple', ' & '.join(f'{token}:*' for token in tokens))
+        index = db.table('product_search', db.column('product_id'), db.column('document'))
+        return query.join(index, index.c.product_id == Product.id).filter(
+            index.c.document.op('@@')(tsquery)
+        ).order_by(db.func.ts_rank(index.c.document, tsquery).desc(), Product.id)
+
+    # No search index on this backend, fall back to substring matching
+    return query.filter(
+        db.or_(*[getattr(Product, column).contains(search) for column in SEARCH_COLUMNS])
+    )
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Rebuild the product full-text search index."""
+    create_search_index()
+    count = rebuild_search_index()
+    print(f"Indexed {count} products")
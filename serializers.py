@@ -0,0 +1,121 @@
+from datetime import datetime
+from sqlalchemy.orm import joinedload, selectinload, load_only, RelationshipProperty
+from models import Product, Order, BlogPost
+from images import derivative_urls
+
+# Relationship graphs walked by each model's to_dict(). Endpoints load the graph
+# they serialize up front so that to_dict() never triggers a lazy load.
+PRODUCT_GRAPH = {'category': {}}
+ORDER_ITEM_GRAPH = {'product': PRODUCT_GRAPH}
+ORDER_GRAPH = {'order_items': ORDER_ITEM_GRAPH}
+
+def loader_options(model, graph, parent=None):
+    # Collections are loaded with one extra SELECT ... IN per level, scalar
+    # relationships are joined into the parent query
+    options = []
+    for name, subgraph in graph.items():
+        attribute = getattr(model, name)
+        relationship = attribute.property
+        if parent is None:
+            loader = selectinload(attribute) if relationship.uselist else joinedload(attribute)
+        elif relationship.uselist:
+            loader = parent.selectinload(attribute)
+        else:
+            loader = parent.joinedload(attribute)
+
+        if subgraph:
+            options.extend(loader_options(relationship.mapper.class_, subgraph, loader))
+        else:
+            options.append(loader)
+    return options
+
+def eager(model, graph):
+    return model.query.options(*loader_options(model, graph))
+
+def product_query():
+    return eager(Product, PRODUCT_GRAPH)
+
+def order_query():
+    return eager(Order, ORDER_GRAPH)
+
+# Sparse fieldsets
+# Detail shapes match to_dict(); list shapes only carry what listing pages
+# render. Clients can ask for any subset with ?fields=a,b,c.
+PRODUCT_FIELDS = (
+    'id', 'name', 'name_persian', 'description', 'description_persian', 'price',
+    'stock_quantity', 'image_url', 'images', 'category_id', 'category', 'is_active', 'brand',
+    'weight', 'serving_size', 'servings_per_container', 'ingredients',
+    'usage_instructions', 'warnings', 'created_at'
+)
+PRODUCT_LIST_FIELDS = (
+    'id', 'name', 'name_persian', 'description', 'description_persian', 'price',
+    'stock_quantity', 'image_url', 'images', 'category_id', 'is_active', 'brand', 'weight'
+)
+BLOG_POST_FIELDS = (
+    'id', 'title', 'title_persian', 'content', 'content_persian', 'excerpt',
+    'excerpt_persian', 'image_url', 'author_id', 'author', 'author_name', 'is_published',
+    'meta_title', 'meta_description', 'slug', 'created_at'
+)
+BLOG_POST_LIST_FIELDS = (
+    'id', 'title', 'title_persian', 'excerpt', 'excerpt_persian', 'image_url',
+    'author_id', 'author_name', 'slug', 'created_at'
+)
+
+# Computed fields: field -> (attribute or relationship it reads, getter)
+COMPUTED_FIELDS = {
+    Product: {
+        'images': ('image_url', lambda product: derivative_urls(product.image_url)),
+        'category': ('category', lambda product: product.category.to_dict() if product.category else None),
+    },
+    BlogPost: {
+        'author': ('author', lambda post: post.author.to_dict() if post.author else None),
+        'author_name': ('author', lambda post: (post.author.full_name or post.author.username) if post.author else None),
+    },
+}
+FIELDS = {Product: PRODUCT_FIELDS, BlogPost: BLOG_POST_FIELDS}
+
+# Columns the endpoints read themselves (keyset cursors, visibility checks)
+ALWAYS_LOADED = {
+    Product: ('created_at', 'is_active'),
+    BlogPost: ('created_at', 'is_published'),
+}
+
+def parse_fields(model, raw, default):
+    # Raises ValueError listing the unknown field names
+    if not raw:
+        return default
+    fields = tuple(dict.fromkeys(field.strip() for field in raw.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in FIELDS[model]]
+    if unknown:
+        raise ValueError(', '.join(unknown))
+    return fields or default
+
+def projected_query(model, fields):
+    # SELECT only the columns behind the requested fields, and join in the
+    # relationships that computed fields need
+    computed = COMPUTED_FIELDS.get(model, {})
+    columns = [getattr(model, name) for name in ALWAYS_LOADED.get(model, ())]
+    relationships = set()
+    for field in fields:
+        attribute = getattr(model, computed[field][0] if field in computed else field)
+        if isinstance(attribute.property, RelationshipProperty):
+            relationships.add(attribute)
+        else:
+            columns.append(attribute)
+
+    options = []
+    for attribute in relationships:
+        columns.extend(getattr(model, column.key) for column in attribute.property.local_columns)
+        options.append(joinedload(attribute))
+    return model.query.options(load_only(*columns), *options)
+
+def to_fields_dict(obj, fields):
+    computed = COMPUTED_FIELDS.get(type(obj), {})
+    data = {}
+    for field in fields:
+        if field in computed:
+            data[field] = computed[field][1](obj)
+        else:
+            value = getattr(obj, field)
+            data[field] = value.isoformat() if isinstance(value, datetime) else value
+    return data
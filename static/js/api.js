@@ -23,12 +23,28 @@ class API {
         
         if (!response.ok) {
             const error = await response.json().catch(() => ({ error: 'Network error occurred' }));
-            throw new Error(error.error || `HTTP ${response.status}`);
+            const failure = new Error(error.error || `HTTP ${response.status}`);
+            failure.status = response.status;
+            throw failure;
         }
 
         return response.json();
     }
 
+    // Run several GET requests in one round-trip; resolves to {id: {status, body}}
+    async batch(requests) {
+        const response = await this.request('/batch', {
+            method: 'POST',
+            body: JSON.stringify({ requests })
+        });
+
+        const results = {};
+        response.responses.forEach(item => {
+            results[item.id] = { status: item.status, body: item.body };
+        });
+        return results;
+    }
+
     // Authentication methods
     async login(username, password) {
         const response = await this.request('/auth/login', {
@@ -76,6 +92,11 @@ class API {
         return this.request(endpoint);
     }
 
+    async suggestProducts(query, limit = 8) {
+        const queryString = new URLSearchParams({ q: query, limit }).toString();
+        return this.request(`/products/suggest?${queryString}`);
+    }
+
     async getProduct(id) {
         return this.request(`/products/${id}`);
     }
@@ -125,6 +146,31 @@ class API {
         });
     }
 
+    // Server-side cart: items are held in stock for a limited time
+    async getCart() {
+        return this.request('/cart');
+    }
+
+    async replaceCart(items) {
+        return this.request('/cart', {
+            method: 'PUT',
+            body: JSON.stringify({ items })
+        });
+    }
+
+    async clearCart() {
+        return this.request('/cart', {
+            method: 'DELETE'
+        });
+    }
+
+    async checkoutCart(orderData) {
+        return this.request('/cart/checkout', {
+            method: 'POST',
+            body: JSON.stringify(orderData)
+        });
+    }
+
     // Order methods
     async createOrder(orderData) {
         return this.request('/orders', {
@@ -191,6 +237,13 @@ class API {
     async getStats() {
         return this.request('/admin/stats');
     }
+
+    // params: start, end (YYYY-MM-DD), granularity (day|week|month), window, top
+    async getSalesAnalytics(params = {}) {
+        const queryString = new URLSearchParams(params).toString();
+        const endpoint = queryString ? `/admin/analytics/sales?${queryString}` : '/admin/analytics/sales';
+        return this.request(endpoint);
+    }
 }
 
 // Initialize API client
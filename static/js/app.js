@@ -16,7 +16,7 @@ class App {
         }, 1000);
 
         // Load initial data
-        await this.loadCategories();
+        await this.loadInitialData();
         
         // Show home page by default
         this.showHome();
@@ -27,6 +27,42 @@ class App {
         });
     }
 
+    async loadInitialData() {
+        // Categories, featured products and the profile in one request
+        const requests = [
+            { id: 'categories', path: '/api/categories' },
+            { id: 'featured', path: '/api/products?per_page=4' }
+        ];
+        if (window.auth.getToken()) {
+            requests.push({ id: 'profile', path: '/api/auth/profile' });
+        }
+
+        try {
+            const results = await window.api.batch(requests);
+            if (results.categories.status === 200) {
+                this.categories = results.categories.body.categories;
+            }
+            if (results.featured.status === 200) {
+                this.featuredProducts = results.featured.body;
+            }
+            if (results.profile) {
+                if (results.profile.status === 200) {
+                    window.auth.setUser(results.profile.body.user);
+                } else if (results.profile.status === 401) {
+                    window.auth.logout();
+                }
+            }
+        } catch (error) {
+            console.error('Error loading initial data:', error);
+            await this.loadCategories();
+            if (window.auth.getToken()) {
+                await window.auth.loadCurrentUser().catch((error) => {
+                    console.error('Error loading profile:', error);
+                });
+            }
+        }
+    }
+
     async loadCategories() {
         try {
             const response = await window.api.getCategories();
@@ -284,8 +320,12 @@ class App {
                                     id="product-search"
                                     placeholder="نام محصول..." 
                                     class="form-input"
+                                    list="product-suggestions"
+                                    autocomplete="off"
+                                    oninput="app.suggestProducts(this.value)"
                                     onchange="app.filterProducts()"
                                 >
+                                <datalist id="product-suggestions"></datalist>
                             </div>
                             
                             <!-- Categories -->
@@ -823,10 +863,13 @@ class App {
 
         const formData = new FormData(event.target);
         const orderData = Object.fromEntries(formData.entries());
-        orderData.items = window.cart.items;
 
         try {
-            const response = await window.api.createOrder(orderData);
+            // Renew the stock holds, then order what is held
+            if (!await window.cart.syncServer()) {
+                return;
+            }
+            const response = await window.api.checkoutCart(orderData);
             window.cart.clear();
             this.showToast('سفارش شما با موفقیت ثبت شد', 'success');
             this.showDashboard();
@@ -894,7 +937,9 @@ class App {
             const container = document.getElementById('featured-products');
             if (!container) return;
 
-            const response = await window.api.getProducts({ per_page: 4 });
+            // The first home page render uses the products from the initial batch
+            const response = this.featuredProducts || await window.api.getProducts({ per_page: 4 });
+            this.featuredProducts = null;
             
             if (response.products.length > 0) {
                 container.innerHTML = response.products.map(product => 
@@ -1021,6 +1066,33 @@ class App {
         }
     }
 
+    // Type-ahead suggestions for the search box, debounced per keystroke
+    suggestProducts(query) {
+        clearTimeout(this.suggestTimer);
+        this.suggestTimer = setTimeout(async () => {
+            const list = document.getElementById('product-suggestions');
+            if (!list) return;
+            if (!query.trim()) {
+                list.innerHTML = '';
+                return;
+            }
+
+            try {
+                const response = await window.api.suggestProducts(query);
+                const options = [
+                    ...response.brands.map(item => item.brand),
+                    ...response.products.map(product => product.name_persian)
+                ];
+                list.innerHTML = options.map(option => {
+                    const value = option.replace(/"/g, '&quot;');
+                    return `<option value="${value}"></option>`;
+                }).join('');
+            } catch (error) {
+                console.error('Error loading suggestions:', error);
+            }
+        }, 150);
+    }
+
     // Utility methods
     filterProducts() {
         const search = document.getElementById('product-search')?.value || '';
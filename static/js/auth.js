@@ -7,14 +7,13 @@ class Auth {
     }
 
     async init() {
-        if (this.token) {
-            try {
-                await this.loadCurrentUser();
-            } catch (error) {
-                console.error('Failed to load user:', error);
-                this.logout();
-            }
-        }
+        // The profile comes with the app's first batch (App.loadInitialData),
+        // which falls back to loadCurrentUser() if the batch fails
+    }
+
+    setUser(user) {
+        this.user = user;
+        this.dispatchAuthStateChange();
     }
 
     async loadCurrentUser() {
@@ -26,7 +25,10 @@ class Auth {
             this.dispatchAuthStateChange();
             return this.user;
         } catch (error) {
-            this.logout();
+            // Only a rejected token ends the session; a failed request doesn't
+            if (error.status === 401) {
+                this.logout();
+            }
             throw error;
         }
     }
@@ -23,6 +23,13 @@ class Cart {
             }
         });
 
+        // Hold the stored cart on the server once the user is known
+        window.addEventListener('authStateChange', (e) => {
+            if (e.detail) {
+                this.syncServer();
+            }
+        });
+
         this.updateCartCount();
     }
 
@@ -44,6 +51,7 @@ class Cart {
         this.saveToStorage();
         this.updateCartCount();
         this.render();
+        this.syncServer();
         
         // Show success message
         if (window.app) {
@@ -59,6 +67,7 @@ class Cart {
         this.saveToStorage();
         this.updateCartCount();
         this.render();
+        this.syncServer();
     }
 
     updateQuantity(productId, quantity) {
@@ -71,6 +80,7 @@ class Cart {
                 this.saveToStorage();
                 this.updateCartCount();
                 this.render();
+                this.syncServer();
             }
         }
     }
@@ -80,6 +90,52 @@ class Cart {
         this.saveToStorage();
         this.updateCartCount();
         this.render();
+        if (window.auth && window.auth.isAuthenticated()) {
+            window.api.clearCart().catch(error => console.error('Error clearing server cart:', error));
+        }
+    }
+
+    // Hold the cart's items in stock on the server. Items that can't be
+    // held in full drop back to what the server holds for them.
+    async syncServer() {
+        if (!window.auth || !window.auth.isAuthenticated()) {
+            return true;
+        }
+
+        try {
+            const cart = await window.api.replaceCart(this.getCartData().items);
+            if (cart.shortages.length === 0) {
+                return true;
+            }
+
+            const held = {};
+            cart.items.forEach(item => {
+                held[item.product_id] = item.quantity;
+            });
+            cart.shortages.forEach(shortage => {
+                const item = this.items.find(item => item.productId === shortage.product_id);
+                if (item) {
+                    item.quantity = held[shortage.product_id] || 0;
+                }
+            });
+            const names = this.items.filter(item => cart.shortages.some(s => s.product_id === item.productId))
+                .map(item => item.name);
+            this.items = this.items.filter(item => item.quantity > 0);
+            this.saveToStorage();
+            this.updateCartCount();
+            this.render();
+
+            if (window.app) {
+                window.app.showToast(`موجودی کافی نیست: ${names.join('، ')}`, 'error');
+            }
+            return false;
+        } catch (error) {
+            console.error('Error syncing cart:', error);
+            if (window.app) {
+                window.app.showToast(error.message, 'error');
+            }
+            return false;
+        }
     }
 
     getTotal() {
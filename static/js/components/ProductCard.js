@@ -9,6 +9,7 @@ class ProductCard {
                 <div class="relative">
                     <img 
                         src="${product.image_url || '/static/images/product-placeholder.svg'}" 
+                        ${ProductCard.srcset(product) ? `srcset="${ProductCard.srcset(product)}" sizes="(min-width: 1024px) 25vw, (min-width: 640px) 50vw, 100vw"` : ''}
                         alt="${product.name_persian}"
                         class="w-full h-48 object-cover"
                         onerror="this.src='/static/images/product-placeholder.svg'"
@@ -257,6 +258,12 @@ class ProductCard {
         `;
     }
 
+    // Resized WebP derivatives of the product image, if the server has them
+    static srcset(product) {
+        if (!product.images || !product.images.webp) return '';
+        return product.images.webp.map(image => `${image.url} ${image.width}w`).join(', ');
+    }
+
     static formatPrice(price) {
         return new Intl.NumberFormat('fa-IR').format(price) + ' تومان';
     }
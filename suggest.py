@@ -0,0 +1,257 @@
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import timedelta
+from app import app, db
+from models import Product, OrderItem
+from catalog_cache import catalog_version
+from search import tokenize
+
+# Prefix autocomplete over product names (English and Persian) and brands.
+# Products get positions in popularity order (units sold, then id), and each
+# normalized token keeps a bitset of the positions it appears in. A query's
+# terms are prefix-matched with bisect over the sorted vocabulary; ANDing the
+# terms' bitsets and taking the lowest set bits yields the best sellers first.
+#
+# Catalog writes (the catalog version moves) are patched in from the rows
+# whose updated_at passed the snapshot's watermark; new products go to the
+# end of the ranking. Sales only move the ranking on the periodic rebuild,
+# which runs in a background thread while the old snapshot keeps serving.
+app.config.setdefault('SUGGEST_LIMIT', 8)
+app.config.setdefault('SUGGEST_BRAND_LIMIT', 3)
+app.config.setdefault('SUGGEST_REBUILD_INTERVAL', 900)
+app.config.setdefault('SUGGEST_REFRESH_OVERLAP', 5)  # seconds, covers late commits and clock skew
+
+# Short prefixes match many tokens; their unions are kept per snapshot
+_CACHED_PREFIX_LENGTH = 2
+_PREFIX_CACHE_SIZE = 1024
+
+_COLUMNS = (Product.id, Product.is_active, Product.name, Product.name_persian, Product.brand, Product.updated_at)
+
+def _terms(name, name_persian, brand, words):
+    # Names share most of their words, so tokens are cached per raw word in
+    # words. Digit-only tokens (catalog numbers, weights split at the decimal
+    # point) make poor suggestions and would bloat the vocabulary.
+    terms = set()
+    for word in ' '.join(filter(None, (name, name_persian, brand))).split():
+        tokens = words.get(word)
+        if tokens is None:
+            tokens = words[word] = [token for token in tokenize(word) if not token.isdigit()]
+        terms.update(tokens)
+    return terms
+
+def _brand_keys(brand):
+    # The normalized brand and every word-start suffix of it, so 'nutrition'
+    # finds 'Optimum Nutrition'
+    terms = tokenize(brand)
+    return {' '.join(terms[start:]) for start in range(len(terms))}
+
+class SuggestIndex:
+    def __init__(self):
+        self.version = None
+        self.watermark = None
+        self.built_at = time.monotonic()
+        self.products = []     # position -> (id, name, name_persian, brand, sold), None once inactive
+        self.positions = {}    # product id -> position
+        self.tokens = {}       # token -> bitset of positions
+        self.vocabulary = []   # sorted tokens
+        self.brand_keys = []   # sorted (key, brand)
+        self.brand_sales = {}  # brand -> units sold
+        self._prefixes = {}
+
+    @classmethod
+    def build(cls, rows, sales, version):
+        index = cls()
+        index.version = version
+        index.watermark = max((row.updated_at for row in rows if row.updated_at is not None), default=None)
+        active = sorted((row for row in rows if row.is_active), key=lambda row: (-sales.get(row.id, 0), row.id))
+
+        postings = {}
+        words = {}
+        for position, row in enumerate(active):
+            sold = sales.get(row.id, 0)
+            index.products.append((row.id, row.name, row.name_persian, row.brand, sold))
+            index.positions[row.id] = position
+            for term in _terms(row.name, row.name_persian, row.brand, words):
+                positions = postings.get(term)
+                if positions is None:
+                    positions = postings[term] = []
+                positions.append(position)
+            if row.brand:
+                index.brand_sales[row.brand] = index.brand_sales.get(row.brand, 0) + sold
+
+        size = len(active)
+        for term, positions in postings.items():
+            data = bytearray((size >> 3) + 1)
+            for position in positions:
+                data[position >> 3] |= 1 << (position & 7)
+            index.tokens[term] = int.from_bytes(data, 'little')
+        index.vocabulary = sorted(index.tokens)
+        index.brand_keys = sorted((key, brand) for brand in index.brand_sales for key in _brand_keys(brand))
+        return index
+
+    def apply(self, rows, version):
+        # A new snapshot with changed products patched in; new and
+        # re-activated products rank last until the next rebuild
+        index = SuggestIndex()
+        index.version = version
+        index.watermark = self.watermark
+        index.built_at = self.built_at
+        index.products = list(self.products)
+        index.positions = dict(self.positions)
+        index.tokens = dict(self.tokens)
+        index.vocabulary = list(self.vocabulary)
+        index.brand_keys = list(self.brand_keys)
+        index.brand_sales = dict(self.brand_sales)
+
+        words = {}
+        for row in rows:
+            if row.updated_at is not None and (index.watermark is None or row.updated_at > index.watermark):
+                index.watermark = row.updated_at
+            position = index.positions.get(row.id)
+            sold = 0
+            if position is not None and index.products[position] is not None:
+                _, name, name_persian, brand, sold = index.products[position]
+                for term in _terms(name, name_persian, brand, words):
+                    index.tokens[term] &= ~(1 << position)
+            if not row.is_active:
+                if position is not None:
+                    index.products[position] = None
+                continue
+
+            if position is None:
+                position = len(index.products)
+                index.products.append(None)
+                index.positions[row.id] = position
+            index.products[position] = (row.id, row.name, row.name_persian, row.brand, sold)
+            for term in _terms(row.name, row.name_persian, row.brand, words):
+                if term not in index.tokens:
+                    index.tokens[term] = 0
+                    insort(index.vocabulary, term)
+                index.tokens[term] |= 1 << position
+            if row.brand and row.brand not in index.brand_sales:
+                index.brand_sales[row.brand] = 0
+                for key in _brand_keys(row.brand):
+                    insort(index.brand_keys, (key, row.brand))
+        return index
+
+    def matches(self, prefix):
+        # Bitset of products with a token starting with prefix
+        mask = self._prefixes.get(prefix)
+        if mask is None:
+            mask = 0
+            vocabulary = self.vocabulary
+            for i in range(bisect_left(vocabulary, prefix), len(vocabulary)):
+                if not vocabulary[i].startswith(prefix):
+                    break
+                mask |= self.tokens[vocabulary[i]]
+            if len(prefix) <= _CACHED_PREFIX_LENGTH and len(self._prefixes) < _PREFIX_CACHE_SIZE:
+                self._prefixes[prefix] = mask
+        return mask
+
+    def suggest(self, query, limit, brand_limit):
+        terms = tokenize(query)
+        if not terms:
+            return [], []
+
+        # Longest terms first: they are the most selective
+        mask = None
+        for term in sorted(terms, key=len, reverse=True):
+            mask = self.matches(term) if mask is None else mask & self.matches(term)
+            if not mask:
+                break
+        products = []
+        while mask and len(products) < limit:
+            low = mask & -mask
+            mask ^= low
+            product = self.products[low.bit_length() - 1]
+            if product is not None:
+                products.append(product)
+
+        key = ' '.join(terms)
+        brands = set()
+        for i in range(bisect_left(self.brand_keys, (key,)), len(self.brand_keys)):
+            candidate, brand = self.brand_keys[i]
+            if not candidate.startswith(key):
+                break
+            brands.add(brand)
+        brands = sorted(brands, key=lambda brand: (-self.brand_sales[brand], brand))[:brand_limit]
+        return products, [(brand, self.brand_sales[brand]) for brand in brands]
+
+_index = None
+_index_lock = threading.Lock()
+_rebuilding = threading.Event()
+
+def _load(since=None):
+    if since is None:
+        return db.session.execute(db.select(*_COLUMNS)).all()
+    return sorted(db.session.execute(db.select(*_COLUMNS).where(Product.updated_at >= since)).all(),
+                  key=lambda row: row.id)
+
+def _sales():
+    rows = db.session.execute(
+        db.select(OrderItem.product_id, db.func.sum(OrderItem.quantity)).group_by(OrderItem.product_id)
+    )
+    return {product_id: int(sold or 0) for product_id, sold in rows}
+
+def _rebuild(version):
+    start = time.perf_counter()
+    index = SuggestIndex.build(_load(), _sales(), version)
+    logging.info(f"Suggest index built: {len(index.products)} products, {len(index.vocabulary)} terms "
+                 f"in {time.perf_counter() - start:.2f}s")
+    return index
+
+def _rebuild_in_background():
+    def run():
+        global _index
+        try:
+            with app.app_context():
+                index = _rebuild(catalog_version())
+            with _index_lock:
+                _index = index
+        except Exception as e:
+            logging.error(f"Suggest index rebuild error: {str(e)}")
+        finally:
+            _rebuilding.clear()
+
+    if not _rebuilding.is_set():
+        _rebuilding.set()
+        threading.Thread(target=run, daemon=True).start()
+
+def get_suggest_index():
+    global _index
+    index = _index
+    version = catalog_version()
+    if index is not None and time.monotonic() - index.built_at > app.config['SUGGEST_REBUILD_INTERVAL']:
+        _rebuild_in_background()
+    if index is not None and index.version == version:
+        return index
+
+    # Only one thread patches; the others keep serving the last snapshot
+    if not _index_lock.acquire(blocking=index is None):
+        return index
+    try:
+        if _index is None:
+            _index = _rebuild(version)
+        elif _index.version != version:
+            if _index.watermark is None:
+                _index = _rebuild(version)
+            else:
+                since = _index.watermark - timedelta(seconds=app.config['SUGGEST_REFRESH_OVERLAP'])
+                _index = _index.apply(_load(since), version)
+        return _index
+    finally:
+        _index_lock.release()
+
+def suggest_products(query, limit=None):
+    # Returns {'products': [...], 'brands': [...]} for a partial query
+    limit = limit or app.config['SUGGEST_LIMIT']
+    products, brands = get_suggest_index().suggest(query, limit, app.config['SUGGEST_BRAND_LIMIT'])
+    return {
+        'products': [
+            {'id': product_id, 'name': name, 'name_persian': name_persian, 'brand': brand, 'sold': sold}
+            for product_id, name, name_persian, brand, sold in products
+        ],
+        'brands': [{'brand': brand, 'sold': sold} for brand, sold in brands],
+    }
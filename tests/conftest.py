@@ -0,0 +1,41 @@
+import os
+import tempfile
+
+# The app is configured from the environment when it is first imported
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db')
+os.environ['CATALOG_RATE_LIMIT'] = '0'
+os.environ['CART_RATE_LIMIT'] = '0'
+
+import pytest
+from flask_jwt_extended import create_access_token
+from app import app as flask_app, db, bootstrap
+from models import User
+
+@pytest.fixture(scope='session')
+def app():
+    with flask_app.app_context():
+        bootstrap()
+    return flask_app
+
+@pytest.fixture
+def client(app):
+    with app.app_context():
+        yield app.test_client()
+
+@pytest.fixture
+def admin_headers(client):
+    admin = User.query.filter_by(role='admin').first()
+    return {'Authorization': f'Bearer {create_access_token(identity=str(admin.id))}'}
+
+@pytest.fixture
+def customer(client):
+    user = User.query.filter_by(email='customer@example.com').first()
+    if user is None:
+        user = User(username='customer', email='customer@example.com', password_hash='-', full_name='مشتری')
+        db.session.add(user)
+        db.session.commit()
+    return user
+
+@pytest.fixture
+def customer_headers(customer):
+    return {'Authorization': f'Bearer {create_access_token(identity=str(customer.id))}'}
@@ -0,0 +1,30 @@
+from app import db
+from models import User
+import auth
+
+def test_deactivated_admin_is_refused(client, admin_headers):
+    admin = User.query.filter_by(role='admin').first()
+    # Cache the identity first
+    assert client.get('/api/admin/dashboard', headers=admin_headers).status_code == 200
+    try:
+        admin.is_active = False
+        db.session.commit()
+        assert client.get('/api/admin/dashboard', headers=admin_headers).status_code == 403
+    finally:
+        admin.is_active = True
+        db.session.commit()
+
+def test_deactivated_admin_is_refused_from_the_cache(client, admin_headers):
+    admin = User.query.filter_by(role='admin').first()
+    assert client.get('/api/admin/dashboard', headers=admin_headers).status_code == 200
+    try:
+        # A bulk update skips the mapper events, so the cached identity
+        # still says active until it is refreshed
+        db.session.execute(db.update(User).where(User.id == admin.id).values(is_active=False))
+        db.session.commit()
+        auth._cache_identity(db.session.get(User, admin.id))
+        assert client.get('/api/admin/dashboard', headers=admin_headers).status_code == 403
+    finally:
+        db.session.execute(db.update(User).where(User.id == admin.id).values(is_active=True))
+        db.session.commit()
+        auth.invalidate_identity(admin.id)
@@ -0,0 +1,117 @@
+import time
+import pytest
+from app import app, db
+from models import Category, Product, Order
+import cart
+import rate_limit
+from cart import MemoryHoldStore
+
+# Hold store accounting
+def test_holds_count_against_other_buyers():
+    store = MemoryHoldStore()
+    assert store.hold('a', 1, 3, stock=5, ttl=60) == (True, 5)
+    assert store.hold('b', 1, 3, stock=5, ttl=60) == (False, 2)
+    assert store.hold('b', 1, 2, stock=5, ttl=60) == (True, 2)
+    # Changing a hold only counts the others' units
+    assert store.hold('a', 1, 4, stock=5, ttl=60) == (False, 3)
+    assert store.hold('a', 1, 1, stock=5, ttl=60) == (True, 3)
+    assert store.held([1], exclude='b') == {1: 1}
+    assert store.held([1]) == {1: 3}
+
+def test_released_holds_leave_no_counts_behind():
+    store = MemoryHoldStore()
+    store.hold('a', 1, 2, stock=5, ttl=60)
+    store.hold('a', 2, 1, stock=5, ttl=60)
+    store.hold('b', 1, 1, stock=5, ttl=60)
+    store.release('a', [1])
+    assert store.holds('a').keys() == {2}
+    assert store.held([1, 2]) == {1: 1, 2: 1}
+    store.release('a')
+    store.release('b')
+    assert store._holds == {} and store._held == {}
+
+def test_expired_holds_are_swept():
+    store = MemoryHoldStore()
+    store.hold('a', 1, 2, stock=5, ttl=60)
+    store.hold('b', 1, 1, stock=5, ttl=120)
+    # Extending a hold leaves its old heap entry behind, which must not expire it
+    store.hold('a', 1, 2, stock=5, ttl=300)
+    now = time.time()
+    assert store.sweep(now + 200) == 1
+    assert store.held([1]) == {1: 2}
+    assert store.sweep(now + 400) == 1
+    assert store.held([1]) == {} and store._expiry == []
+
+def test_moved_holds_stay_held_and_expire():
+    store = MemoryHoldStore()
+    store.hold('a', 1, 2, stock=5, ttl=60)
+    assert store.move('a', 'checkout:a') == store.holds('checkout:a')
+    assert store.move('a', 'checkout:a') == {}
+    assert store.hold('b', 1, 4, stock=5, ttl=60) == (False, 3)
+    store.hold('a', 1, 1, stock=5, ttl=60)
+    store.move('checkout:a', 'a')
+    assert store.holds('a')[1][0] == 3
+    assert store.sweep(time.time() + 120) == 1
+    assert store._holds == {} and store._held == {}
+
+# Routes
+@pytest.fixture
+def products(client):
+    cart.set_store(MemoryHoldStore())
+    category = Category(name='Cart', name_persian='سبد')
+    number = Product.query.count()
+    products = [
+        Product(name=f'Cart product {number + i}', name_persian='محصول سبد', price=100, stock_quantity=5, category=category)
+        for i in range(2)
+    ]
+    db.session.add_all(products)
+    db.session.commit()
+    return products
+
+def checkout(client, headers):
+    return client.post('/api/cart/checkout', headers=headers, json={'shipping_address': 'تهران', 'phone': '09120000000'})
+
+def test_holds_are_capped_per_product(client, customer_headers, products):
+    path = f'/api/cart/items/{products[0].id}'
+    limit = app.config['CART_MAX_QUANTITY']
+    products[0].stock_quantity = limit + 5
+    db.session.commit()
+    assert client.put(path, headers=customer_headers, json={'quantity': limit + 1}).status_code == 400
+    response = client.put('/api/cart', headers=customer_headers, json={'items': [
+        {'product_id': products[0].id, 'quantity': limit},
+        {'product_id': products[0].id, 'quantity': 1},
+    ]})
+    assert response.status_code == 400
+    assert client.put(path, headers=customer_headers, json={'quantity': limit}).status_code == 200
+
+def test_second_checkout_does_not_order_again(client, customer, customer_headers, products):
+    client.put(f'/api/cart/items/{products[0].id}', headers=customer_headers, json={'quantity': 2})
+    orders = Order.query.filter_by(user_id=customer.id).count()
+
+    assert checkout(client, customer_headers).status_code == 201
+    assert checkout(client, customer_headers).status_code == 400
+
+    assert Order.query.filter_by(user_id=customer.id).count() == orders + 1
+    assert db.session.get(Product, products[0].id).stock_quantity == 3
+    assert cart.get_store().held([products[0].id]) == {}
+
+def test_failed_checkout_puts_the_other_holds_back(client, customer, customer_headers, products):
+    for product in products:
+        client.put(f'/api/cart/items/{product.id}', headers=customer_headers, json={'quantity': 2})
+    # Stock sold outside the cart
+    products[1].stock_quantity = 1
+    db.session.commit()
+
+    assert checkout(client, customer_headers).status_code == 409
+
+    assert cart.get_store().holds(customer.id).keys() == {products[0].id}
+    assert db.session.get(Product, products[0].id).stock_quantity == 5
+    items = client.get('/api/cart', headers=customer_headers).get_json()['items']
+    assert [(item['product_id'], item['quantity']) for item in items] == [(products[0].id, 2)]
+
+def test_cart_routes_are_rate_limited(client, customer_headers, monkeypatch):
+    monkeypatch.setitem(app.config, 'CART_RATE_LIMIT', 1)
+    monkeypatch.setitem(app.config, 'CART_RATE_BURST', 2)
+    rate_limit.set_limiter(rate_limit.TokenBuckets())
+    statuses = [client.get('/api/cart', headers=customer_headers).status_code for _ in range(3)]
+    assert statuses == [200, 200, 429]
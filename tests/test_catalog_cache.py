@@ -0,0 +1,56 @@
+import pytest
+from app import db
+from models import Category, Product
+import catalog_cache
+
+@pytest.fixture
+def product(client):
+    category = Category(name='Cached', name_persian='کش')
+    # Product names are unique
+    number = Product.query.count()
+    product = Product(name=f'Cached product {number}', name_persian='محصول کش', price=100, stock_quantity=3, category=category)
+    db.session.add(product)
+    db.session.commit()
+    catalog_cache.set_backend(catalog_cache.LRUCache())
+    return product
+
+def order(client, headers, product, quantity):
+    response = client.post('/api/orders', headers=headers, json={
+        'items': [{'product_id': product.id, 'quantity': quantity}],
+        'shipping_address': 'تهران', 'phone': '09120000000',
+    })
+    assert response.status_code == 201, response.get_json()
+
+def test_sale_drops_only_the_product_page(client, customer_headers, product):
+    page = f'/api/products/{product.id}'
+    for path in ('/api/products', page):
+        client.get(path)
+    version = catalog_cache.catalog_version()
+
+    order(client, customer_headers, product, 1)
+
+    assert catalog_cache.catalog_version() == version
+    assert client.get('/api/products').headers['X-Cache'] == 'HIT'
+    response = client.get(page)
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.get_json()['product']['stock_quantity'] == 2
+
+def test_sale_drops_the_product_page_whatever_its_fields(client, customer_headers, product):
+    page = f'/api/products/{product.id}?fields=stock_quantity'
+    assert client.get(page).get_json()['product']['stock_quantity'] == 3
+    assert client.get(page).headers['X-Cache'] == 'HIT'
+
+    order(client, customer_headers, product, 1)
+
+    response = client.get(page)
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.get_json()['product']['stock_quantity'] == 2
+
+def test_selling_out_invalidates_the_catalog(client, customer_headers, product):
+    client.get('/api/products')
+    version = catalog_cache.catalog_version()
+
+    order(client, customer_headers, product, 3)
+
+    assert catalog_cache.catalog_version() == version + 1
+    assert client.get('/api/products').headers['X-Cache'] == 'MISS'
@@ -0,0 +1,16 @@
+from app import db
+from models import DashboardStat
+from dashboard_stats import STATS, get_dashboard_stats, reconcile_dashboard_stats
+
+def test_reconcile_seeds_missing_counters_and_reports_drift(client):
+    reconcile_dashboard_stats()
+    actual = get_dashboard_stats()
+    DashboardStat.query.filter_by(name='total_orders').delete()
+    DashboardStat.query.filter_by(name='total_users').update({'value': actual['total_users'] + 5})
+    db.session.commit()
+
+    drift = reconcile_dashboard_stats()
+
+    assert drift == {'total_users': (actual['total_users'] + 5, actual['total_users'])}
+    assert DashboardStat.query.count() == len(STATS)
+    assert get_dashboard_stats() == actual
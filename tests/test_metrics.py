@@ -0,0 +1,15 @@
+from app import app
+
+def test_metrics_answer_internal_clients_only(client, monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', None)
+    response = client.get('/metrics', environ_base={'REMOTE_ADDR': '10.0.0.5'})
+    assert response.status_code == 200
+    assert 'catalog_cache_coalesced_total' in response.get_data(as_text=True)
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '93.184.216.34'}).status_code == 403
+
+def test_metrics_token_is_required_when_set(client, monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', 'secret')
+    assert client.get('/metrics').status_code == 401
+    response = client.get('/metrics', headers={'Authorization': 'Bearer secret'},
+                          environ_base={'REMOTE_ADDR': '93.184.216.34'})
+    assert response.status_code == 200
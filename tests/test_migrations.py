@@ -0,0 +1,13 @@
+from sqlalchemy import inspect
+from app import db
+
+def test_migrations_build_the_model_schema(client):
+    # The test database is built by replaying every migration; it must end
+    # up with every table, column and index the models declare
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        assert inspector.has_table(table.name), table.name
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+        assert {column.name for column in table.columns} <= columns, table.name
+        indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        assert {index.name for index in table.indexes} <= indexes, table.name
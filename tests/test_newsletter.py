@@ -0,0 +1,100 @@
+import io
+import socket
+from collections import Counter
+import pytest
+from aiosmtpd.controller import Controller
+from app import db
+from models import Newsletter, NewsletterCampaign, NewsletterDelivery
+from newsletter import import_subscribers, claim_campaign, deliver_campaign, campaign_progress, _renew
+
+def test_import_keeps_unsubscribed_addresses_unsubscribed(client):
+    Newsletter.query.delete()
+    db.session.add_all([
+        Newsletter(email='left@example.com', is_active=False),
+        Newsletter(email='stayed@example.com', is_active=True),
+    ])
+    db.session.commit()
+
+    csv = 'email\nleft@example.com\nstayed@example.com\nnew@example.com\n'
+    report = import_subscribers(io.BytesIO(csv.encode()), 'csv')
+
+    assert report['subscribed'] == 2
+    active = dict(db.session.query(Newsletter.email, Newsletter.is_active).all())
+    assert active == {'left@example.com': False, 'stayed@example.com': True, 'new@example.com': True}
+
+class Sink:
+    # Local SMTP server that defers addresses listed in `deferred` and counts
+    # what it accepts
+    def __init__(self):
+        self.deferred = set()
+        self.delivered = Counter()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.deferred:
+            return '451 Try again later'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.delivered.update(envelope.rcpt_tos)
+        return '250 Message accepted'
+
+@pytest.fixture
+def sink(app):
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    handler = Sink()
+    controller = Controller(handler, hostname='127.0.0.1', port=port)
+    controller.start()
+    saved = {key: app.config[key] for key in ('MAIL_SERVER', 'MAIL_PORT', 'NEWSLETTER_RETRIES', 'NEWSLETTER_BACKOFF')}
+    app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=port, NEWSLETTER_RETRIES=1, NEWSLETTER_BACKOFF=0)
+    try:
+        yield handler
+    finally:
+        app.config.update(saved)
+        controller.stop()
+
+@pytest.fixture
+def campaign(client):
+    NewsletterDelivery.query.delete()
+    Newsletter.query.delete()
+    db.session.add_all([Newsletter(email=f'member{i}@example.com', is_active=True) for i in range(5)])
+    campaign = NewsletterCampaign(subject='تخفیف ویژه', body_html='<p>تا ۳۰٪</p>')
+    db.session.add(campaign)
+    db.session.commit()
+    return campaign
+
+def test_interrupted_campaign_resumes_without_sending_twice(sink, campaign):
+    sink.deferred = {'member1@example.com', 'member3@example.com'}
+    progress = deliver_campaign(campaign.id)
+    assert progress == {'pending': 2, 'sent': 3, 'failed': 0, 'skipped': 0}
+    db.session.refresh(campaign)
+    assert campaign.status == 'sending'
+    assert campaign.lock_owner is None
+
+    sink.deferred = set()
+    progress = deliver_campaign(campaign.id)
+    assert progress == {'pending': 0, 'sent': 5, 'failed': 0, 'skipped': 0}
+    assert sink.delivered == Counter({f'member{i}@example.com': 1 for i in range(5)})
+    db.session.refresh(campaign)
+    assert (campaign.status, campaign.sent_count) == ('sent', 5)
+
+def test_campaign_held_by_another_run_is_not_sent(client, admin_headers, sink, campaign):
+    owner = claim_campaign(campaign.id)
+    assert owner is not None
+
+    response = client.post(f'/api/admin/newsletter/campaigns/{campaign.id}/send', headers=admin_headers)
+    assert response.status_code == 409
+    assert deliver_campaign(campaign.id) is None
+    assert not sink.delivered
+
+def test_run_stops_once_its_lease_is_taken_over(sink, campaign):
+    owner = claim_campaign(campaign.id)
+    # The lease lapses and another run claims the campaign
+    db.session.execute(db.update(NewsletterCampaign).values(locked_until=None))
+    assert claim_campaign(campaign.id) not in (None, owner)
+
+    assert not _renew(campaign.id, owner)
+    assert deliver_campaign(campaign.id, owner) is None
+    assert campaign_progress(campaign.id)['sent'] == 0
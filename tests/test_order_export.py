@@ -0,0 +1,18 @@
+import csv
+import io
+from app import db
+from models import Order
+from order_export import export_query, csv_stream
+
+def test_csv_cells_cannot_start_a_formula(client, customer):
+    order = Order(user_id=customer.id, total_amount=-5.0, phone='+989120000000',
+                  shipping_address='=HYPERLINK("http://example.com")')
+    db.session.add(order)
+    db.session.commit()
+
+    rows = list(csv.DictReader(io.StringIO(''.join(csv_stream(export_query())))))
+    row = next(row for row in rows if row['order_id'] == str(order.id))
+
+    assert row['shipping_address'] == "'=HYPERLINK(\"http://example.com\")"
+    assert row['phone'] == "'+989120000000"
+    assert row['total_amount'] == '-5.0'
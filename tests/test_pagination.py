@@ -0,0 +1,35 @@
+import pytest
+from app import db
+from models import BlogPost
+import pagination
+from pagination import MAX_PER_PAGE
+
+@pytest.fixture
+def posts(client):
+    BlogPost.query.delete()
+    for number in range(3):
+        db.session.add(BlogPost(title=f'Post {number}', title_persian=f'مقاله {number}', content='...',
+                                content_persian='...', is_published=True, slug=f'paged-{number}'))
+    db.session.commit()
+
+@pytest.mark.parametrize('per_page, expected', [(0, 1), (-5, 1), (2, 2), (MAX_PER_PAGE + 1, 3)])
+def test_cursor_per_page_is_clamped(client, posts, per_page, expected):
+    response = client.get(f'/api/blog?cursor=&per_page={per_page}')
+    assert response.status_code == 200
+    assert len(response.get_json()['posts']) == expected
+
+def test_cursor_walks_every_row_once(client, posts):
+    seen, cursor = [], ''
+    while cursor is not None:
+        data = client.get(f'/api/blog?cursor={cursor}&per_page=2').get_json()
+        seen.extend(post['id'] for post in data['posts'])
+        cursor = data['next_cursor']
+    assert len(seen) == len(set(seen)) == 3
+
+def test_count_cache_is_bounded(client, posts, monkeypatch):
+    monkeypatch.setattr(pagination, 'COUNT_CACHE_SIZE', 2)
+    query = BlogPost.query
+    for search in ('a', 'b', 'c'):
+        pagination.cached_count(('products', search), query)
+    assert list(pagination._counts)[-2:] == [('products', 'b'), ('products', 'c')]
+    assert len(pagination._counts) == 2
@@ -0,0 +1,50 @@
+import io
+import pytest
+from app import db
+from models import Category, Product
+import product_import
+from product_import import import_products
+
+@pytest.fixture
+def category(client):
+    category = Category(name='Imported', name_persian='وارداتی')
+    db.session.add(category)
+    db.session.commit()
+    return category
+
+def csv_file(category, *rows):
+    lines = ['name,name_persian,price,category_id,stock_quantity']
+    lines += [f'{name},محصول,{price},{category.id},5' for name, price in rows]
+    return io.BytesIO('\n'.join(lines).encode())
+
+def test_repeated_name_in_a_file_is_a_row_error(category):
+    report = import_products(csv_file(category, ('Import twin', 100), ('Import twin', 200)))
+
+    assert report['inserted'] == 1
+    assert [error['row'] for error in report['errors']] == [2]
+    assert Product.query.filter_by(name='Import twin').one().price == 100
+
+def test_product_created_during_an_import_is_updated(category, monkeypatch):
+    # Another request creates the product between the import's lookup and
+    # its insert
+    check = product_import.missing_fields
+    def create_concurrently(values):
+        if values['name'] == 'Import race':
+            db.session.add(Product(name='Import race', name_persian='محصول', price=1, category_id=category.id))
+            db.session.flush()
+        return check(values)
+    monkeypatch.setattr(product_import, 'missing_fields', create_concurrently)
+
+    report = import_products(csv_file(category, ('Import race', 300)))
+
+    assert (report['inserted'], report['updated'], report['errors']) == (0, 1, [])
+    assert Product.query.filter_by(name='Import race').one().price == 300
+
+def test_create_product_refuses_an_existing_name(client, admin_headers, category):
+    import_products(csv_file(category, ('Import taken', 100)))
+
+    response = client.post('/api/admin/products', headers=admin_headers, json={
+        'name': 'Import taken', 'name_persian': 'محصول', 'price': 100, 'category_id': category.id,
+    })
+    assert response.status_code == 409
+    assert Product.query.filter_by(name='Import taken').count() == 1
@@ -0,0 +1,93 @@
+# Each endpoint must issue the same number of SQL statements whatever the
+# number of rows it serializes; a lazy load per row (N+1) shows up as a
+# difference between N and 2N rows.
+import pytest
+from sqlalchemy import event
+from app import app, db
+from models import User, Category, Product, Order, OrderItem, BlogPost
+import catalog_cache
+
+N = 2
+
+@pytest.fixture(autouse=True)
+def empty_tables(client):
+    for model in (OrderItem, Order, BlogPost, Product, Category):
+        db.session.query(model).delete()
+    User.query.filter(User.email.like('author%')).delete(synchronize_session=False)
+    db.session.commit()
+
+def add_products(count):
+    # Every product gets its own category so per-row loads can't be served
+    # from the identity map
+    products = []
+    first = Product.query.count()
+    for number in range(first, first + count):
+        category = Category(name=f'Category {number}', name_persian=f'دسته {number}')
+        product = Product(name=f'Product {number}', name_persian=f'محصول {number}', price=100 + number,
+                          stock_quantity=10, category=category)
+        db.session.add(product)
+        products.append(product)
+    db.session.commit()
+    return products
+
+def add_orders(user, count):
+    for product in add_products(count):
+        order = Order(user_id=user.id, total_amount=product.price, shipping_address='تهران', phone='09120000000')
+        order.order_items.append(OrderItem(product=product, quantity=1, price=product.price))
+        db.session.add(order)
+    db.session.commit()
+
+def add_posts(count):
+    for _ in range(count):
+        number = BlogPost.query.count()
+        author = User(username=f'author{number}', email=f'author{number}@example.com', password_hash='-')
+        db.session.add(BlogPost(title=f'Post {number}', title_persian=f'مقاله {number}', content='...',
+                                content_persian='...', author=author, is_published=True, slug=f'post-{number}'))
+        db.session.commit()
+
+def count_statements(client, path, headers=None):
+    # Warm the per-process caches (identities, facet index), then start from
+    # an empty response cache so the view runs
+    client.get(path, headers=headers)
+    catalog_cache.set_backend(catalog_cache.LRUCache(app.config['CATALOG_CACHE_SIZE'], app.config['CATALOG_CACHE_TTL']))
+
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        response = client.get(path, headers=headers)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    assert response.status_code == 200, response.get_json()
+    return len(statements)
+
+@pytest.mark.parametrize('path', [
+    '/api/products?per_page=50',
+    '/api/products?per_page=50&fields=id,name,category',
+    '/api/products?per_page=50&cursor=',
+])
+def test_products(client, path):
+    add_products(N)
+    first = count_statements(client, path)
+    add_products(N)
+    assert count_statements(client, path) == first
+
+def test_orders(client, customer, customer_headers):
+    add_orders(customer, N)
+    first = count_statements(client, '/api/orders', customer_headers)
+    add_orders(customer, N)
+    assert count_statements(client, '/api/orders', customer_headers) == first
+
+@pytest.mark.parametrize('path', ['/api/blog?per_page=50', '/api/blog?per_page=50&fields=id,author'])
+def test_blog(client, path):
+    add_posts(N)
+    first = count_statements(client, path)
+    add_posts(N)
+    assert count_statements(client, path) == first
+
+def test_dashboard(client, customer, admin_headers):
+    add_orders(customer, N)
+    first = count_statements(client, '/api/admin/dashboard', admin_headers)
+    add_orders(customer, N)
+    assert count_statements(client, '/api/admin/dashboard', admin_headers) == first
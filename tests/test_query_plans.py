@@ -0,0 +1,19 @@
+import os
+import sys
+import pytest
+from app import db
+from query_plans import check_query_plans
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+from synthetic_data import generate
+
+@pytest.fixture(scope='module')
+def seeded(app):
+    with app.app_context():
+        generate(db, products=500, users=50, orders=2000, posts=50)
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql('ANALYZE')
+
+def test_endpoint_queries_use_an_index(client, seeded):
+    # Fails on any plan step that reads a whole table (see explain-queries)
+    assert check_query_plans() == {}